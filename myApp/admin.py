@@ -1,12 +1,28 @@
+from django import forms
 from django.contrib import admin
 from .models import (
-    Course, Module, Lesson, UserProgress, CourseEnrollment, Exam, ExamAttempt, Certification,
-    Cohort, CohortMember, Bundle, BundlePurchase, CourseAccess, LearningPath, LearningPathCourse
+    Course, Module, Lesson, UserProgress, UserCourseProgress, CourseEnrollment, Exam, ExamAttempt, Certification,
+    Cohort, CohortMember, CohortSyncJob, QuizImportJob, Bundle, BundlePurchase, CourseAccess, LearningPath, LearningPathCourse,
+    AnalyticsDailySnapshot, ActivityEvent
 )
 
 
+class CourseAdminForm(forms.ModelForm):
+    class Meta:
+        model = Course
+        fields = '__all__'
+
+    def clean_prerequisite_courses(self):
+        prerequisites = self.cleaned_data['prerequisite_courses']
+        if self.instance.pk:
+            from .utils.prerequisites import validate_prerequisites
+            validate_prerequisites(self.instance.pk, [course.id for course in prerequisites])
+        return prerequisites
+
+
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
+    form = CourseAdminForm
     list_display = ['name', 'course_type', 'status', 'coach_name', 'is_subscribers_only', 'created_at']
     list_filter = ['course_type', 'status', 'is_subscribers_only', 'is_accredible_certified']
     search_fields = ['name', 'description']
@@ -54,6 +70,14 @@ class UserProgressAdmin(admin.ModelAdmin):
     readonly_fields = ['last_accessed', 'started_at', 'completed_at']
 
 
+@admin.register(UserCourseProgress)
+class UserCourseProgressAdmin(admin.ModelAdmin):
+    list_display = ['user', 'course', 'completed_lessons', 'total_lessons', 'avg_watch_percentage', 'last_activity', 'updated_at']
+    list_filter = ['course', 'has_any_progress']
+    search_fields = ['user__username', 'course__name']
+    readonly_fields = ['completed_lessons', 'total_lessons', 'avg_watch_percentage', 'has_any_progress', 'last_activity', 'updated_at']
+
+
 @admin.register(CourseEnrollment)
 class CourseEnrollmentAdmin(admin.ModelAdmin):
     list_display = ['user', 'course', 'payment_type', 'enrolled_at']
@@ -95,9 +119,26 @@ class CohortAdmin(admin.ModelAdmin):
     list_display = ['name', 'is_active', 'get_member_count', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'description']
+    filter_horizontal = ['courses']
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(CohortSyncJob)
+class CohortSyncJobAdmin(admin.ModelAdmin):
+    list_display = ['cohort', 'action', 'status', 'processed_members', 'total_members', 'granted_count', 'revoked_count', 'created_at']
+    list_filter = ['action', 'status', 'created_at']
+    search_fields = ['cohort__name']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
+@admin.register(QuizImportJob)
+class QuizImportJobAdmin(admin.ModelAdmin):
+    list_display = ['file_name', 'lesson', 'status', 'processed_pages', 'total_pages', 'ocr_pages', 'questions_created', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['file_name', 'lesson__title']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+
+
 @admin.register(CohortMember)
 class CohortMemberAdmin(admin.ModelAdmin):
     list_display = ['user', 'cohort', 'joined_at', 'remove_access_on_leave']
@@ -170,3 +211,19 @@ class LearningPathCourseAdmin(admin.ModelAdmin):
     list_filter = ['learning_path', 'is_required']
     search_fields = ['learning_path__name', 'course__name']
     ordering = ['learning_path', 'order']
+
+
+@admin.register(AnalyticsDailySnapshot)
+class AnalyticsDailySnapshotAdmin(admin.ModelAdmin):
+    list_display = ['date', 'course', 'new_students', 'new_enrollments', 'new_certifications', 'total_students', 'updated_at']
+    list_filter = ['date']
+    search_fields = ['course__name']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(ActivityEvent)
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'event_type', 'course', 'lesson', 'created_at']
+    list_filter = ['event_type', 'created_at']
+    search_fields = ['user__username', 'course__name', 'lesson__title']
+    raw_id_fields = ['user', 'course', 'lesson']
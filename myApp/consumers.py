@@ -0,0 +1,50 @@
+"""
+WebSocket consumers
+Pushes new ActivityEvents to connected staff dashboards (see utils/activity.py).
+"""
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .utils.activity import ACTIVITY_FEED_GROUP, get_activity_event, get_activity_feed, serialize_activity_event
+
+
+class ActivityFeedConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Staff-only live activity feed.
+    The client may send {"after": <last event id>} after connecting to catch
+    up on events it missed; everything after that is pushed as it happens.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if not user or not user.is_authenticated or not user.is_staff:
+            await self.close()
+            return
+        await self.channel_layer.group_add(ACTIVITY_FEED_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(ACTIVITY_FEED_GROUP, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        try:
+            after = int(content.get('after') or 0)
+        except (TypeError, ValueError):
+            return
+        for event in await self.missed_events(after):
+            await self.send_json(event)
+
+    @database_sync_to_async
+    def missed_events(self, after):
+        # Oldest first, so the client can prepend them one by one
+        return [serialize_activity_event(event) for event in reversed(get_activity_feed(after=after))]
+
+    @database_sync_to_async
+    def load_event(self, event_id):
+        event = get_activity_event(event_id)
+        return serialize_activity_event(event) if event else None
+
+    async def activity_event(self, message):
+        # The broadcast only carries the id; render here, off the request that wrote it
+        event = await self.load_event(message['event_id'])
+        if event:
+            await self.send_json(event)
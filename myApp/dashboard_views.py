@@ -28,6 +28,7 @@ from .models import (
     Lesson,
     Module,
     UserProgress,
+    UserCourseProgress,
     CourseEnrollment,
     Exam,
     CourseAccess,
@@ -40,6 +41,8 @@ from .models import (
     BundlePurchase,
     Cohort,
     CohortMember,
+    CohortSyncJob,
+    QuizImportJob,
 )
 from django.contrib import messages
 from django.db import models
@@ -48,18 +51,30 @@ from django.db.models import Avg, Count, Q, Sum
 from django.utils import timezone
 
 
-@staff_member_required
-def dashboard_home(request):
-    """Main dashboard overview with analytics"""
+DASHBOARD_HOME_CACHE_KEY = 'dashboard_home_context'
+STUDENTS_PER_PAGE = 25
+
+
+def _counts_by(queryset, field='course_id'):
+    """{value of field: row count} in one grouped query"""
+    return dict(queryset.values(field).annotate(total=Count('id')).values_list(field, 'total'))
+
+
+def _build_dashboard_home_context():
+    """
+    Everything dashboard_home shows, in a fixed number of grouped queries.
+    Querysets are evaluated so the result can be cached.
+    """
     from datetime import timedelta
+    from django.db.models.functions import TruncDate
     
     # Basic stats
     total_courses = Course.objects.count()
     total_lessons = Lesson.objects.count()
     approved_lessons = Lesson.objects.filter(ai_generation_status='approved').count()
     pending_lessons = Lesson.objects.filter(ai_generation_status='pending').count()
-    recent_lessons = Lesson.objects.select_related('course').order_by('-created_at')[:10]
-    courses = Course.objects.annotate(lesson_count=Count('lessons')).order_by('-created_at')
+    recent_lessons = list(Lesson.objects.select_related('course').order_by('-created_at')[:10])
+    courses = list(Course.objects.annotate(lesson_total=Count('lessons')).order_by('-created_at'))
     
     # Student Analytics
     total_students = User.objects.filter(is_staff=False, is_superuser=False).count()
@@ -93,23 +108,26 @@ def dashboard_home(request):
     total_certifications = Certification.objects.count()
     certifications_30d = Certification.objects.filter(
         issued_at__gte=timezone.now() - timedelta(days=30)
-    ).count() if Certification.objects.filter(issued_at__isnull=False).exists() else 0
+    ).count()
     
-    # Course Performance Analytics
+    # Course Performance Analytics (the 10 newest courses, like Course.objects.all()[:10])
+    top_courses = courses[:10]
+    top_ids = [course.id for course in top_courses]
+    enrollments_by_course = _counts_by(CourseEnrollment.objects.filter(course_id__in=top_ids))
+    accesses_by_course = _counts_by(CourseAccess.objects.filter(course_id__in=top_ids, status='unlocked'))
+    completed_by_course = _counts_by(
+        UserProgress.objects.filter(lesson__course_id__in=top_ids, completed=True), 'lesson__course_id'
+    )
+    certifications_by_course = _counts_by(Certification.objects.filter(course_id__in=top_ids, status='passed'))
     course_performance = []
-    for course in Course.objects.all()[:10]:
-        enrollments = CourseEnrollment.objects.filter(course=course).count()
-        accesses = CourseAccess.objects.filter(course=course, status='unlocked').count()
-        total_students_course = enrollments + accesses
+    for course in top_courses:
+        total_students_course = enrollments_by_course.get(course.id, 0) + accesses_by_course.get(course.id, 0)
         
-        total_lessons_course = course.lessons.count()
-        completed = UserProgress.objects.filter(
-            lesson__course=course,
-            completed=True
-        ).count()
+        total_lessons_course = course.lesson_total
+        completed = completed_by_course.get(course.id, 0)
         course_completion_rate = (completed / (total_lessons_course * total_students_course * 100)) if total_students_course > 0 and total_lessons_course > 0 else 0
         
-        certifications_course = Certification.objects.filter(course=course, status='passed').count()
+        certifications_course = certifications_by_course.get(course.id, 0)
         
         course_performance.append({
             'course': course,
@@ -126,24 +144,27 @@ def dashboard_home(request):
     ).count()
     recent_certifications = Certification.objects.filter(
         issued_at__gte=seven_days_ago
-    ).count() if Certification.objects.filter(issued_at__isnull=False).exists() else 0
+    ).count()
     
     # Get student activity feed
     student_activities = get_student_activity_feed(limit=10)
     
-    # Enrollment trend (last 30 days)
-    enrollment_trend = []
-    for i in range(30, 0, -1):
-        date = timezone.now() - timedelta(days=i)
-        count = CourseEnrollment.objects.filter(
-            enrolled_at__date=date.date()
-        ).count()
-        enrollment_trend.append({
-            'date': date.strftime('%m/%d'),
-            'count': count
-        })
+    # Enrollment trend (last 30 days), one grouped query
+    now = timezone.now()
+    trend_dates = [now - timedelta(days=i) for i in range(30, 0, -1)]
+    daily_enrollments = _counts_by(
+        CourseEnrollment.objects.filter(
+            enrolled_at__date__gte=trend_dates[0].date(),
+            enrolled_at__date__lte=trend_dates[-1].date(),
+        ).annotate(day=TruncDate('enrolled_at')),
+        'day'
+    )
+    enrollment_trend = [
+        {'date': date.strftime('%m/%d'), 'count': daily_enrollments.get(date.date(), 0)}
+        for date in trend_dates
+    ]
     
-    return render(request, 'dashboard/home.html', {
+    return {
         'total_courses': total_courses,
         'total_lessons': total_lessons,
         'approved_lessons': approved_lessons,
@@ -168,152 +189,54 @@ def dashboard_home(request):
         'recent_progress': recent_progress,
         'recent_certifications': recent_certifications,
         'enrollment_trend': enrollment_trend,
-    })
+    }
+
+
+@staff_member_required
+def dashboard_home(request):
+    """Main dashboard overview with analytics (cached - see utils/dashboard_cache.py)"""
+    from .utils.dashboard_cache import get_cached_context
+    
+    context, cache_report = get_cached_context(DASHBOARD_HOME_CACHE_KEY, _build_dashboard_home_context)
+    response = render(request, 'dashboard/home.html', dict(context, cache_report=cache_report))
+    response['X-Dashboard-Cache'] = cache_report.header()
+    return response
+
+
+@staff_member_required
+@require_http_methods(["POST"])
+def dashboard_home_refresh(request):
+    """Recompute the dashboard overview now instead of waiting for the cache to expire"""
+    from .utils.dashboard_cache import get_cached_context
+    
+    _, cache_report = get_cached_context(DASHBOARD_HOME_CACHE_KEY, _build_dashboard_home_context, force=True)
+    messages.success(request, f'Dashboard refreshed in {cache_report.compute_seconds:.2f}s.')
+    return redirect('dashboard_home')
 
 
 @staff_member_required
 def dashboard_students(request):
-    """Smart student list with activity updates and filtering"""
+    """Smart student list with activity updates and filtering (filtered, sorted and paginated in SQL)"""
+    from urllib.parse import urlencode
+    from django.core.paginator import Paginator
+    from .utils.student_list import get_student_list, student_row
+    
     # Get filter parameters
     course_filter = request.GET.get('course', '')
     status_filter = request.GET.get('status', 'all')  # all, active, completed, certified
     search_query = request.GET.get('search', '')
     sort_by = request.GET.get('sort', 'recent')  # recent, progress, name, enrolled
     
-    # Get all users including admin/staff
-    # Show all users who have activity OR all users if none have activity
-    students_query = User.objects.all()
-    
-    # Auto-enroll admin/staff users in all active courses if they don't have enrollments
-    admin_users = students_query.filter(Q(is_staff=True) | Q(is_superuser=True))
-    active_courses = Course.objects.filter(status='active')
-    
-    for admin_user in admin_users:
-        for course in active_courses:
-            CourseEnrollment.objects.get_or_create(
-                user=admin_user,
-                course=course,
-                defaults={'payment_type': 'full'}
-            )
-    
-    # Apply search filter
-    if search_query:
-        students_query = students_query.filter(
-            Q(username__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query)
-        )
-    
-    # Get student data with activity
-    students_data = []
-    for student in students_query:
-        # Get enrollments (legacy system)
-        enrollments = CourseEnrollment.objects.filter(user=student).select_related('course')
-        
-        # Get course access records (new access control system)
-        course_accesses = CourseAccess.objects.filter(
-            user=student,
-            status='unlocked'
-        ).select_related('course')
-        
-        # Combine both - get unique courses from enrollments and accesses
-        enrollment_courses = set(enrollments.values_list('course_id', flat=True))
-        access_courses = set(course_accesses.values_list('course_id', flat=True))
-        all_course_ids = enrollment_courses | access_courses
-        
-        # Apply course filter
-        if course_filter:
-            if int(course_filter) not in all_course_ids:
-                continue
-            all_course_ids = {int(course_filter)}
-        
-        # Get all courses for this student (even if empty, we still show the student)
-        student_courses = Course.objects.filter(id__in=all_course_ids) if all_course_ids else Course.objects.none()
-        
-        # Calculate overall stats
-        total_courses = len(all_course_ids)
-        total_lessons_all = 0
-        completed_lessons_all = 0
-        certifications_count = 0
-        recent_activity = None
-        
-        for course in student_courses:
-            total_lessons = course.lessons.count()
-            completed_lessons = UserProgress.objects.filter(
-                user=student,
-                lesson__course=course,
-                completed=True
-            ).count()
-            total_lessons_all += total_lessons
-            completed_lessons_all += completed_lessons
-            
-            # Check for certification
-            if Certification.objects.filter(user=student, course=course, status='passed').exists():
-                certifications_count += 1
-        
-        overall_progress = int((completed_lessons_all / total_lessons_all * 100)) if total_lessons_all > 0 else 0
-        
-        # Get most recent activity
-        recent_progress = UserProgress.objects.filter(user=student).order_by('-last_accessed').first()
-        recent_exam = ExamAttempt.objects.filter(user=student).order_by('-started_at').first()
-        recent_cert = Certification.objects.filter(user=student).order_by('-issued_at', '-created_at').first()
-        
-        # Determine most recent activity
-        activities = []
-        if recent_progress:
-            activities.append(('progress', recent_progress.last_accessed, recent_progress))
-        if recent_exam:
-            activities.append(('exam', recent_exam.started_at, recent_exam))
-        if recent_cert and recent_cert.issued_at:
-            activities.append(('cert', recent_cert.issued_at, recent_cert))
-        
-        if activities:
-            activities.sort(key=lambda x: x[1], reverse=True)
-            recent_activity = activities[0]
-        
-        # Determine status
-        if certifications_count > 0:
-            student_status = 'certified'
-        elif overall_progress == 100:
-            student_status = 'completed'
-        elif overall_progress > 0:
-            student_status = 'active'
-        else:
-            student_status = 'inactive'
-        
-        # Apply status filter
-        if status_filter != 'all':
-            if status_filter == 'active' and student_status != 'active':
-                continue
-            elif status_filter == 'completed' and student_status != 'completed':
-                continue
-            elif status_filter == 'certified' and student_status != 'certified':
-                continue
-        
-        students_data.append({
-            'student': student,
-            'total_courses': total_courses,
-            'total_lessons': total_lessons_all,
-            'completed_lessons': completed_lessons_all,
-            'overall_progress': overall_progress,
-            'certifications_count': certifications_count,
-            'recent_activity': recent_activity,
-            'status': student_status,
-            'enrollments': enrollments,
-            'course_accesses': course_accesses,
-            'courses': student_courses,
-        })
+    # Staff are enrolled in active courses by signal / `manage.py enroll_staff`, not here
+    students = get_student_list(
+        search=search_query,
+        course_id=int(course_filter) if course_filter.isdigit() else None,
+        status=status_filter,
+        sort=sort_by,
+    )
     
-    # Sort students
-    if sort_by == 'recent':
-        students_data.sort(key=lambda x: x['recent_activity'][1] if x['recent_activity'] else (timezone.now() - timezone.timedelta(days=365)), reverse=True)
-    elif sort_by == 'progress':
-        students_data.sort(key=lambda x: x['overall_progress'], reverse=True)
-    elif sort_by == 'name':
-        students_data.sort(key=lambda x: x['student'].username.lower())
-    elif sort_by == 'enrolled':
-        students_data.sort(key=lambda x: x['student'].date_joined, reverse=True)
+    page_obj = Paginator(students, STUDENTS_PER_PAGE).get_page(request.GET.get('page'))
+    students_data = [student_row(student) for student in page_obj]
     
     # Get activity feed
     activity_feed = get_student_activity_feed(limit=50)
@@ -322,6 +245,10 @@ def dashboard_students(request):
     
     return render(request, 'dashboard/students.html', {
         'students_data': students_data,
+        'page_obj': page_obj,
+        'filter_query': urlencode({
+            'search': search_query, 'course': course_filter, 'status': status_filter, 'sort': sort_by,
+        }),
         'activity_feed': activity_feed,
         'courses': courses,
         'course_filter': course_filter,
@@ -332,84 +259,36 @@ def dashboard_students(request):
 
 
 def get_student_activity_feed(limit=20):
-    """Get a comprehensive activity feed of all student activities"""
-    activities = []
-    
-    # Recent lesson completions
-    recent_completions = UserProgress.objects.filter(
-        completed=True,
-        completed_at__isnull=False
-    ).select_related('user', 'lesson', 'lesson__course').order_by('-completed_at')[:limit]
-    
-    for progress in recent_completions:
-        activities.append({
-            'type': 'lesson_completed',
-            'timestamp': progress.completed_at,
-            'user': progress.user,
-            'course': progress.lesson.course,
-            'lesson': progress.lesson,
-            'data': {
-                'watch_percentage': progress.video_watch_percentage,
-            }
-        })
-    
-    # Recent exam attempts
-    recent_exams = ExamAttempt.objects.select_related('user', 'exam', 'exam__course').order_by('-started_at')[:limit]
-    
-    for attempt in recent_exams:
-        activities.append({
-            'type': 'exam_attempt',
-            'timestamp': attempt.started_at,
-            'user': attempt.user,
-            'course': attempt.exam.course,
-            'data': {
-                'score': attempt.score,
-                'passed': attempt.passed,
-                'attempt_number': attempt.attempt_number(),
-            }
-        })
-    
-    # Recent certifications
-    recent_certs = Certification.objects.filter(
-        issued_at__isnull=False
-    ).select_related('user', 'course').order_by('-issued_at')[:limit]
-    
-    for cert in recent_certs:
-        activities.append({
-            'type': 'certification_issued',
-            'timestamp': cert.issued_at,
-            'user': cert.user,
-            'course': cert.course,
-            'data': {
-                'certificate_id': cert.accredible_certificate_id,
-            }
-        })
+    """Get the latest student activities (one query over the ActivityEvent log)"""
+    from .utils.activity import get_activity_feed
+    return get_activity_feed(limit=limit)
+
+
+@staff_member_required
+def dashboard_activity_feed(request):
+    """
+    JSON activity feed for the auto-refresh UI.
+    ?after=<id> returns only events newer than the client's cursor;
+    ?before=<id> pages back through older events.
+    """
+    from .utils.activity import FEED_PAGE_SIZE, get_activity_feed, serialize_activity_event
     
-    # Recent progress updates (video watch)
-    recent_progress = UserProgress.objects.filter(
-        video_watch_percentage__gt=0,
-        last_accessed__isnull=False
-    ).select_related('user', 'lesson', 'lesson__course').order_by('-last_accessed')[:limit]
-    
-    for progress in recent_progress:
-        # Only add if significant progress (avoid spam)
-        if progress.video_watch_percentage >= 50 or progress.completed:
-            activities.append({
-                'type': 'progress_update',
-                'timestamp': progress.last_accessed,
-                'user': progress.user,
-                'course': progress.lesson.course,
-                'lesson': progress.lesson,
-                'data': {
-                    'watch_percentage': progress.video_watch_percentage,
-                    'status': progress.status,
-                }
-            })
+    try:
+        after = int(request.GET['after']) if request.GET.get('after') else None
+        before = int(request.GET['before']) if request.GET.get('before') else None
+        limit = int(request.GET.get('limit', FEED_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid cursor'}, status=400)
     
-    # Sort by timestamp (most recent first)
-    activities.sort(key=lambda x: x['timestamp'], reverse=True)
+    events = get_activity_feed(limit=limit, after=after, before=before)
     
-    return activities[:limit]
+    return JsonResponse({
+        'success': True,
+        'events': [serialize_activity_event(event) for event in events],
+        # Newest id the client has seen - send it back as ?after=
+        'cursor': events[0].id if events else after,
+        'oldest': events[-1].id if events else before,
+    })
 
 
 @staff_member_required
@@ -436,8 +315,13 @@ def dashboard_course_detail(request, course_slug):
         course.save()
         return redirect('dashboard_course_detail', course_slug=course.slug)
     
+    from .utils.watch_heatmap import get_lesson_heatmaps
+    lessons = list(course.lessons.all())
+    heatmaps = get_lesson_heatmaps(lessons)
+    
     return render(request, 'dashboard/course_detail.html', {
         'course': course,
+        'lesson_heatmaps': [(lesson, heatmaps[lesson.id]) for lesson in lessons],
     })
 
 
@@ -525,11 +409,16 @@ def dashboard_lesson_quiz(request, lesson_id):
 
         return redirect('dashboard_lesson_quiz', lesson_id=lesson.id)
 
-    questions = LessonQuizQuestion.objects.filter(quiz=quiz).order_by('order', 'id')
+    from .utils.quiz_analysis import get_quiz_analyses
+    analysis = get_quiz_analyses([quiz])[quiz.id]
+    questions = list(LessonQuizQuestion.objects.filter(quiz=quiz).order_by('order', 'id'))
+    for question in questions:
+        question.analysis = analysis['questions'].get(question.id) if analysis else None
     return render(request, 'dashboard/lesson_quiz.html', {
         'lesson': lesson,
         'quiz': quiz,
         'questions': questions,
+        'analysis': analysis,
     })
 
 
@@ -577,14 +466,18 @@ def dashboard_quizzes(request):
     # Order by course and lesson
     quizzes = quizzes.order_by('lesson__course__name', 'lesson__order', 'lesson__id')
     
-    # Get quiz data with question counts
+    # Get quiz data with question counts and item analysis
+    from .utils.quiz_analysis import get_quiz_analyses
+    quizzes = list(quizzes)
+    analyses = get_quiz_analyses(quizzes)
     quiz_data = []
     for quiz in quizzes:
         quiz_data.append({
             'quiz': quiz,
             'lesson': quiz.lesson,
             'course': quiz.lesson.course,
-            'question_count': quiz.questions.count(),
+            'question_count': len(quiz.questions.all()),
+            'analysis': analyses[quiz.id],
         })
     
     courses = Course.objects.all()
@@ -1094,6 +987,15 @@ def dashboard_upload_quiz(request):
     if request.method == 'POST':
         lesson_id = request.POST.get('lesson_id')
         generation_method = request.POST.get('generation_method', 'upload')  # 'upload' or 'ai'
+        uploaded_file = request.FILES.get('quiz_file')
+        
+        # CSV/XLSX/DOCX question banks can name their lessons in a lesson_slug column
+        if generation_method != 'ai' and uploaded_file and uploaded_file.name.rsplit('.', 1)[-1].lower() in QUIZ_IMPORT_EXTENSIONS:
+            return import_quiz_upload(request, uploaded_file, lesson_id, {
+                'courses': courses,
+                'lessons': lessons,
+                'openai_available': OPENAI_AVAILABLE,
+            })
         
         if not lesson_id:
             messages.error(request, 'Please select a lesson.')
@@ -1123,7 +1025,6 @@ def dashboard_upload_quiz(request):
                 questions_created = generate_ai_quiz(lesson, quiz, num_questions)
             else:
                 # Upload from file
-                uploaded_file = request.FILES.get('quiz_file')
                 if not uploaded_file:
                     messages.error(request, 'Please select a file to upload.')
                     return render(request, 'dashboard/upload_quiz.html', {
@@ -1134,9 +1035,7 @@ def dashboard_upload_quiz(request):
                 
                 file_extension = uploaded_file.name.split('.')[-1].lower()
                 
-                if file_extension == 'csv':
-                    questions_created = parse_csv_quiz(uploaded_file, quiz)
-                elif file_extension == 'pdf':
+                if file_extension == 'pdf':
                     if not PDF_AVAILABLE:
                         messages.error(request, 'PDF parsing is not available. Please install PyMuPDF.')
                         return render(request, 'dashboard/upload_quiz.html', {
@@ -1144,9 +1043,14 @@ def dashboard_upload_quiz(request):
                             'lessons': lessons,
                             'openai_available': OPENAI_AVAILABLE,
                         })
-                    questions_created = parse_pdf_quiz(uploaded_file, quiz)
+                    from .utils.pdf_quiz import queue_quiz_import
+                    
+                    # Large exam PDFs are extracted in a background job
+                    job = queue_quiz_import(lesson, uploaded_file, user=request.user)
+                    messages.info(request, f'Extracting questions from "{uploaded_file.name}" in the background.')
+                    return redirect('dashboard_quiz_import_job', job_id=job.id)
                 else:
-                    messages.error(request, f'Unsupported file format: {file_extension}. Please upload a CSV or PDF file.')
+                    messages.error(request, f'Unsupported file format: {file_extension}. Please upload a CSV, XLSX, DOCX or PDF file.')
                     return render(request, 'dashboard/upload_quiz.html', {
                         'courses': courses,
                         'lessons': lessons,
@@ -1169,52 +1073,34 @@ def dashboard_upload_quiz(request):
     })
 
 
-def parse_csv_quiz(uploaded_file, quiz):
-    """Parse CSV file and create quiz questions"""
-    # Read the file
-    file_content = uploaded_file.read().decode('utf-8')
-    csv_reader = csv.DictReader(io.StringIO(file_content))
-    
-    questions_created = 0
-    max_order = quiz.questions.aggregate(models.Max('order'))['order__max'] or 0
+QUIZ_IMPORT_EXTENSIONS = ('csv', 'xlsx', 'docx')
+
+
+def import_quiz_upload(request, uploaded_file, lesson_id, context):
+    """Bulk-import a CSV/XLSX/DOCX question bank and show the per-row report"""
+    from .utils.quiz_import import QuizImportError, import_quiz_file
     
-    for row_num, row in enumerate(csv_reader, start=1):
-        try:
-            # Expected CSV format: question, option_a, option_b, option_c, option_d, correct_answer
-            question_text = row.get('question', '').strip()
-            if not question_text:
-                continue
-            
-            option_a = row.get('option_a', '').strip()
-            option_b = row.get('option_b', '').strip()
-            option_c = row.get('option_c', '').strip()
-            option_d = row.get('option_d', '').strip()
-            correct_answer = row.get('correct_answer', 'A').strip().upper()
-            
-            if not option_a or not option_b:
-                continue
-            
-            # Validate correct_answer
-            if correct_answer not in ['A', 'B', 'C', 'D']:
-                correct_answer = 'A'
-            
-            # Create question
-            LessonQuizQuestion.objects.create(
-                quiz=quiz,
-                text=question_text,
-                option_a=option_a,
-                option_b=option_b,
-                option_c=option_c if option_c else '',
-                option_d=option_d if option_d else '',
-                correct_option=correct_answer,
-                order=max_order + row_num,
-            )
-            questions_created += 1
-        except Exception as e:
-            # Skip rows with errors but continue processing
-            continue
+    lesson = get_object_or_404(Lesson.objects.select_related('course'), id=lesson_id) if lesson_id else None
+    try:
+        report = import_quiz_file(
+            uploaded_file,
+            default_lesson=lesson,
+            skip_invalid=request.POST.get('skip_invalid') == 'on',
+        )
+    except QuizImportError as e:
+        messages.error(request, str(e))
+        return render(request, 'dashboard/upload_quiz.html', context)
+    
+    if not report.committed:
+        messages.error(request, f'{report.error_rows} row(s) have errors, so nothing was imported. Fix them or tick "Skip invalid rows" to import the rest.')
+    elif report.created:
+        messages.success(request, f'Successfully created {report.created} quiz question(s) in {len(report.lessons)} quiz(zes).')
+        if len(report.lessons) == 1 and not report.error_rows:
+            return redirect('dashboard_lesson_quiz', lesson_id=next(iter(report.lessons)))
+    else:
+        messages.warning(request, 'No questions were created. Please check your file format.')
     
-    return questions_created
+    return render(request, 'dashboard/upload_quiz.html', {**context, 'import_report': report})
 
 
 def generate_ai_quiz(lesson, quiz, num_questions=5):
@@ -1347,87 +1233,30 @@ Only return valid JSON, no additional text."""
         raise Exception(f'AI generation failed: {str(e)}')
 
 
-def parse_pdf_quiz(uploaded_file, quiz):
-    """Parse PDF file and create quiz questions"""
-    # Read PDF content
-    pdf_bytes = uploaded_file.read()
-    pdf_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    
-    text_content = ""
-    for page in pdf_doc:
-        text_content += page.get_text()
-    
-    pdf_doc.close()
-    
-    # Try to parse questions from PDF text
-    # Expected format: Questions should be numbered (1., 2., etc.) with options A, B, C, D
-    questions_created = 0
-    max_order = quiz.questions.aggregate(models.Max('order'))['order__max'] or 0
-    
-    # Split by question numbers (1., 2., etc.)
-    question_pattern = r'(\d+\.\s+.*?)(?=\d+\.|$)'
-    questions_text = re.findall(question_pattern, text_content, re.DOTALL | re.IGNORECASE)
-    
-    for idx, question_block in enumerate(questions_text, start=1):
-        try:
-            lines = [line.strip() for line in question_block.split('\n') if line.strip()]
-            if len(lines) < 3:  # Need at least question + 2 options
-                continue
-            
-            question_text = lines[0].lstrip('0123456789. ').strip()
-            if not question_text:
-                continue
-            
-            # Extract options (looking for A., B., C., D. patterns)
-            options = {}
-            current_option = None
-            option_text = []
-            
-            for line in lines[1:]:
-                # Check if line starts with option letter
-                option_match = re.match(r'^([A-D])[\.\)]\s*(.*)$', line, re.IGNORECASE)
-                if option_match:
-                    # Save previous option if exists
-                    if current_option:
-                        options[current_option] = ' '.join(option_text).strip()
-                    current_option = option_match.group(1).upper()
-                    option_text = [option_match.group(2)]
-                elif current_option:
-                    option_text.append(line)
-            
-            # Save last option
-            if current_option:
-                options[current_option] = ' '.join(option_text).strip()
-            
-            # Need at least A and B options
-            if 'A' not in options or 'B' not in options:
-                continue
-            
-            # Determine correct answer (look for "Answer:" or "Correct:" patterns)
-            correct_answer = 'A'  # Default
-            for line in lines:
-                answer_match = re.search(r'(?:answer|correct)[:\s]+([A-D])', line, re.IGNORECASE)
-                if answer_match:
-                    correct_answer = answer_match.group(1).upper()
-                    break
-            
-            # Create question
-            LessonQuizQuestion.objects.create(
-                quiz=quiz,
-                text=question_text,
-                option_a=options.get('A', ''),
-                option_b=options.get('B', ''),
-                option_c=options.get('C', ''),
-                option_d=options.get('D', ''),
-                correct_option=correct_answer if correct_answer in ['A', 'B', 'C', 'D'] else 'A',
-                order=max_order + idx,
-            )
-            questions_created += 1
-        except Exception as e:
-            # Skip questions with errors
-            continue
-    
-    return questions_created
+@staff_member_required
+def dashboard_quiz_import_job(request, job_id):
+    """Progress and outcome of a background PDF quiz import"""
+    job = get_object_or_404(QuizImportJob.objects.select_related('lesson__course'), id=job_id)
+    return render(request, 'dashboard/quiz_import_job.html', {
+        'job': job,
+    })
+
+
+@staff_member_required
+def quiz_import_job_status(request, job_id):
+    """Progress of a background PDF quiz import"""
+    job = get_object_or_404(QuizImportJob, id=job_id)
+    return JsonResponse({
+        'success': True,
+        'status': job.status,
+        'total_pages': job.total_pages,
+        'processed_pages': job.processed_pages,
+        'progress_percentage': job.progress_percentage,
+        'ocr_pages': job.ocr_pages,
+        'questions_found': job.questions_found,
+        'questions_created': job.questions_created,
+        'error': job.error,
+    })
 
 
 @staff_member_required
@@ -1472,17 +1301,22 @@ def dashboard_student_progress(request):
             Q(course__name__icontains=search_query)
         )
     
+    # Progress rollups for the listed enrollments, keyed by (user, course)
+    rollups = {
+        (row.user_id, row.course_id): row
+        for row in UserCourseProgress.objects.filter(
+            user_id__in=enrollments.values('user_id'),
+            course_id__in=enrollments.values('course_id')
+        )
+    }
+    
     # Calculate progress for each enrollment
     enrollment_data = []
     for enrollment in enrollments:
-        total_lessons = enrollment.course.lessons.count()
-        completed_lessons = UserProgress.objects.filter(
-            user=enrollment.user,
-            lesson__course=enrollment.course,
-            completed=True
-        ).count()
-        
-        progress_percentage = int((completed_lessons / total_lessons * 100)) if total_lessons > 0 else 0
+        rollup = rollups.get((enrollment.user_id, enrollment.course_id))
+        total_lessons = rollup.total_lessons if rollup else enrollment.course.lessons.count()
+        completed_lessons = rollup.completed_lessons if rollup else 0
+        progress_percentage = rollup.progress_percentage if rollup else 0
         
         # Get certification status
         try:
@@ -1589,21 +1423,21 @@ def dashboard_course_progress(request, course_slug):
     # Get all enrollments for this course
     enrollments = CourseEnrollment.objects.filter(course=course).select_related('user')
     
+    # Progress rollups for this course, keyed by user
+    total_lessons = course.lessons.count()
+    rollups = {
+        row.user_id: row
+        for row in UserCourseProgress.objects.filter(course=course)
+    }
+    
     # Calculate progress for each student
     student_progress = []
     for enrollment in enrollments:
-        total_lessons = course.lessons.count()
-        completed_lessons = UserProgress.objects.filter(
-            user=enrollment.user,
-            lesson__course=course,
-            completed=True
-        ).count()
+        rollup = rollups.get(enrollment.user_id)
+        completed_lessons = rollup.completed_lessons if rollup else 0
         
-        # Get average video watch percentage
-        avg_watch = UserProgress.objects.filter(
-            user=enrollment.user,
-            lesson__course=course
-        ).aggregate(avg=Avg('video_watch_percentage'))['avg'] or 0
+        # Average video watch percentage
+        avg_watch = rollup.avg_watch_percentage if rollup else 0
         
         # Get exam attempts
         exam_attempts_count = 0
@@ -1774,23 +1608,67 @@ def add_to_cohort_view(request, user_id):
     
     cohort = get_object_or_404(Cohort, id=cohort_id)
     
-    # Add to cohort
-    member, created = CohortMember.objects.get_or_create(
-        user=user,
-        cohort=cohort
-    )
+    # Add to cohort (grants the cohort's courses)
+    from .utils.access import grant_cohort_access
+    already_member = CohortMember.objects.filter(user=user, cohort=cohort).exists()
+    accesses = grant_cohort_access(user, cohort)
     
-    if created:
-        # Grant access to courses associated with cohort (if any)
-        # Note: This requires adding a many-to-many relationship between Cohort and Course
-        # For now, we'll just add them to the cohort
+    if not already_member:
         message = f'Added to cohort: {cohort.name}'
     else:
         message = f'Already in cohort: {cohort.name}'
     
     return JsonResponse({
         'success': True,
-        'message': message
+        'message': message,
+        'course_count': len(accesses),
+    })
+
+
+@staff_member_required
+@require_http_methods(["POST"])
+def cohort_courses_view(request, cohort_id):
+    """Attach courses to / detach courses from a cohort; members are synced in the background"""
+    cohort = get_object_or_404(Cohort, id=cohort_id)
+    action = request.POST.get('action', 'attach')
+    course_ids = [int(course_id) for course_id in request.POST.getlist('course_ids[]') if str(course_id).isdigit()]
+    
+    courses = list(Course.objects.filter(id__in=course_ids))
+    if not courses:
+        return JsonResponse({'success': False, 'error': 'Courses required'}, status=400)
+    if action not in ('attach', 'detach'):
+        return JsonResponse({'success': False, 'error': 'Invalid action'}, status=400)
+    
+    # cohort_courses_changed signal queues the CohortSyncJob
+    latest_job_id = cohort.sync_jobs.values_list('id', flat=True).first() or 0
+    if action == 'attach':
+        cohort.courses.add(*courses)
+    else:
+        cohort.courses.remove(*courses)
+    job = cohort.sync_jobs.filter(id__gt=latest_job_id).first()
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'{len(courses)} course(s) {action}ed - updating {cohort.get_member_count()} members',
+        'job_id': job.id if job else None,
+    })
+
+
+@staff_member_required
+def cohort_sync_job_status(request, job_id):
+    """Progress of a cohort access fan-out"""
+    job = get_object_or_404(CohortSyncJob, id=job_id)
+    return JsonResponse({
+        'success': True,
+        'status': job.status,
+        'action': job.action,
+        'total_members': job.total_members,
+        'processed_members': job.processed_members,
+        'progress_percentage': job.progress_percentage,
+        'granted_count': job.granted_count,
+        'revoked_count': job.revoked_count,
+        'skipped_count': job.skipped_count,
+        'error': job.error,
     })
 
 
@@ -1817,7 +1695,7 @@ def bulk_access_management(request):
 @require_http_methods(["POST"])
 def bulk_grant_access_view(request):
     """Bulk grant course access to multiple students"""
-    from .utils.access import grant_course_access
+    from .utils.access import bulk_grant_course_access
     from django.utils import timezone
     from datetime import timedelta
     
@@ -1827,6 +1705,10 @@ def bulk_grant_access_view(request):
     expires_in_days = request.POST.get('expires_in_days', '')
     notes = request.POST.get('notes', '')
     
+    # Ignore anything that isn't an id
+    user_ids = [int(user_id) for user_id in user_ids if str(user_id).isdigit()]
+    course_ids = [int(course_id) for course_id in course_ids if str(course_id).isdigit()]
+    
     if not user_ids or not course_ids:
         return JsonResponse({'success': False, 'error': 'Users and courses required'}, status=400)
     
@@ -1839,362 +1721,44 @@ def bulk_grant_access_view(request):
         except ValueError:
             pass
     
-    granted_count = 0
-    for user_id in user_ids:
-        try:
-            user = User.objects.get(id=user_id)
-            for course_id in course_ids:
-                try:
-                    course = Course.objects.get(id=course_id)
-                    # Check if access already exists
-                    existing = CourseAccess.objects.filter(
-                        user=user,
-                        course=course,
-                        status='unlocked'
-                    ).first()
-                    if not existing:
-                        grant_course_access(
-                            user=user,
-                            course=course,
-                            access_type=access_type,
-                            granted_by=request.user,
-                            expires_at=expires_at,
-                            notes=notes
-                        )
-                        granted_count += 1
-                except Course.DoesNotExist:
-                    continue
-        except User.DoesNotExist:
-            continue
+    granted_count, skipped_count = bulk_grant_course_access(
+        user_ids,
+        course_ids,
+        access_type=access_type,
+        granted_by=request.user,
+        expires_at=expires_at,
+        notes=notes
+    )
     
     return JsonResponse({
         'success': True,
         'message': f'Granted {granted_count} access records',
-        'granted_count': granted_count
+        'granted_count': granted_count,
+        'skipped_count': skipped_count,
     })
 
 
 @staff_member_required
 def dashboard_analytics(request):
-    """Comprehensive analytics dashboard"""
+    """
+    Comprehensive analytics dashboard.
+    Reads the AnalyticsDailySnapshot rollup (see utils/analytics.py); only the
+    "most active students" list is queried live.
+    """
     from datetime import timedelta
+    from .utils.analytics import get_analytics_summary
     
-    # Date ranges
     now = timezone.now()
-    last_7_days = now - timedelta(days=7)
-    last_30_days = now - timedelta(days=30)
-    last_90_days = now - timedelta(days=90)
-    
-    # Student Analytics
-    total_students = User.objects.filter(is_staff=False, is_superuser=False).count()
-    active_students = User.objects.filter(
-        is_staff=False, is_superuser=False,
-        last_login__gte=last_30_days
-    ).count()
-    new_students_7d = User.objects.filter(
-        is_staff=False, is_superuser=False,
-        date_joined__gte=last_7_days
-    ).count()
-    new_students_30d = User.objects.filter(
-        is_staff=False, is_superuser=False,
-        date_joined__gte=last_30_days
-    ).count()
-    inactive_students = User.objects.filter(
-        is_staff=False, is_superuser=False,
-        last_login__lt=last_90_days
-    ).count()
-    
-    # Enrollment Analytics
-    total_enrollments = CourseEnrollment.objects.count()
-    enrollments_7d = CourseEnrollment.objects.filter(enrolled_at__gte=last_7_days).count()
-    enrollments_30d = CourseEnrollment.objects.filter(enrolled_at__gte=last_30_days).count()
-    
-    # Access Analytics
-    total_accesses = CourseAccess.objects.filter(status='unlocked').count()
-    expired_accesses = CourseAccess.objects.filter(status='expired').count()
-    pending_accesses = CourseAccess.objects.filter(status='pending').count()
-    
-    # Progress Analytics
-    total_progress = UserProgress.objects.count()
-    completed_lessons = UserProgress.objects.filter(completed=True).count()
-    progress_7d = UserProgress.objects.filter(last_accessed__gte=last_7_days).count()
-    completion_rate = (completed_lessons / total_progress * 100) if total_progress > 0 else 0
-    
-    # Certification Analytics
-    total_certifications = Certification.objects.count()
-    certifications_7d = Certification.objects.filter(
-        issued_at__gte=last_7_days
-    ).count() if Certification.objects.filter(issued_at__isnull=False).exists() else 0
-    certifications_30d = Certification.objects.filter(
-        issued_at__gte=last_30_days
-    ).count() if Certification.objects.filter(issued_at__isnull=False).exists() else 0
-    
-    # Course Performance Detailed
-    course_performance_detailed = []
-    for course in Course.objects.all():
-        enrollments = CourseEnrollment.objects.filter(course=course).count()
-        accesses = CourseAccess.objects.filter(course=course, status='unlocked').count()
-        total_students_course = enrollments + accesses
-        
-        total_lessons_course = course.lessons.count()
-        completed = UserProgress.objects.filter(
-            lesson__course=course,
-            completed=True
-        ).count()
-        total_possible = total_lessons_course * total_students_course
-        course_completion_rate = (completed / total_possible * 100) if total_possible > 0 else 0
-        
-        certifications_course = Certification.objects.filter(course=course, status='passed').count()
-        
-        # Recent activity
-        recent_enrollments = CourseEnrollment.objects.filter(
-            course=course,
-            enrolled_at__gte=last_7_days
-        ).count()
-        
-        course_performance_detailed.append({
-            'course': course,
-            'total_students': total_students_course,
-            'completion_rate': min(course_completion_rate, 100),
-            'certifications': certifications_course,
-            'lessons': total_lessons_course,
-            'recent_enrollments': recent_enrollments,
-            'completed_lessons': completed,
-        })
-    
-    # Sort by total students
-    course_performance_detailed.sort(key=lambda x: x['total_students'], reverse=True)
-    
-    # Enrollment trend (last 30 days)
-    enrollment_trend = []
-    for i in range(30, 0, -1):
-        date = now - timedelta(days=i)
-        count = CourseEnrollment.objects.filter(
-            enrolled_at__date=date.date()
-        ).count()
-        enrollment_trend.append({
-            'date': date.strftime('%m/%d'),
-            'count': count
-        })
-    
-    # Certification trend (last 30 days)
-    certification_trend = []
-    if Certification.objects.filter(issued_at__isnull=False).exists():
-        for i in range(30, 0, -1):
-            date = now - timedelta(days=i)
-            count = Certification.objects.filter(
-                issued_at__date=date.date()
-            ).count()
-            certification_trend.append({
-                'date': date.strftime('%m/%d'),
-                'count': count
-            })
-    
-    # Top performing courses
-    top_courses = sorted(course_performance_detailed, key=lambda x: x['total_students'], reverse=True)[:5]
+    context = get_analytics_summary(now)
     
     # Most active students
-    active_students_list = User.objects.filter(
+    context['active_students_list'] = User.objects.filter(
         is_staff=False, is_superuser=False
     ).annotate(
-        progress_count=Count('progress', filter=Q(progress__last_accessed__gte=last_7_days))
+        progress_count=Count('progress', filter=Q(progress__last_accessed__gte=now - timedelta(days=7)))
     ).filter(progress_count__gt=0).order_by('-progress_count')[:10]
     
-    # Additional Phase 1 Analytics
-    
-    # Students with zero progress
-    students_with_progress = UserProgress.objects.values_list('user_id', flat=True).distinct()
-    students_zero_progress = User.objects.filter(
-        is_staff=False, is_superuser=False
-    ).exclude(id__in=students_with_progress).count()
-    
-    # Students who completed at least one course
-    students_with_completions = UserProgress.objects.filter(
-        completed=True
-    ).values_list('user_id', flat=True).distinct().count()
-    
-    # Average lessons completed per student
-    total_lessons_completed = UserProgress.objects.filter(completed=True).count()
-    avg_lessons_per_student = round(total_lessons_completed / total_students, 1) if total_students > 0 else 0
-    
-    # Course completion rates by course type
-    course_type_stats = {}
-    for course_type, _ in Course.COURSE_TYPES:
-        courses_of_type = Course.objects.filter(course_type=course_type)
-        total_enrollments_type = CourseEnrollment.objects.filter(course__in=courses_of_type).count()
-        total_accesses_type = CourseAccess.objects.filter(course__in=courses_of_type, status='unlocked').count()
-        total_students_type = total_enrollments_type + total_accesses_type
-        
-        total_lessons_type = sum(c.lessons.count() for c in courses_of_type)
-        completed_lessons_type = UserProgress.objects.filter(
-            lesson__course__in=courses_of_type,
-            completed=True
-        ).count()
-        completion_rate_type = (completed_lessons_type / (total_lessons_type * total_students_type * 100)) if total_students_type > 0 and total_lessons_type > 0 else 0
-        
-        course_type_stats[course_type] = {
-            'total_courses': courses_of_type.count(),
-            'total_students': total_students_type,
-            'completion_rate': min(completion_rate_type * 100, 100),
-        }
-    
-    # Certification rate (certifications / eligible students)
-    students_with_all_lessons = []
-    for course in Course.objects.all():
-        total_lessons = course.lessons.count()
-        if total_lessons > 0:
-            enrollments = CourseEnrollment.objects.filter(course=course)
-            accesses = CourseAccess.objects.filter(course=course, status='unlocked')
-            for enrollment in enrollments:
-                completed = UserProgress.objects.filter(
-                    user=enrollment.user,
-                    lesson__course=course,
-                    completed=True
-                ).count()
-                if completed >= total_lessons:
-                    students_with_all_lessons.append((enrollment.user.id, course.id))
-            for access in accesses:
-                completed = UserProgress.objects.filter(
-                    user=access.user,
-                    lesson__course=course,
-                    completed=True
-                ).count()
-                if completed >= total_lessons:
-                    students_with_all_lessons.append((access.user.id, course.id))
-    
-    eligible_students_count = len(set(students_with_all_lessons))
-    certification_rate = (total_certifications / eligible_students_count * 100) if eligible_students_count > 0 else 0
-    
-    # Trophy distribution
-    trophy_distribution = {
-        'bronze': 0,  # 1 certification
-        'silver': 0,  # 3 certifications
-        'gold': 0,    # 5 certifications
-        'platinum': 0, # 8 certifications
-        'diamond': 0,  # 12 certifications
-        'ultimate': 0  # 20 certifications
-    }
-    for user in User.objects.filter(is_staff=False, is_superuser=False):
-        cert_count = Certification.objects.filter(user=user, status='passed').count()
-        if cert_count >= 20:
-            trophy_distribution['ultimate'] += 1
-        elif cert_count >= 12:
-            trophy_distribution['diamond'] += 1
-        elif cert_count >= 8:
-            trophy_distribution['platinum'] += 1
-        elif cert_count >= 5:
-            trophy_distribution['gold'] += 1
-        elif cert_count >= 3:
-            trophy_distribution['silver'] += 1
-        elif cert_count >= 1:
-            trophy_distribution['bronze'] += 1
-    
-    # Exam & Quiz Analytics
-    total_exam_attempts = ExamAttempt.objects.count()
-    passed_exams = ExamAttempt.objects.filter(passed=True).count()
-    exam_pass_rate = (passed_exams / total_exam_attempts * 100) if total_exam_attempts > 0 else 0
-    avg_exam_score = ExamAttempt.objects.aggregate(Avg('score'))['score__avg'] or 0
-    
-    total_quiz_attempts = LessonQuizAttempt.objects.count()
-    passed_quizzes = LessonQuizAttempt.objects.filter(passed=True).count()
-    quiz_pass_rate = (passed_quizzes / total_quiz_attempts * 100) if total_quiz_attempts > 0 else 0
-    avg_quiz_score = LessonQuizAttempt.objects.aggregate(Avg('score'))['score__avg'] or 0
-    
-    # Access Source Analytics
-    access_by_method = {
-        'enrollment': CourseEnrollment.objects.count(),
-        'course_access': CourseAccess.objects.filter(status='unlocked').count(),
-        'bundle': BundlePurchase.objects.count(),
-        'cohort': CohortMember.objects.count(),
-    }
-    
-    # Drop-off analysis (students who started but didn't complete)
-    students_who_started = set()
-    students_who_completed = set()
-    for course in Course.objects.all():
-        enrollments = CourseEnrollment.objects.filter(course=course)
-        accesses = CourseAccess.objects.filter(course=course, status='unlocked')
-        total_lessons = course.lessons.count()
-        
-        for enrollment in enrollments:
-            students_who_started.add(enrollment.user.id)
-            completed = UserProgress.objects.filter(
-                user=enrollment.user,
-                lesson__course=course,
-                completed=True
-            ).count()
-            if completed >= total_lessons and total_lessons > 0:
-                students_who_completed.add(enrollment.user.id)
-        
-        for access in accesses:
-            students_who_started.add(access.user.id)
-            completed = UserProgress.objects.filter(
-                user=access.user,
-                lesson__course=course,
-                completed=True
-            ).count()
-            if completed >= total_lessons and total_lessons > 0:
-                students_who_completed.add(access.user.id)
-    
-    drop_off_count = len(students_who_started) - len(students_who_completed)
-    drop_off_rate = (drop_off_count / len(students_who_started) * 100) if len(students_who_started) > 0 else 0
-    
-    return render(request, 'dashboard/analytics.html', {
-        # Student metrics
-        'total_students': total_students,
-        'active_students': active_students,
-        'new_students_7d': new_students_7d,
-        'new_students_30d': new_students_30d,
-        'inactive_students': inactive_students,
-        
-        # Enrollment metrics
-        'total_enrollments': total_enrollments,
-        'enrollments_7d': enrollments_7d,
-        'enrollments_30d': enrollments_30d,
-        
-        # Access metrics
-        'total_accesses': total_accesses,
-        'expired_accesses': expired_accesses,
-        'pending_accesses': pending_accesses,
-        
-        # Progress metrics
-        'total_progress': total_progress,
-        'completed_lessons': completed_lessons,
-        'progress_7d': progress_7d,
-        'completion_rate': round(completion_rate, 1),
-        
-        # Certification metrics
-        'total_certifications': total_certifications,
-        'certifications_7d': certifications_7d,
-        'certifications_30d': certifications_30d,
-        
-        # Detailed data
-        'course_performance': course_performance_detailed,
-        'enrollment_trend': enrollment_trend,
-        'certification_trend': certification_trend,
-        'top_courses': top_courses,
-        'active_students_list': active_students_list,
-        
-        # Additional Phase 1 Analytics
-        'students_zero_progress': students_zero_progress,
-        'students_with_completions': students_with_completions,
-        'avg_lessons_per_student': avg_lessons_per_student,
-        'course_type_stats': course_type_stats,
-        'certification_rate': round(certification_rate, 1),
-        'trophy_distribution': trophy_distribution,
-        'total_exam_attempts': total_exam_attempts,
-        'passed_exams': passed_exams,
-        'exam_pass_rate': round(exam_pass_rate, 1),
-        'avg_exam_score': round(avg_exam_score, 1),
-        'total_quiz_attempts': total_quiz_attempts,
-        'passed_quizzes': passed_quizzes,
-        'quiz_pass_rate': round(quiz_pass_rate, 1),
-        'avg_quiz_score': round(avg_quiz_score, 1),
-        'access_by_method': access_by_method,
-        'drop_off_count': drop_off_count,
-        'drop_off_rate': round(drop_off_rate, 1),
-        'eligible_students_count': eligible_students_count,
-    })
+    return render(request, 'dashboard/analytics.html', context)
 
 
 # Helper functions (imported from views.py or defined here)
@@ -0,0 +1,81 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from myApp.models import ActivityEvent, Certification, ExamAttempt, LessonQuizAttempt, UserProgress
+
+
+class Command(BaseCommand):
+    help = 'Create ActivityEvents for activity recorded before the activity log existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run even if the activity log already has events (may duplicate progress events; attempts and certifications are skipped if already recorded)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if ActivityEvent.objects.exists() and not options['force']:
+            self.stdout.write(self.style.WARNING('⚠️  Activity log is not empty - use --force to backfill anyway'))
+            return
+
+        events = []
+
+        completions = UserProgress.objects.filter(completed=True, completed_at__isnull=False).values_list(
+            'user_id', 'lesson_id', 'lesson__course_id', 'completed_at', 'video_watch_percentage'
+        )
+        for user_id, lesson_id, course_id, completed_at, watch_percentage in completions:
+            events.append(ActivityEvent(
+                user_id=user_id, event_type='lesson_completed', course_id=course_id, lesson_id=lesson_id,
+                created_at=completed_at, data={'watch_percentage': watch_percentage}
+            ))
+
+        in_progress = UserProgress.objects.filter(completed=False, video_watch_percentage__gte=50).values_list(
+            'user_id', 'lesson_id', 'lesson__course_id', 'last_accessed', 'video_watch_percentage', 'status'
+        )
+        for user_id, lesson_id, course_id, last_accessed, watch_percentage, status in in_progress:
+            events.append(ActivityEvent(
+                user_id=user_id, event_type='progress_update', course_id=course_id, lesson_id=lesson_id,
+                created_at=last_accessed, data={'watch_percentage': watch_percentage, 'status': status}
+            ))
+
+        quiz_attempts = LessonQuizAttempt.objects.values_list(
+            'id', 'user_id', 'quiz__lesson_id', 'quiz__lesson__course_id', 'completed_at', 'score', 'passed'
+        )
+        for attempt_id, user_id, lesson_id, course_id, completed_at, score, passed in quiz_attempts:
+            events.append(ActivityEvent(
+                user_id=user_id, event_type='quiz_attempt', course_id=course_id, lesson_id=lesson_id,
+                source_id=attempt_id, created_at=completed_at, data={'attempt_id': attempt_id, 'score': score, 'passed': passed}
+            ))
+
+        attempt_numbers = Counter()
+        exam_attempts = ExamAttempt.objects.order_by('started_at', 'id').values_list(
+            'id', 'user_id', 'exam_id', 'exam__course_id', 'started_at', 'score', 'passed'
+        )
+        for attempt_id, user_id, exam_id, course_id, started_at, score, passed in exam_attempts:
+            attempt_numbers[(user_id, exam_id)] += 1
+            events.append(ActivityEvent(
+                user_id=user_id, event_type='exam_attempt', course_id=course_id, source_id=attempt_id,
+                created_at=started_at,
+                data={
+                    'attempt_id': attempt_id, 'score': score, 'passed': passed,
+                    'attempt_number': attempt_numbers[(user_id, exam_id)],
+                }
+            ))
+
+        certifications = Certification.objects.filter(issued_at__isnull=False).values_list(
+            'id', 'user_id', 'course_id', 'issued_at', 'accredible_certificate_id'
+        )
+        for certification_id, user_id, course_id, issued_at, certificate_id in certifications:
+            events.append(ActivityEvent(
+                user_id=user_id, event_type='certification_issued', course_id=course_id, source_id=certification_id,
+                created_at=issued_at,
+                data={'certification_id': certification_id, 'certificate_id': certificate_id}
+            ))
+
+        # Insert oldest first so id order matches time order for the feed
+        events.sort(key=lambda event: event.created_at)
+        ActivityEvent.objects.bulk_create(events, batch_size=options['batch_size'], ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Backfilled {len(events)} activity events'))
@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from myApp.utils.completion import compute_completion_stats
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the completion/drop-off engine on synthetic data (no database access)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--courses', type=int, default=50)
+        parser.add_argument('--courses-per-user', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Also time a per-pair Python loop and check both give the same numbers',
+        )
+
+    def handle(self, *args, **options):
+        started, progress, lesson_totals = self.make_data(options)
+        self.stdout.write(
+            f'{options["users"]} users, {options["courses"]} courses, '
+            f'{len(started)} started pairs, {len(progress)} progress rows'
+        )
+
+        began = time.monotonic()
+        stats = compute_completion_stats(started, progress, lesson_totals)
+        elapsed = time.monotonic() - began
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Vectorized: {elapsed:.3f}s - started {stats["students_started"]}, '
+            f'completed {stats["students_completed"]}, drop-off {stats["drop_off_rate"]:.1f}%, '
+            f'eligible {stats["eligible_students_count"]}'
+        ))
+
+        if options['compare']:
+            began = time.monotonic()
+            expected = self.loop_stats(started, progress, lesson_totals)
+            loop_elapsed = time.monotonic() - began
+            actual = (stats['students_started'], stats['students_completed'], stats['eligible_students_count'])
+            if actual != expected:
+                self.stdout.write(self.style.ERROR(f'❌ Mismatch: vectorized {actual}, loop {expected}'))
+                return
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Python loop: {loop_elapsed:.3f}s ({loop_elapsed / max(elapsed, 1e-9):.0f}x slower), same results'
+            ))
+
+    def make_data(self, options):
+        rng = np.random.default_rng(options['seed'])
+        users = options['users']
+        courses = options['courses']
+        per_user = options['courses_per_user']
+
+        lesson_totals = pd.Series(rng.integers(0, 30, size=courses), index=np.arange(1, courses + 1))
+
+        user_ids = np.repeat(np.arange(1, users + 1), per_user)
+        course_ids = rng.integers(1, courses + 1, size=len(user_ids))
+        started = pd.DataFrame({'user_id': user_ids, 'course_id': course_ids})
+
+        # Most started pairs have some progress; about a third finish the course
+        with_progress = started.sample(frac=0.8, random_state=options['seed']).drop_duplicates()
+        totals = with_progress['course_id'].map(lesson_totals).to_numpy()
+        finished = rng.random(len(with_progress)) < 0.33
+        partial = (rng.random(len(with_progress)) * totals).astype(np.int64)
+        progress = with_progress.assign(completed=np.where(finished, totals, partial))
+        progress = progress[progress['completed'] > 0]
+
+        return started, progress, lesson_totals
+
+    def loop_stats(self, started, progress, lesson_totals):
+        """Reference: the per-pair loop the dashboard used to run, over the same data"""
+        totals = lesson_totals.to_dict()
+        completed_by_pair = {
+            (user_id, course_id): completed
+            for user_id, course_id, completed in progress.itertuples(index=False)
+        }
+        pairs = set(started.itertuples(index=False, name=None))
+        started_users = set()
+        completed_users = set()
+        eligible = 0
+        for user_id, course_id in pairs:
+            started_users.add(user_id)
+            total = totals.get(course_id, 0)
+            if total > 0 and completed_by_pair.get((user_id, course_id), 0) >= total:
+                completed_users.add(user_id)
+                eligible += 1
+        return len(started_users), len(completed_users), eligible
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from myApp.models import LessonQuiz
+from myApp.utils.quiz_analysis import build_quiz_analysis
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached per-question quiz statistics (run from a scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, help='Only the quiz with this id')
+
+    def handle(self, *args, **options):
+        quizzes = LessonQuiz.objects.all()
+        if options['quiz']:
+            quizzes = quizzes.filter(id=options['quiz'])
+
+        started = time.monotonic()
+        built = 0
+        for quiz in quizzes.only('id'):
+            analysis = build_quiz_analysis(quiz)
+            built += 1
+            self.stdout.write(
+                f'  Quiz {quiz.id}: {analysis["attempts"]} attempts in {analysis["compute_seconds"]:.2f}s'
+            )
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Analysed {built} quizzes in {elapsed:.2f}s'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from myApp.models import Lesson
+from myApp.utils.watch_heatmap import build_lesson_heatmap
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the cached per-lesson watch heatmaps (run from a scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Only lessons of the course with this slug')
+
+    def handle(self, *args, **options):
+        lessons = Lesson.objects.filter(vimeo_duration_seconds__gt=0)
+        if options['course']:
+            lessons = lessons.filter(course__slug=options['course'])
+
+        started = time.monotonic()
+        built = 0
+        for lesson in lessons.only('id', 'vimeo_duration_seconds'):
+            heatmap = build_lesson_heatmap(lesson)
+            built += 1
+            self.stdout.write(f'  Lesson {lesson.id}: {heatmap["viewers"]} viewers in {heatmap["compute_seconds"]:.2f}s')
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Built {built} watch heatmaps in {elapsed:.2f}s'))
@@ -0,0 +1,106 @@
+import csv
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Lower
+from django.utils import timezone
+from myApp.models import Course, CourseAccess
+from myApp.utils.access import bulk_grant_course_access
+
+
+class Command(BaseCommand):
+    help = 'Grant course access to every user listed in a CSV file (email or username column)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str, help='CSV with an "email" or "username" header')
+        parser.add_argument(
+            '--course',
+            action='append',
+            dest='courses',
+            required=True,
+            help='Course slug or id to grant (can be repeated)',
+        )
+        parser.add_argument(
+            '--access-type',
+            default='manual',
+            choices=[choice for choice, _ in CourseAccess.ACCESS_TYPES],
+        )
+        parser.add_argument('--expires-in-days', type=int, help='Access expires after this many days')
+        parser.add_argument('--notes', default='', help='Notes stored on each access record')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        courses = self.resolve_courses(options['courses'])
+        emails, usernames = self.read_identifiers(options['csv_file'])
+
+        user_ids = set()
+        found_emails = set()
+        found_usernames = set()
+        if emails:
+            matches = User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+            for user_id, email in matches.values_list('id', 'email_lower'):
+                user_ids.add(user_id)
+                found_emails.add(email)
+        if usernames:
+            for user_id, username in User.objects.filter(username__in=usernames).values_list('id', 'username'):
+                user_ids.add(user_id)
+                found_usernames.add(username)
+
+        missing = sorted(set(emails) - found_emails) + sorted(set(usernames) - found_usernames)
+        for identifier in missing[:20]:
+            self.stdout.write(self.style.WARNING(f'⚠️  No user found for {identifier}'))
+        if len(missing) > 20:
+            self.stdout.write(self.style.WARNING(f'⚠️  ...and {len(missing) - 20} more'))
+
+        expires_at = None
+        if options.get('expires_in_days'):
+            expires_at = timezone.now() + timedelta(days=options['expires_in_days'])
+
+        self.stdout.write(f'Granting {len(courses)} courses to {len(user_ids)} users...')
+        started = time.monotonic()
+        granted, skipped = bulk_grant_course_access(
+            user_ids,
+            [course.id for course in courses],
+            access_type=options['access_type'],
+            expires_at=expires_at,
+            notes=options['notes'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Granted {granted} access records, skipped {skipped} existing ({elapsed:.2f}s)'
+        ))
+
+    def resolve_courses(self, identifiers):
+        courses = []
+        for identifier in identifiers:
+            lookup = {'id': int(identifier)} if identifier.isdigit() else {'slug': identifier}
+            course = Course.objects.filter(**lookup).first()
+            if not course:
+                raise CommandError(f'Course not found: {identifier}')
+            courses.append(course)
+        return courses
+
+    def read_identifiers(self, path):
+        """Return (emails, usernames) from the CSV; emails are matched case-insensitively"""
+        try:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.DictReader(f)
+                fields = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+                if 'email' not in fields and 'username' not in fields:
+                    raise CommandError('CSV needs an "email" or "username" column')
+
+                emails, usernames = set(), set()
+                for row in reader:
+                    email = (row.get(fields.get('email', ''), '') or '').strip().lower()
+                    username = (row.get(fields.get('username', ''), '') or '').strip()
+                    if email:
+                        emails.add(email)
+                    elif username:
+                        usernames.add(username)
+                return emails, usernames
+        except FileNotFoundError:
+            raise CommandError(f'File not found: {path}')
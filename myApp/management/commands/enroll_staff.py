@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from myApp.utils.access import enroll_staff_in_courses
+
+
+class Command(BaseCommand):
+    help = 'Enroll staff and superusers in every active course they are not enrolled in yet'
+
+    def handle(self, *args, **options):
+        created = enroll_staff_in_courses()
+        self.stdout.write(self.style.SUCCESS(f'✅ Created {created} staff enrollments'))
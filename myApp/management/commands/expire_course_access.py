@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from myApp.models import CourseAccess
+from myApp.utils.access import expire_course_accesses
+
+
+class Command(BaseCommand):
+    help = 'Mark course accesses past their expiry date as expired (run from a scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many accesses would be expired',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        due = CourseAccess.objects.filter(status='unlocked', expires_at__lt=now)
+
+        if options['dry_run']:
+            self.stdout.write(f'{due.count()} accesses are past their expiry date')
+            return
+
+        started = time.monotonic()
+        expired = expire_course_accesses(now=now, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Expired {expired} accesses in {elapsed:.2f}s'))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from myApp.utils.heartbeats import flush_heartbeats
+
+
+class Command(BaseCommand):
+    help = 'Write buffered video progress heartbeats to UserProgress (run from a scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Flush even if the flush interval has not passed yet',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        flushed = flush_heartbeats(force=options['force'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Flushed {flushed} lesson progress rows in {elapsed:.2f}s'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from myApp.models import CourseEnrollment
+from myApp.utils.access import migrate_legacy_enrollments
+
+
+class Command(BaseCommand):
+    help = 'Create CourseAccess records for legacy CourseEnrollments that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, help='Only migrate this username')
+
+    def handle(self, *args, **options):
+        enrollments = CourseEnrollment.objects.all()
+        if options.get('user'):
+            enrollments = enrollments.filter(user__username=options['user'])
+
+        self.stdout.write(f'Checking {enrollments.count()} enrollments...')
+        created = migrate_legacy_enrollments(enrollments)
+        self.stdout.write(self.style.SUCCESS(f'✅ Granted access for {len(created)} legacy enrollments'))
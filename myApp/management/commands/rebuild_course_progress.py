@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from myApp.utils.progress import rebuild_user_course_progress
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UserCourseProgress rollup from UserProgress'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            type=int,
+            action='append',
+            dest='course_ids',
+            help='Only rebuild this course id (can be repeated)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        course_ids = options.get('course_ids')
+        scope = f"courses {', '.join(map(str, course_ids))}" if course_ids else 'all courses'
+        self.stdout.write(f'Rebuilding course progress for {scope}...')
+
+        started = time.monotonic()
+        rows = rebuild_user_course_progress(course_ids=course_ids, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Wrote {rows} progress rows in {elapsed:.2f}s'))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from myApp.models import Cohort, CohortSyncJob
+from myApp.utils.cohorts import run_cohort_sync_job
+
+
+class Command(BaseCommand):
+    help = 'Run cohort access fan-out jobs in the foreground (pending jobs, or a full resync of one cohort)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help='Run (or re-run) this job id')
+        parser.add_argument('--cohort', type=int, help="Grant this cohort's courses to all of its members")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options.get('job'):
+            jobs = CohortSyncJob.objects.filter(id=options['job'])
+            if not jobs.exists():
+                raise CommandError(f"Job {options['job']} not found")
+        elif options.get('cohort'):
+            cohort = Cohort.objects.filter(id=options['cohort']).first()
+            if not cohort:
+                raise CommandError(f"Cohort {options['cohort']} not found")
+            course_ids = sorted(cohort.courses.values_list('id', flat=True))
+            job = CohortSyncJob.objects.create(cohort=cohort, action='grant', course_ids=course_ids)
+            jobs = CohortSyncJob.objects.filter(id=job.id)
+        else:
+            # Jobs whose thread never started or died with the worker
+            jobs = CohortSyncJob.objects.filter(status__in=['pending', 'processing']).order_by('created_at')
+
+        for job in jobs.select_related('cohort'):
+            self.stdout.write(f'{job.get_action_display()} {len(job.course_ids)} courses for cohort {job.cohort.name}...')
+            started = time.monotonic()
+            job = run_cohort_sync_job(job, batch_size=options['batch_size'])
+            elapsed = time.monotonic() - started
+
+            if job.status == 'failed':
+                self.stdout.write(self.style.ERROR(f'❌ Job {job.id} failed: {job.error}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'✅ Job {job.id}: {job.processed_members} members, {job.granted_count} granted, '
+                    f'{job.revoked_count} revoked, {job.skipped_count} skipped ({elapsed:.2f}s)'
+                ))
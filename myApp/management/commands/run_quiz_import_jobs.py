@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from myApp.models import QuizImportJob
+from myApp.utils.pdf_quiz import fail_quiz_import_job, run_quiz_import_job
+
+
+class Command(BaseCommand):
+    help = 'Resume (or fail) PDF quiz import jobs whose background thread never started or died with the worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--job', type=int, help='Run this unfinished job id now, stale or not')
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=60,
+            help='Pending/processing jobs with no progress saved for this long are considered stale (default 60)',
+        )
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Mark stale jobs as failed and delete their uploads instead of resuming them',
+        )
+        parser.add_argument('--workers', type=int, help='OCR worker processes (default PDF_IMPORT_WORKERS)')
+
+    def handle(self, *args, **options):
+        if options.get('job'):
+            jobs = QuizImportJob.objects.filter(id=options['job'], status__in=['pending', 'processing'])
+            if not jobs.exists():
+                raise CommandError(f"Job {options['job']} not found or already finished")
+        else:
+            cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+            # A running job saves progress at least every PROGRESS_SAVE_SECONDS
+            jobs = QuizImportJob.objects.filter(
+                status__in=['pending', 'processing'], updated_at__lt=cutoff
+            ).order_by('created_at')
+
+        for job in jobs.select_related('lesson__course'):
+            # Both claim the job from the state it was read in, so two runs of this
+            # command can't both pick it up and a run that's still alive stops
+            if options['fail'] or not job.source_path:
+                if fail_quiz_import_job(job, 'Import stopped before it finished; upload the file again.'):
+                    self.stdout.write(self.style.WARNING(f'Job {job.id} ({job.file_name}) marked as failed'))
+                continue
+
+            self.stdout.write(f'Importing {job.file_name} into {job.lesson.title}...')
+            started = time.monotonic()
+            finished = run_quiz_import_job(job, workers=options.get('workers'))
+            elapsed = time.monotonic() - started
+
+            if finished is None:
+                self.stdout.write(self.style.WARNING(f'Job {job.id} skipped: another run claimed it'))
+            elif job.status == 'failed':
+                self.stdout.write(self.style.ERROR(f'❌ Job {job.id} failed: {job.error}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'✅ Job {job.id}: {job.total_pages} pages ({job.ocr_pages} OCR), '
+                    f'{job.questions_created}/{job.questions_found} questions created ({elapsed:.2f}s)'
+                ))
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Q
+
+
+def populate_user_course_progress(apps, schema_editor):
+    """Backfill the rollup from existing UserProgress rows"""
+    Lesson = apps.get_model('myApp', 'Lesson')
+    UserProgress = apps.get_model('myApp', 'UserProgress')
+    UserCourseProgress = apps.get_model('myApp', 'UserCourseProgress')
+
+    lesson_totals = dict(
+        Lesson.objects.values('course_id').annotate(total=Count('id')).values_list('course_id', 'total')
+    )
+    started = Q(completed=True) | Q(video_watch_percentage__gt=0) | Q(status__in=['in_progress', 'completed'])
+    grouped = UserProgress.objects.values('user_id', 'lesson__course_id').annotate(
+        completed_lessons=Count('id', filter=Q(completed=True)),
+        started_lessons=Count('id', filter=started),
+        avg_watch=Avg('video_watch_percentage'),
+        last_activity=Max('last_accessed'),
+    )
+    UserCourseProgress.objects.bulk_create([
+        UserCourseProgress(
+            user_id=row['user_id'],
+            course_id=row['lesson__course_id'],
+            completed_lessons=row['completed_lessons'],
+            total_lessons=lesson_totals.get(row['lesson__course_id'], 0),
+            avg_watch_percentage=row['avg_watch'] or 0.0,
+            has_any_progress=row['started_lessons'] > 0,
+            last_activity=row['last_activity'],
+        )
+        for row in grouped
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0013_add_ai_chatbot_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_lessons', models.IntegerField(default=0)),
+                ('total_lessons', models.IntegerField(default=0, help_text='Lessons in the course when last refreshed')),
+                ('avg_watch_percentage', models.FloatField(default=0.0)),
+                ('has_any_progress', models.BooleanField(default=False, help_text='Any lesson started, watched or completed')),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_progress_rollups', to='myApp.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_progress', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'completed_lessons'], name='myApp_userc_course__b714ff_idx')],
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.RunPython(populate_user_course_progress, migrations.RunPython.noop),
+    ]
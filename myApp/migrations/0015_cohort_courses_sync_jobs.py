@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0014_usercourseprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cohort',
+            name='courses',
+            field=models.ManyToManyField(blank=True, help_text='Members get access to these courses (granted in the background)', related_name='cohorts', to='myApp.course'),
+        ),
+        migrations.CreateModel(
+            name='CohortSyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('grant', 'Grant'), ('revoke', 'Revoke')], max_length=10)),
+                ('course_ids', models.JSONField(default=list, help_text='Courses attached/detached')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_members', models.IntegerField(default=0)),
+                ('processed_members', models.IntegerField(default=0)),
+                ('granted_count', models.IntegerField(default=0)),
+                ('revoked_count', models.IntegerField(default=0)),
+                ('skipped_count', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('cohort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_jobs', to='myApp.cohort')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
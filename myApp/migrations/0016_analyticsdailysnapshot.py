@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0015_cohort_courses_sync_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsDailySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('new_students', models.IntegerField(default=0)),
+                ('new_enrollments', models.IntegerField(default=0)),
+                ('new_certifications', models.IntegerField(default=0)),
+                ('total_students', models.IntegerField(default=0, help_text='Enrollments + unlocked accesses')),
+                ('lessons', models.IntegerField(default=0)),
+                ('completed_lessons', models.IntegerField(default=0)),
+                ('certifications', models.IntegerField(default=0, help_text='Passed certifications')),
+                ('completers', models.IntegerField(default=0, help_text='Enrolled/unlocked students who completed every lesson')),
+                ('totals', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(blank=True, help_text='Empty for the site-wide row', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='analytics_snapshots', to='myApp.course')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['course', 'date'], name='myApp_analy_course__8b1d66_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'course'), name='unique_course_snapshot_per_day'), models.UniqueConstraint(condition=models.Q(('course__isnull', True)), fields=('date',), name='unique_site_snapshot_per_day')],
+            },
+        ),
+    ]
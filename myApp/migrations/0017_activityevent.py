@@ -0,0 +1,33 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0016_analyticsdailysnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('lesson_completed', 'Lesson Completed'), ('progress_update', 'Progress Update'), ('quiz_attempt', 'Quiz Attempt'), ('exam_attempt', 'Exam Attempt'), ('certification_issued', 'Certification Issued')], max_length=30)),
+                ('data', models.JSONField(blank=True, default=dict, help_text='Event details (score, watch percentage, ...)')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='myApp.course')),
+                ('lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='myApp.lesson')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['user', '-id'], name='myApp_activ_user_id_01f4cc_idx'), models.Index(fields=['event_type', '-id'], name='myApp_activ_event_t_ceb8b8_idx')],
+            },
+        ),
+    ]
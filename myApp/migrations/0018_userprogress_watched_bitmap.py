@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0017_activityevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='watched_bitmap',
+            field=models.BinaryField(blank=True, default=b'', help_text='Watched seconds of the video, one bit per second (see utils/coverage.py)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0018_userprogress_watched_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='rewatched_bitmap',
+            field=models.BinaryField(blank=True, default=b'', help_text='Seconds of the video watched more than once, one bit per second'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0019_userprogress_rewatched_bitmap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lessonquizattempt',
+            name='answers',
+            field=models.BinaryField(blank=True, default=b'', help_text="Chosen option per answer key question, one byte each (b'-' = unanswered)"),
+        ),
+        migrations.CreateModel(
+            name='LessonQuizAnswerKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(help_text='Hash of the question ids and correct options', max_length=40)),
+                ('question_ids', models.JSONField(default=list)),
+                ('correct_options', models.BinaryField(help_text="Correct option per question, one byte each (b'A'-b'D')")),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_keys', to='myApp.lessonquiz')),
+            ],
+            options={
+                'unique_together': {('quiz', 'version')},
+            },
+        ),
+        migrations.AddField(
+            model_name='lessonquizattempt',
+            name='answer_key',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='attempts', to='myApp.lessonquizanswerkey'),
+        ),
+    ]
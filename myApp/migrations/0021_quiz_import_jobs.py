@@ -0,0 +1,40 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0020_lesson_quiz_answer_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(max_length=255)),
+                ('source_path', models.CharField(help_text='Temporary copy of the upload, removed when the job finishes', max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_pages', models.IntegerField(default=0)),
+                ('processed_pages', models.IntegerField(default=0)),
+                ('ocr_pages', models.IntegerField(default=0, help_text='Pages without a text layer that went through OCR')),
+                ('questions_found', models.IntegerField(default=0)),
+                ('questions_created', models.IntegerField(default=0)),
+                ('problems', models.JSONField(blank=True, default=list, help_text='Skipped pages/questions: {page, question, messages}')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='quiz_import_jobs', to=settings.AUTH_USER_MODEL)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_import_jobs', to='myApp.lesson')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
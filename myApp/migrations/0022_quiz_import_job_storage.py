@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0021_quiz_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='quizimportjob',
+            name='source_path',
+            field=models.CharField(help_text='Upload in default storage, removed when the job finishes', max_length=500),
+        ),
+    ]
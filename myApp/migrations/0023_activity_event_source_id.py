@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-17 04:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Once-only event types and the data key holding their source id
+SOURCE_KEYS = {
+    'quiz_attempt': 'attempt_id',
+    'exam_attempt': 'attempt_id',
+    'certification_issued': 'certification_id',
+}
+
+
+def populate_source_ids(apps, schema_editor):
+    """Copy source ids out of the event data; the oldest event wins where one was recorded twice"""
+    ActivityEvent = apps.get_model('myApp', 'ActivityEvent')
+    for event_type, key in SOURCE_KEYS.items():
+        seen = set()
+        batch = []
+        for event in ActivityEvent.objects.filter(event_type=event_type).order_by('id').only('id', 'data').iterator():
+            source_id = (event.data or {}).get(key)
+            if not isinstance(source_id, int) or source_id in seen:
+                continue
+            seen.add(source_id)
+            event.source_id = source_id
+            batch.append(event)
+            if len(batch) >= 1000:
+                ActivityEvent.objects.bulk_update(batch, ['source_id'])
+                batch = []
+        ActivityEvent.objects.bulk_update(batch, ['source_id'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0022_quiz_import_job_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activityevent',
+            name='source_id',
+            field=models.BigIntegerField(blank=True, help_text='Id of the attempt/certification behind a once-only event; unique per event type', null=True),
+        ),
+        migrations.RunPython(populate_source_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='activityevent',
+            constraint=models.UniqueConstraint(fields=('event_type', 'source_id'), name='unique_activity_event_source'),
+        ),
+    ]
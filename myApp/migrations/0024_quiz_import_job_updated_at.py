@@ -0,0 +1,25 @@
+# Generated by Django 5.1.2 on 2026-10-17 09:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myApp', '0023_activity_event_source_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizimportjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='Last progress save; old ones mark a stale job'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='quizimportjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, help_text='Set by the run that holds the job', null=True),
+        ),
+    ]
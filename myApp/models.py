@@ -73,16 +73,16 @@ class Course(models.Model):
         return self.name
     
     def get_lesson_count(self):
+        # The catalog annotates lesson_total so listing pages skip the per-course COUNT
+        if hasattr(self, 'lesson_total'):
+            return self.lesson_total
         return self.lessons.count()
     
     def get_user_progress(self, user):
         if not user.is_authenticated:
             return 0
-        completed = UserProgress.objects.filter(user=user, lesson__course=self, completed=True).count()
-        total = self.lessons.count()
-        if total == 0:
-            return 0
-        return int((completed / total) * 100)
+        rollup = UserCourseProgress.objects.filter(user=user, course=self).first()
+        return rollup.progress_percentage if rollup else 0
 
 
 class Module(models.Model):
@@ -261,12 +261,34 @@ class LessonQuizQuestion(models.Model):
         return f"Q{self.order} for {self.quiz.lesson.title}"
 
 
+class LessonQuizAnswerKey(models.Model):
+    """
+    Compiled answer key of a lesson quiz: question ids in order and their
+    correct options, one byte each. A new version is stored whenever the
+    questions change, so old attempts keep the key they were graded with.
+    See utils/quiz_keys.py.
+    """
+    quiz = models.ForeignKey(LessonQuiz, on_delete=models.CASCADE, related_name='answer_keys')
+    version = models.CharField(max_length=40, help_text="Hash of the question ids and correct options")
+    question_ids = models.JSONField(default=list)
+    correct_options = models.BinaryField(help_text="Correct option per question, one byte each (b'A'-b'D')")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['quiz', 'version']
+
+    def __str__(self):
+        return f"Answer key {self.version[:8]} for {self.quiz}"
+
+
 class LessonQuizAttempt(models.Model):
     """Track a student's attempts for a lesson quiz."""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='lesson_quiz_attempts')
     quiz = models.ForeignKey(LessonQuiz, on_delete=models.CASCADE, related_name='attempts')
     score = models.FloatField(null=True, blank=True, help_text="Score percentage (0–100)")
     passed = models.BooleanField(default=False)
+    answer_key = models.ForeignKey(LessonQuizAnswerKey, on_delete=models.SET_NULL, null=True, blank=True, related_name='attempts')
+    answers = models.BinaryField(default=b'', blank=True, help_text="Chosen option per answer key question, one byte each (b'-' = unanswered)")
     completed_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -276,6 +298,48 @@ class LessonQuizAttempt(models.Model):
         status = "Passed" if self.passed else "Failed"
         return f"{self.user.username} - {self.quiz.lesson.title} - {status}"
 
+
+class QuizImportJob(models.Model):
+    """Background extraction of quiz questions from an uploaded PDF (see utils/pdf_quiz.py)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='quiz_import_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='quiz_import_jobs')
+    file_name = models.CharField(max_length=255)
+    source_path = models.CharField(max_length=500, help_text="Upload in default storage, removed when the job finishes")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+
+    # Progress
+    total_pages = models.IntegerField(default=0)
+    processed_pages = models.IntegerField(default=0)
+    ocr_pages = models.IntegerField(default=0, help_text="Pages without a text layer that went through OCR")
+    questions_found = models.IntegerField(default=0)
+    questions_created = models.IntegerField(default=0)
+    problems = models.JSONField(default=list, blank=True, help_text="Skipped pages/questions: {page, question, messages}")
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, help_text="Set by the run that holds the job")
+    updated_at = models.DateTimeField(auto_now=True, help_text="Last progress save; old ones mark a stale job")
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_name} - {self.lesson.title} - {self.get_status_display()}"
+
+    @property
+    def progress_percentage(self):
+        if self.total_pages == 0:
+            return 100 if self.status == 'completed' else 0
+        return int(self.processed_pages / self.total_pages * 100)
+
 class UserProgress(models.Model):
     STATUS_CHOICES = [
         ('not_started', 'Not Started'),
@@ -294,6 +358,8 @@ class UserProgress(models.Model):
     video_watch_percentage = models.FloatField(default=0.0, help_text="Percentage of video watched (0-100)")
     last_watched_timestamp = models.FloatField(default=0.0, help_text="Last timestamp in seconds where video was watched")
     video_completion_threshold = models.FloatField(default=90.0, help_text="Required watch percentage to complete (default 90%)")
+    watched_bitmap = models.BinaryField(default=b'', blank=True, help_text="Watched seconds of the video, one bit per second (see utils/coverage.py)")
+    rewatched_bitmap = models.BinaryField(default=b'', blank=True, help_text="Seconds of the video watched more than once, one bit per second")
     
     last_accessed = models.DateTimeField(auto_now=True)
     started_at = models.DateTimeField(null=True, blank=True)
@@ -305,6 +371,11 @@ class UserProgress(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.lesson.title}"
     
+    def get_watch_coverage(self):
+        """Percentage of the video's seconds actually watched (0-100)"""
+        from .utils.coverage import bitmap_to_int, coverage_percentage
+        return coverage_percentage(bitmap_to_int(self.watched_bitmap), self.lesson.vimeo_duration_seconds)
+    
     def update_status(self):
         """Automatically update status based on progress"""
         if self.video_watch_percentage >= self.video_completion_threshold:
@@ -321,6 +392,41 @@ class UserProgress(models.Model):
         self.save()
 
 
+class UserCourseProgress(models.Model):
+    """
+    Per-user, per-course rollup of UserProgress.
+    Kept up to date by signals (see utils/progress.py); rebuild with
+    `python manage.py rebuild_course_progress`. A missing row means no progress.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='user_progress_rollups')
+    completed_lessons = models.IntegerField(default=0)
+    total_lessons = models.IntegerField(default=0, help_text="Lessons in the course when last refreshed")
+    avg_watch_percentage = models.FloatField(default=0.0)
+    has_any_progress = models.BooleanField(default=False, help_text="Any lesson started, watched or completed")
+    last_activity = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'course']
+        indexes = [
+            models.Index(fields=['course', 'completed_lessons']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.course.name} ({self.progress_percentage}%)"
+
+    @property
+    def progress_percentage(self):
+        if self.total_lessons == 0:
+            return 0
+        return int((self.completed_lessons / self.total_lessons) * 100)
+
+    @property
+    def is_complete(self):
+        return self.total_lessons > 0 and self.completed_lessons >= self.total_lessons
+
+
 class CourseEnrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='enrollments')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='enrollments')
@@ -346,13 +452,11 @@ class CourseEnrollment(models.Model):
         """Check if exam is available based on payment type and course completion"""
         if self.payment_type == 'full':
             # Check if all lessons are completed
-            total_lessons = self.course.lessons.count()
-            completed_lessons = UserProgress.objects.filter(
-                user=self.user,
-                lesson__course=self.course,
-                completed=True
-            ).count()
-            return completed_lessons >= total_lessons
+            rollup = UserCourseProgress.objects.filter(user=self.user, course=self.course).first()
+            if rollup:
+                return rollup.completed_lessons >= rollup.total_lessons
+            # No progress yet - only available if the course has no lessons
+            return not self.course.lessons.exists()
         else:
             return self.days_until_exam() == 0
     
@@ -470,24 +574,12 @@ class Cohort(models.Model):
     name = models.CharField(max_length=200, unique=True)
     description = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-    
-    class Meta:
-        ordering = ['-created_at']
-    
-    def __str__(self):
-        return self.name
-    
-    def get_member_count(self):
-        return self.members.count()
-# ========== ACCESS CONTROL SYSTEM ==========
-
-class Cohort(models.Model):
-    """Groups of students (e.g., 'Black Friday 2025 Buyers', 'VIP Mastermind')"""
-    name = models.CharField(max_length=200, unique=True)
-    description = models.TextField(blank=True)
-    is_active = models.BooleanField(default=True)
+    courses = models.ManyToManyField(
+        Course,
+        related_name='cohorts',
+        blank=True,
+        help_text="Members get access to these courses (granted in the background)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -655,6 +747,49 @@ class CohortMember(models.Model):
         return f"{self.user.username} - {self.cohort.name}"
 
 
+class CohortSyncJob(models.Model):
+    """Background fan-out of cohort course access to every member"""
+    ACTION_CHOICES = [
+        ('grant', 'Grant'),
+        ('revoke', 'Revoke'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    cohort = models.ForeignKey(Cohort, on_delete=models.CASCADE, related_name='sync_jobs')
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    course_ids = models.JSONField(default=list, help_text="Courses attached/detached")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    
+    # Progress
+    total_members = models.IntegerField(default=0)
+    processed_members = models.IntegerField(default=0)
+    granted_count = models.IntegerField(default=0)
+    revoked_count = models.IntegerField(default=0)
+    skipped_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.cohort.name} - {self.get_action_display()} - {self.get_status_display()}"
+    
+    @property
+    def progress_percentage(self):
+        if self.total_members == 0:
+            return 100 if self.status == 'completed' else 0
+        return int(self.processed_members / self.total_members * 100)
+
+
 class LearningPath(models.Model):
     """Curated learning journeys (e.g., '7-Figure Launch Path')"""
     name = models.CharField(max_length=200)
@@ -684,3 +819,95 @@ class LearningPathCourse(models.Model):
     def __str__(self):
         return f"{self.learning_path.name} - {self.course.name} (#{self.order})"
 
+
+
+# ========== ANALYTICS ==========
+
+class AnalyticsDailySnapshot(models.Model):
+    """
+    Daily analytics rollup read by the dashboard analytics page.
+    One site-wide row per day (course is null) plus one row per course per day.
+    Built by `python manage.py build_analytics_snapshots` (see utils/analytics.py).
+    """
+    date = models.DateField()
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='analytics_snapshots',
+        help_text="Empty for the site-wide row"
+    )
+    
+    # Activity on this day
+    new_students = models.IntegerField(default=0)
+    new_enrollments = models.IntegerField(default=0)
+    new_certifications = models.IntegerField(default=0)
+    
+    # Per-course state as of the last build on this day
+    total_students = models.IntegerField(default=0, help_text="Enrollments + unlocked accesses")
+    lessons = models.IntegerField(default=0)
+    completed_lessons = models.IntegerField(default=0)
+    certifications = models.IntegerField(default=0, help_text="Passed certifications")
+    completers = models.IntegerField(default=0, help_text="Enrolled/unlocked students who completed every lesson")
+    
+    # Site-wide headline numbers and trophy histogram (site row only)
+    totals = models.JSONField(default=dict, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'course'], name='unique_course_snapshot_per_day'),
+            models.UniqueConstraint(
+                fields=['date'],
+                condition=models.Q(course__isnull=True),
+                name='unique_site_snapshot_per_day'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'date']),
+        ]
+    
+    def __str__(self):
+        scope = self.course.name if self.course_id else 'Site'
+        return f"{scope} - {self.date}"
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only log of student activity, written where the activity happens.
+    Backs the dashboard activity feeds; read newest-first by id (keyset pagination).
+    """
+    EVENT_TYPES = [
+        ('lesson_completed', 'Lesson Completed'),
+        ('progress_update', 'Progress Update'),
+        ('quiz_attempt', 'Quiz Attempt'),
+        ('exam_attempt', 'Exam Attempt'),
+        ('certification_issued', 'Certification Issued'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_events')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='activity_events')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, null=True, blank=True, related_name='activity_events')
+    data = models.JSONField(default=dict, blank=True, help_text="Event details (score, watch percentage, ...)")
+    source_id = models.BigIntegerField(
+        null=True, blank=True,
+        help_text="Id of the attempt/certification behind a once-only event; unique per event type"
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['user', '-id']),
+            models.Index(fields=['event_type', '-id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['event_type', 'source_id'], name='unique_activity_event_source'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.get_event_type_display()} - {self.created_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,213 @@
+"""
+Model signal handlers
+Keeps cached/derived data in sync when the underlying models change.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import (
+    Course, Lesson, Module, LessonQuizQuestion, UserProgress, CourseEnrollment, CourseAccess, Cohort, CohortMember, ExamAttempt, Certification
+)
+from .utils.access import enroll_staff_in_courses, migrate_legacy_enrollments
+from .utils.activity import record_certification_issued, record_exam_attempt
+from .utils.entitlements import invalidate_entitlements
+from .utils.heartbeats import invalidate_progress_state
+from .utils.cohorts import queue_cohort_sync, sync_member_joined, sync_member_left
+from .utils.quiz_keys import invalidate_answer_key
+from .utils.prerequisites import build_prerequisite_graph, invalidate_prerequisite_graph, validate_prerequisites
+from .utils.navigation import invalidate_course_navigation
+from .utils.progress import (
+    refresh_user_course_progress, refresh_user_course_progress_many, refresh_course_lesson_totals
+)
+
+
+@receiver(post_init, sender=Lesson)
+@receiver(post_init, sender=Module)
+def remember_course(sender, instance, **kwargs):
+    """Keep the course a lesson/module was loaded with, to spot moves to another course"""
+    if 'course_id' not in instance.get_deferred_fields():
+        instance._loaded_course_id = instance.course_id
+
+
+def _moved_from_course(instance):
+    """The previous course id if this save moved the instance to another course, else None"""
+    previous = getattr(instance, '_loaded_course_id', None)
+    instance._loaded_course_id = instance.course_id
+    return previous if previous and previous != instance.course_id else None
+
+
+def _deleted_with(origin, *models):
+    """True if a delete cascading from origin (an instance or a queryset) started at one of models"""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(origin_model, models)
+
+
+def _progress_user_ids(lesson_id):
+    return set(UserProgress.objects.filter(lesson_id=lesson_id).values_list('user_id', flat=True))
+
+
+@receiver(pre_delete, sender=Lesson)
+def lesson_deleting(sender, instance, origin=None, **kwargs):
+    """Note whose progress the cascade removes; their rollups are refreshed once, in lesson_changed"""
+    if not _deleted_with(origin, Course):  # the course's rollups go with it
+        instance._progress_user_ids = _progress_user_ids(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def lesson_changed(sender, instance, **kwargs):
+    """Lesson order/module/course changed - rebuild course navigation on next read"""
+    invalidate_course_navigation(instance.course_id)
+    if kwargs.get('signal') is post_delete:
+        if not _deleted_with(kwargs.get('origin'), Course):
+            refresh_course_lesson_totals(instance.course_id)
+            refresh_user_course_progress_many(
+                (user_id, instance.course_id) for user_id in getattr(instance, '_progress_user_ids', ())
+            )
+        return
+
+    moved_from = _moved_from_course(instance)
+    if moved_from:
+        invalidate_course_navigation(moved_from)
+        refresh_course_lesson_totals(moved_from)
+        # The lesson's progress now counts towards the new course
+        refresh_user_course_progress_many(
+            (user_id, course_id)
+            for user_id in _progress_user_ids(instance.id)
+            for course_id in (moved_from, instance.course_id)
+        )
+    if kwargs.get('created') or moved_from:
+        refresh_course_lesson_totals(instance.course_id)
+
+
+@receiver([post_save, post_delete], sender=Module)
+def module_changed(sender, instance, **kwargs):
+    """Module order/course changed or module removed - rebuild course navigation"""
+    invalidate_course_navigation(instance.course_id)
+    moved_from = _moved_from_course(instance) if kwargs.get('signal') is post_save else None
+    if moved_from:
+        invalidate_course_navigation(moved_from)
+
+
+@receiver([post_save, post_delete], sender=UserProgress)
+def user_progress_changed(sender, instance, **kwargs):
+    """Keep the UserCourseProgress rollup and the heartbeat state for this user/lesson current"""
+    invalidate_progress_state(instance.user_id, instance.lesson_id)
+    if kwargs.get('signal') is post_delete:
+        origin = kwargs.get('origin')
+        if origin is not None and not _deleted_with(origin, UserProgress):
+            # Cascade from a lesson (lesson_changed refreshes the rollups once) or a user (they go with it)
+            return
+        course_id = Lesson.objects.filter(id=instance.lesson_id).values_list('course_id', flat=True).first()
+    else:
+        course_id = instance.lesson.course_id
+    if course_id:
+        refresh_user_course_progress(instance.user_id, course_id)
+
+
+@receiver([post_save, post_delete], sender=LessonQuizQuestion)
+def quiz_question_changed(sender, instance, **kwargs):
+    """Question added/edited/removed - recompile the quiz's answer key on next grade"""
+    invalidate_answer_key(instance.quiz_id)
+
+
+@receiver(post_save, sender=CourseEnrollment)
+def enrollment_created(sender, instance, created, **kwargs):
+    """New legacy enrollment - give it a CourseAccess record like a purchase"""
+    if created:
+        migrate_legacy_enrollments(CourseEnrollment.objects.filter(pk=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=CourseAccess)
+@receiver([post_save, post_delete], sender=CohortMember)
+def entitlements_changed(sender, instance, **kwargs):
+    """Access granted/revoked/edited or cohort membership changed - drop the user's snapshot"""
+    invalidate_entitlements(instance.user_id)
+
+
+@receiver(post_save, sender=CohortMember)
+def cohort_member_joined(sender, instance, created, **kwargs):
+    """New cohort member - grant the cohort's courses"""
+    if created:
+        sync_member_joined(instance)
+
+
+@receiver(post_delete, sender=CohortMember)
+def cohort_member_left(sender, instance, **kwargs):
+    """Member removed - revoke cohort access (honors remove_access_on_leave)"""
+    sync_member_left(instance)
+
+
+@receiver(m2m_changed, sender=Cohort.courses.through)
+def cohort_courses_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Courses attached to/detached from a cohort - fan out to members in the background"""
+    if action == 'pre_clear':
+        # pk_set is not provided for clear(), remember what is being removed
+        related = instance.cohorts if reverse else instance.courses
+        instance._cleared_pks = set(related.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_pks', set())
+        action = 'post_remove'
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    sync_action = 'grant' if action == 'post_add' else 'revoke'
+    if reverse:
+        # course.cohorts.add(...) - one job per cohort for this course
+        for cohort in Cohort.objects.filter(id__in=pk_set):
+            queue_cohort_sync(cohort, sync_action, [instance.id])
+    else:
+        queue_cohort_sync(instance, sync_action, pk_set)
+
+
+@receiver(m2m_changed, sender=Course.prerequisite_courses.through)
+def prerequisites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reject prerequisite cycles before they are saved; drop the cached graph after changes"""
+    if action == 'pre_add' and pk_set:
+        graph = build_prerequisite_graph()
+        if reverse:
+            # prereq.unlocks_courses.add(...) - instance becomes a prerequisite of each course
+            for course_id in pk_set:
+                validate_prerequisites(course_id, [instance.id], graph)
+        else:
+            validate_prerequisites(instance.id, pk_set, graph)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_prerequisite_graph()
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    """Prerequisite rows go with the course (no m2m_changed on cascade)"""
+    invalidate_prerequisite_graph()
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, **kwargs):
+    """Active course - make sure staff are enrolled (kept off the dashboard request path)"""
+    if instance.status == 'active':
+        course_id = instance.id
+        transaction.on_commit(lambda: enroll_staff_in_courses(course_ids=[course_id]))
+
+
+@receiver(post_save, sender=User)
+def staff_user_saved(sender, instance, update_fields=None, **kwargs):
+    """New or promoted staff user - enroll them in the active courses"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    if instance.is_staff or instance.is_superuser:
+        user_id = instance.id
+        transaction.on_commit(lambda: enroll_staff_in_courses(user_ids=[user_id]))
+
+
+@receiver(post_save, sender=ExamAttempt)
+def exam_attempt_saved(sender, instance, **kwargs):
+    """Exam attempt has a result - add it to the activity feed (once)"""
+    record_exam_attempt(instance)
+
+
+@receiver(post_save, sender=Certification)
+def certification_saved(sender, instance, **kwargs):
+    """Certification issued - add it to the activity feed (once)"""
+    record_certification_issued(instance)
@@ -1,3 +1,816 @@
-from django.test import TestCase
+import io
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Certification, Cohort, CohortMember, CohortSyncJob, Course, CourseAccess, CourseEnrollment, Exam, ExamAttempt,
+    FavoriteCourse, Lesson, LessonQuizQuestion, QuizImportJob, UserCourseProgress, UserProgress
+)
+from .dashboard_views import DASHBOARD_HOME_CACHE_KEY, _build_dashboard_home_context
+from .utils.cohorts import run_cohort_sync_job
+from .utils.coverage import merge_bitmaps
+from .utils.heartbeats import (
+    CacheHeartbeatBuffer, LocalHeartbeatBuffer, flush_heartbeats, get_heartbeat_buffer, record_heartbeat, record_heartbeat_batch
+)
+from .utils.navigation import CourseNavigation
+from .utils.pdf_extract import PDF_AVAILABLE
+from .utils import pdf_quiz
+from .utils.pdf_quiz import queue_quiz_import, run_quiz_import_job
+from .utils import quiz_import
+from .utils.quiz_import import DOCX_AVAILABLE, XLSX_AVAILABLE, QuestionParser, import_quiz_file
+from .utils.unlock import compute_accessible_lessons
+
+
+def legacy_accessible_lessons(lessons, module_ids, completed):
+    """
+    Reference copy of the original lesson_detail lock rules, run over plain data.
+
+    lessons: list of (lesson_id, module_id) in (order, id) order
+    module_ids: course module ids in (order, id) order
+    completed: set of completed lesson ids
+    """
+    accessible = []
+    if not lessons:
+        return set()
+    accessible.append(lessons[0][0])
+
+    def module_lessons(module_id):
+        return [lesson_id for lesson_id, m in lessons if m == module_id]
+
+    for position, (lesson_id, module_id) in enumerate(lessons[1:], start=1):
+        is_first_in_module = False
+        if module_id:
+            if module_lessons(module_id)[0] == lesson_id:
+                is_first_in_module = True
+                current_module_index = None
+                for idx, m in enumerate(module_ids):
+                    if m == module_id:
+                        current_module_index = idx
+                        break
+                if current_module_index and current_module_index > 0:
+                    prev_module_lessons = module_lessons(module_ids[current_module_index - 1])
+                    if prev_module_lessons:
+                        if any(l in completed for l in prev_module_lessons):
+                            accessible.append(lesson_id)
+                            continue
+
+        if not is_first_in_module:
+            if module_id:
+                siblings = module_lessons(module_id)
+                idx = siblings.index(lesson_id)
+                if idx > 0 and siblings[idx - 1] in completed:
+                    accessible.append(lesson_id)
+                    continue
+
+            if all(l in completed for l, _ in lessons[:position]):
+                accessible.append(lesson_id)
+
+    return set(accessible)
+
+
+class LessonUnlockParityTests(SimpleTestCase):
+    """compute_accessible_lessons must match the original lock rules exactly"""
+
+    def assert_parity(self, lessons, module_ids, completed):
+        navigation = CourseNavigation(1, lessons, module_ids)
+        self.assertEqual(
+            compute_accessible_lessons(navigation, set(completed)),
+            legacy_accessible_lessons(lessons, module_ids, set(completed)),
+            msg=f"lessons={lessons} modules={module_ids} completed={sorted(completed)}",
+        )
+
+    def test_empty_course(self):
+        self.assert_parity([], [], set())
+
+    def test_no_modules_sequential(self):
+        lessons = [(1, None), (2, None), (3, None)]
+        self.assert_parity(lessons, [], set())
+        self.assert_parity(lessons, [], {1})
+        self.assert_parity(lessons, [], {1, 2})
+        self.assert_parity(lessons, [], {2})
+
+    def test_next_module_unlocks_when_previous_module_started(self):
+        lessons = [(1, 10), (2, 10), (3, 20), (4, 20)]
+        navigation = CourseNavigation(1, lessons, [10, 20])
+        self.assertEqual(compute_accessible_lessons(navigation, {1}), {1, 2, 3})
+        self.assert_parity(lessons, [10, 20], {1})
+
+    def test_empty_previous_module_blocks_first_lesson(self):
+        lessons = [(1, 10), (2, 30)]
+        self.assert_parity(lessons, [10, 20, 30], {1})
+
+    def test_lessons_before_first_module(self):
+        lessons = [(1, None), (2, 10), (3, 10)]
+        self.assert_parity(lessons, [10], {1})
+        self.assert_parity(lessons, [10], {1, 2})
+
+    def test_randomized_outlines(self):
+        rng = random.Random(20260101)
+        for _ in range(500):
+            module_ids = list(range(100, 100 + rng.randint(0, 5)))
+            lessons = []
+            for lesson_id in range(1, rng.randint(1, 15) + 1):
+                module_id = rng.choice(module_ids + [None]) if module_ids else None
+                lessons.append((lesson_id, module_id))
+            completed = {lesson_id for lesson_id, _ in lessons if rng.random() < 0.4}
+            self.assert_parity(lessons, module_ids, completed)
+
+
+class CacheIsolatedTestCase(TestCase):
+    """Cached navigation/entitlements are keyed by id, and ids are reused between tests"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+class CourseCatalogQueryCountTests(CacheIsolatedTestCase):
+    """The /courses/ page must cost the same number of queries for any catalog size"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('student', password='pass')
+        self.client.force_login(self.user)
+        self.course_count = 0
+
+    def add_courses(self, count):
+        for _ in range(count):
+            self.course_count += 1
+            n = self.course_count
+            course = Course.objects.create(
+                name=f'Course {n}', slug=f'course-{n}',
+                short_description='Short', description='Description',
+            )
+            lessons = [
+                Lesson.objects.create(course=course, title=f'Lesson {i}', slug=f'lesson-{i}', order=i)
+                for i in range(3)
+            ]
+            if n % 2:
+                UserProgress.objects.create(user=self.user, lesson=lessons[0], completed=True)
+            if n % 3 == 0:
+                FavoriteCourse.objects.create(user=self.user, course=course)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('courses'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self.add_courses(3)
+        small, _ = self.count_queries()
+        self.add_courses(20)
+        large, response = self.count_queries()
+        self.assertEqual(small, large)
+
+        in_progress = response.context['in_progress_courses']
+        not_started = response.context['not_started_courses']
+        self.assertEqual(len(in_progress), 12)
+        self.assertEqual(len(not_started), 11)
+        self.assertTrue(all(data['progress_percentage'] == 33 for data in in_progress))
+        favorited = {data['course'].slug for data in response.context['courses_data'] if data['is_favorited']}
+        self.assertEqual(favorited, {f'course-{n}' for n in range(3, 24, 3)})
+        self.assertContains(response, reverse('lesson_detail', args=['course-1', 'lesson-0']))
+
+    def test_filters_still_apply(self):
+        self.add_courses(4)
+        response = self.client.get(reverse('courses'), {'search': 'Course 2'})
+        self.assertEqual([data['course'].slug for data in response.context['courses_data']], ['course-2'])
+
+
+class StudentDashboardQueryCountTests(CacheIsolatedTestCase):
+    """The student dashboard must not run per-course queries for My Courses"""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('student', password='pass')
+        self.client.force_login(self.user)
+        self.course_count = 0
+
+    def add_owned_courses(self, count):
+        for _ in range(count):
+            self.course_count += 1
+            n = self.course_count
+            course = Course.objects.create(
+                name=f'Course {n}', slug=f'course-{n}',
+                short_description='Short', description='Description',
+            )
+            lesson = Lesson.objects.create(course=course, title='Lesson', slug='lesson', order=0)
+            UserProgress.objects.create(user=self.user, lesson=lesson, completed=n % 2 == 0)
+            exam = Exam.objects.create(course=course, title=f'Exam {n}')
+            ExamAttempt.objects.create(user=self.user, exam=exam, passed=n % 2 == 0)
+            if n % 2:
+                # Legacy enrollment - access is granted by the enrollment signal
+                CourseEnrollment.objects.create(user=self.user, course=course)
+            else:
+                CourseAccess.objects.create(user=self.user, course=course, access_type='manual')
+                Certification.objects.create(user=self.user, course=course, status='passed')
+                FavoriteCourse.objects.create(user=self.user, course=course)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('student_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_query_count_is_constant(self):
+        self.add_owned_courses(2)
+        small, _ = self.count_queries()
+        self.add_owned_courses(10)
+        large, response = self.count_queries()
+        self.assertEqual(small, large)
+
+        my_courses = response.context['my_courses']
+        self.assertEqual(len(my_courses), 12)
+        for data in my_courses:
+            owned_by_access = int(data['course'].slug.split('-')[1]) % 2 == 0
+            self.assertEqual(data['progress_percentage'], 100 if owned_by_access else 0)
+            self.assertEqual(data['exam_info']['passed'], owned_by_access)
+            self.assertEqual(data['is_favorited'], owned_by_access)
+            self.assertIsNotNone(data['access_record'])
+
+    def test_dashboard_does_not_write(self):
+        self.add_owned_courses(3)
+        access_count = CourseAccess.objects.count()
+        self.count_queries()
+        self.assertEqual(CourseAccess.objects.count(), access_count)
+
+
+class DashboardHomeCacheTests(CacheIsolatedTestCase):
+    """The staff overview is built in constant queries and a cold miss never waits in the request"""
+
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('staff', password='pass', is_staff=True)
+        self.course_count = 0
+
+    def add_courses(self, count):
+        for _ in range(count):
+            self.course_count += 1
+            n = self.course_count
+            course = Course.objects.create(
+                name=f'Course {n}', slug=f'course-{n}', short_description='Short', description='Description',
+            )
+            lesson = Lesson.objects.create(course=course, title='Lesson', slug='lesson', order=0)
+            student = User.objects.create_user(f'student{n}', password='pass')
+            CourseEnrollment.objects.create(user=student, course=course)
+            UserProgress.objects.create(user=student, lesson=lesson, completed=True)
+            Certification.objects.create(user=student, course=course, status='passed')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            context = _build_dashboard_home_context()
+        return len(ctx.captured_queries), context
+
+    def test_build_query_count_is_constant(self):
+        self.add_courses(2)
+        small, _ = self.count_queries()
+        self.add_courses(10)
+        large, context = self.count_queries()
+        self.assertEqual(small, large)
+
+        self.assertEqual(len(context['course_performance']), 10)
+        for performance in context['course_performance']:
+            self.assertEqual((performance['lessons'], performance['certifications']), (1, 1))
+            # One CourseEnrollment plus the CourseAccess its signal grants
+            self.assertEqual(performance['total_students'], 2)
+        self.assertEqual(len(context['enrollment_trend']), 30)
+
+    def test_cold_miss_being_computed_serves_a_placeholder(self):
+        cache.add(f'{DASHBOARD_HOME_CACHE_KEY}:refreshing', True)  # another request is computing it
+        self.client.force_login(self.staff)
+        with mock.patch('myApp.dashboard_views._build_dashboard_home_context') as build:
+            response = self.client.get(reverse('dashboard_home'))
+        build.assert_not_called()
+        self.assertTrue(response['X-Dashboard-Cache'].startswith('pending'))
+        self.assertContains(response, 'The overview is being computed')
+
+
+class CourseProgressRollupTests(CacheIsolatedTestCase):
+    """UserCourseProgress follows lessons that move between courses or are deleted"""
+
+    def setUp(self):
+        super().setUp()
+        self.course, self.other = [
+            Course.objects.create(name=name, slug=name, short_description='Short', description='Description')
+            for name in ('first', 'second')
+        ]
+        self.lesson = Lesson.objects.create(course=self.course, title='Moving', slug='moving', order=1)
+        Lesson.objects.create(course=self.course, title='Staying', slug='staying', order=0)
+        Lesson.objects.create(course=self.other, title='Other', slug='other', order=0)
+
+    def add_progress(self, count):
+        for n in range(count):
+            user = User.objects.create_user(f'student{n}', password='pass')
+            UserProgress.objects.create(
+                user=user, lesson=self.lesson, completed=True, status='completed', video_watch_percentage=100,
+            )
+
+    def rollups(self, course):
+        return list(UserCourseProgress.objects.filter(course=course).values_list('completed_lessons', 'total_lessons'))
+
+    def test_moved_lesson_counts_towards_its_new_course(self):
+        self.add_progress(2)
+        self.lesson.course = self.other
+        self.lesson.save()
+
+        self.assertEqual(self.rollups(self.course), [])
+        self.assertEqual(self.rollups(self.other), [(1, 2), (1, 2)])
+
+    def test_lesson_delete_refreshes_rollups_in_constant_queries(self):
+        query_counts = []
+        for count in (2, 6):
+            self.add_progress(count)
+            self.assertEqual(self.rollups(self.course), [(1, 2)] * count)
+            with CaptureQueriesContext(connection) as queries:
+                self.lesson.delete()
+            query_counts.append(len(queries))
+            self.assertEqual(self.rollups(self.course), [])
+            self.assertFalse(UserProgress.objects.exists())
+
+            User.objects.all().delete()
+            self.lesson = Lesson.objects.create(course=self.course, title='Moving', slug='moving', order=1)
+        self.assertEqual(query_counts[0], query_counts[1])
+
+
+class CohortSyncTests(CacheIsolatedTestCase):
+    """Cohort course access follows the courses attached to the cohort"""
+
+    def test_detached_course_is_revoked_for_every_member(self):
+        course = Course.objects.create(name='Course', slug='course', short_description='Short', description='Description')
+        cohort = Cohort.objects.create(name='Cohort')
+        cohort.courses.add(course)
+        for username, remove_access_on_leave in (('leaves', True), ('keeps', False)):
+            user = User.objects.create_user(username, password='pass')
+            CohortMember.objects.create(cohort=cohort, user=user, remove_access_on_leave=remove_access_on_leave)
+        self.assertEqual(CourseAccess.objects.filter(cohort=cohort, status='unlocked').count(), 2)
+
+        cohort.courses.remove(course)
+        job = run_cohort_sync_job(CohortSyncJob.objects.get(cohort=cohort, action='revoke'))
+        self.assertEqual((job.status, job.revoked_count), ('completed', 2))
+        self.assertFalse(CourseAccess.objects.filter(cohort=cohort, status='unlocked').exists())
+
+
+@override_settings(PROGRESS_HEARTBEAT_BUFFER='local', PROGRESS_HEARTBEAT_FLUSH_TIMER=False)
+class HeartbeatBatchTests(CacheIsolatedTestCase):
+    """A resent or shuffled heartbeat batch must record the same progress as the in-order one"""
+
+    def setUp(self):
+        super().setUp()
+        flush_heartbeats(force=True)  # the local buffer is per process
+        course = Course.objects.create(
+            name='Course', slug='course', short_description='Short', description='Description',
+        )
+        self.lesson = Lesson.objects.create(
+            course=course, title='Lesson', slug='lesson', order=0, vimeo_duration_seconds=100,
+        )
+
+    def samples(self):
+        return [
+            {'lesson_id': self.lesson.id, 'watch_percentage': 5 * n, 'timestamp': 5 * n,
+             'client_ts': 1000 + n, 'segments': [[5 * (n - 1), 5 * n]]}
+            for n in range(1, 9)
+        ]
+
+    def record(self, username, samples):
+        user = User.objects.create_user(username, password='pass')
+        record_heartbeat_batch(user, samples)
+        flush_heartbeats(force=True)
+        return UserProgress.objects.get(user=user, lesson=self.lesson)
+
+    def test_duplicated_and_shuffled_batch_matches_in_order_batch(self):
+        expected = self.record('in-order', self.samples())
+        resent = self.samples() + self.samples()[2:6]
+        random.Random(7).shuffle(resent)
+        progress = self.record('resent', resent)
+
+        self.assertEqual(bytes(progress.watched_bitmap), bytes(expected.watched_bitmap))
+        self.assertEqual(bytes(progress.rewatched_bitmap), bytes(expected.rewatched_bitmap))
+        self.assertFalse(any(bytes(progress.rewatched_bitmap)))
+        self.assertEqual(progress.video_watch_percentage, 40)
+        self.assertEqual(progress.last_watched_timestamp, 40)
+        self.assertIsNone(get_heartbeat_buffer().peek(progress.user_id, self.lesson.id))
+
+    def test_progress_without_segments_is_capped_at_coverage(self):
+        user = User.objects.create_user('scripted', password='pass')
+        self.client.force_login(user)
+        url = reverse('update_video_progress', args=[self.lesson.id])
+        scrubbed = {'watch_percentage': 100, 'timestamp': 100}
+
+        data = self.client.post(url, scrubbed, content_type='application/json').json()
+        self.assertEqual((data['watch_percentage'], data['completed']), (0, False))
+
+        record_heartbeat_batch(user, self.samples())  # watched the first 40 seconds
+        data = self.client.post(url, scrubbed, content_type='application/json').json()
+        self.assertEqual((data['watch_percentage'], data['completed']), (40, False))
+        self.assertFalse(UserProgress.objects.filter(user=user, completed=True).exists())
+
+    def test_batch_resent_after_a_newer_one_keeps_the_newer_position(self):
+        user = User.objects.create_user('resent-late', password='pass')
+        record_heartbeat_batch(user, self.samples()[5:])
+        record_heartbeat_batch(user, self.samples()[:5])  # the player retried a batch that had failed
+        flush_heartbeats(force=True)
+
+        progress = UserProgress.objects.get(user=user, lesson=self.lesson)
+        self.assertEqual(merge_bitmaps(progress.watched_bitmap), (1 << 40) - 1)
+        self.assertEqual(progress.last_watched_timestamp, 40)
+
+
+@override_settings(PROGRESS_HEARTBEAT_BUFFER='local', PROGRESS_HEARTBEAT_FLUSH_TIMER=False)
+class HeartbeatFlushTests(CacheIsolatedTestCase):
+    """Buffered heartbeats reach UserProgress on flush without undoing newer writes"""
+
+    def setUp(self):
+        super().setUp()
+        flush_heartbeats(force=True)  # the local buffer is per process
+        self.course = Course.objects.create(
+            name='Course', slug='course', short_description='Short', description='Description',
+        )
+        self.lesson = Lesson.objects.create(course=self.course, title='Lesson', slug='lesson', order=0)
+        self.user = User.objects.create_user('student', password='pass')
+
+    def progress(self):
+        return UserProgress.objects.get(user=self.user, lesson=self.lesson)
+
+    def test_heartbeats_are_written_on_flush_only(self):
+        record_heartbeat(self.user, self.lesson, 30, 45)
+        record_heartbeat(self.user, self.lesson, 25, 40)
+        self.assertFalse(UserProgress.objects.exists())
+
+        self.assertEqual(flush_heartbeats(force=True), 1)
+        progress = self.progress()
+        self.assertEqual((progress.video_watch_percentage, progress.last_watched_timestamp), (30, 40))
+        self.assertEqual((progress.status, progress.progress_percentage), ('in_progress', 30))
+        rollup = UserCourseProgress.objects.get(user=self.user, course=self.course)
+        self.assertEqual(rollup.avg_watch_percentage, 30)
+        self.assertTrue(rollup.has_any_progress)
+
+    def test_flush_after_completion_keeps_it(self):
+        record_heartbeat(self.user, self.lesson, 40, 60)
+        record_heartbeat(self.user, self.lesson, 95, 570)  # crosses the threshold: written now
+        self.assertTrue(self.progress().completed)
+
+        flush_heartbeats(force=True)  # still holds the 40% heartbeat
+        progress = self.progress()
+        self.assertTrue(progress.completed)
+        self.assertEqual((progress.status, progress.progress_percentage), ('completed', 95))
+        self.assertEqual((progress.video_watch_percentage, progress.last_watched_timestamp), (95, 570))
+
+    def test_older_flush_does_not_move_the_position_back(self):
+        now = time.time()
+        older, newer = LocalHeartbeatBuffer(), LocalHeartbeatBuffer()
+        with mock.patch('myApp.utils.heartbeats.time.time', return_value=now - 20):
+            older.add(self.user.id, self.lesson.id, 50, 300)
+        with mock.patch('myApp.utils.heartbeats.time.time', return_value=now - 10):
+            newer.add(self.user.id, self.lesson.id, 20, 120)  # rewound
+
+        flush_heartbeats(newer, force=True)
+        flush_heartbeats(older, force=True)
+        progress = self.progress()
+        self.assertEqual((progress.video_watch_percentage, progress.last_watched_timestamp), (50, 120))
+
+    def test_concurrent_cached_heartbeats_are_all_kept(self):
+        Lesson.objects.filter(id=self.lesson.id).update(vimeo_duration_seconds=100)
+        buffer = CacheHeartbeatBuffer()
+
+        def watch(second):
+            buffer.add(self.user.id, self.lesson.id, second, second, 1 << second)
+
+        backend = type(caches['default'])  # patched on the class: each thread has its own instance
+        cache_set = backend.set
+
+        def slow_set(*args, **kwargs):
+            time.sleep(0.01)  # let the other requests run between a read and a write
+            return cache_set(*args, **kwargs)
+
+        with mock.patch('myApp.utils.heartbeats.time.time', return_value=time.time() - 120), \
+                mock.patch.object(backend, 'set', slow_set):
+            threads = [threading.Thread(target=watch, args=(second,)) for second in range(40)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        flush_heartbeats(buffer, force=True)
+        progress = self.progress()
+        self.assertEqual(merge_bitmaps(progress.watched_bitmap), (1 << 40) - 1)
+        self.assertEqual(progress.video_watch_percentage, 39)
+
+    @override_settings(PROGRESS_HEARTBEAT_BUFFER='cache')
+    def test_lagging_flush_still_counts_older_heartbeats(self):
+        Lesson.objects.filter(id=self.lesson.id).update(vimeo_duration_seconds=100)
+        self.lesson.refresh_from_db()
+        with mock.patch('myApp.utils.heartbeats.time.time', return_value=time.time() - 300):
+            record_heartbeat(self.user, self.lesson, 40, 40, [(0, 40)])  # ten intervals ago, never flushed
+
+        watch_percentage, _, _ = record_heartbeat(self.user, self.lesson, 60, 60, [(20, 60)])
+        self.assertEqual(watch_percentage, 60)
+
+        with mock.patch('myApp.utils.heartbeats.time.time', return_value=time.time() + 120):
+            flush_heartbeats(force=True)  # once the current generation is closed too
+        progress = self.progress()
+        self.assertEqual(merge_bitmaps(progress.watched_bitmap), (1 << 60) - 1)
+        self.assertEqual(merge_bitmaps(progress.rewatched_bitmap), (1 << 40) - (1 << 20))
+
+    def assert_kept_after_failed_flush(self, buffer):
+        with mock.patch.object(UserProgress.objects, 'bulk_create', side_effect=DatabaseError('down')):
+            with self.assertRaises(DatabaseError):
+                flush_heartbeats(buffer, force=True)
+        self.assertFalse(UserProgress.objects.exists())
+
+        self.assertEqual(flush_heartbeats(buffer, force=True), 1)
+        self.assertEqual((self.progress().video_watch_percentage, self.progress().last_watched_timestamp), (30, 45))
+        self.assertEqual(flush_heartbeats(buffer, force=True), 0)
+
+    def test_failed_flush_keeps_local_heartbeats(self):
+        buffer = LocalHeartbeatBuffer()
+        buffer.add(self.user.id, self.lesson.id, 30, 45)
+        self.assert_kept_after_failed_flush(buffer)
+
+    def test_failed_flush_keeps_cached_heartbeats(self):
+        buffer = CacheHeartbeatBuffer()
+        with mock.patch('myApp.utils.heartbeats.time.time', return_value=time.time() - 120):
+            buffer.add(self.user.id, self.lesson.id, 30, 45)  # in a closed generation
+        self.assert_kept_after_failed_flush(buffer)
+
+
+class QuizImportTests(TestCase):
+    """Question bank uploads: rows routed by lesson_slug, all-or-nothing unless skip_invalid"""
+
+    HEADER = ['question', 'option_a', 'option_b', 'correct_answer', 'lesson_slug', 'course_slug']
+
+    def setUp(self):
+        super().setUp()
+        self.courses = [
+            Course.objects.create(name=f'Course {n}', slug=f'course-{n}', short_description='Short', description='Description')
+            for n in (1, 2)
+        ]
+        self.intro = Lesson.objects.create(course=self.courses[0], title='Intro', slug='intro', order=0)
+        self.basics = Lesson.objects.create(course=self.courses[0], title='Basics', slug='basics', order=1)
+        # Same slug in the other course: rows need a course_slug to pick one
+        self.other_intro = Lesson.objects.create(course=self.courses[1], title='Intro', slug='intro', order=0)
+
+    def rows(self):
+        return [
+            ['Default lesson question?', 'Yes', 'No', 'A', '', ''],
+            ['Basics question?', 'Yes', 'No', 'B', 'basics', ''],
+            ['Intro question?', 'Yes', 'No', 'A', 'intro', 'course-1'],
+            ['Other intro question?', 'Yes', 'No', 'B', 'intro', 'course-2'],
+            ['Second basics question?', 'Yes', 'No', 'A', 'basics', 'course-1'],
+        ]
+
+    def csv_upload(self, rows):
+        lines = [','.join(self.HEADER)] + [','.join(row) for row in rows]
+        return SimpleUploadedFile('bank.csv', '\r\n'.join(lines).encode())
+
+    def questions_by_lesson(self):
+        questions = {}
+        for lesson_id, text in LessonQuizQuestion.objects.order_by('quiz__lesson_id', 'order').values_list(
+            'quiz__lesson_id', 'text'
+        ):
+            questions.setdefault(lesson_id, []).append(text)
+        return questions
+
+    def assert_routed(self, report):
+        self.assertTrue(report.committed)
+        self.assertEqual(report.created, 5)
+        self.assertEqual(report.errors, [])
+        self.assertEqual(self.questions_by_lesson(), {
+            self.intro.id: ['Default lesson question?', 'Intro question?'],
+            self.basics.id: ['Basics question?', 'Second basics question?'],
+            self.other_intro.id: ['Other intro question?'],
+        })
+
+    def test_csv_rows_routed_by_lesson_slug(self):
+        self.assert_routed(import_quiz_file(self.csv_upload(self.rows()), default_lesson=self.intro))
+
+    def test_invalid_row_rolls_back_the_import(self):
+        rows = self.rows() + [['Ambiguous?', 'Yes', 'No', 'A', 'intro', ''], ['Bad answer?', 'Yes', 'No', 'E', '', '']]
+        report = import_quiz_file(self.csv_upload(rows), default_lesson=self.intro)
+        self.assertFalse(report.committed)
+        self.assertEqual(report.created, 0)
+        self.assertEqual([error['row'] for error in report.errors], [7, 8])
+        self.assertIn('several courses', report.errors[0]['messages'][0])
+        self.assertFalse(LessonQuizQuestion.objects.exists())
+
+        report = import_quiz_file(self.csv_upload(rows), default_lesson=self.intro, skip_invalid=True)
+        self.assertTrue(report.committed)
+        self.assertEqual((report.created, report.error_rows), (5, 2))
+
+    def test_csv_bad_bytes_reject_only_their_row(self):
+        upload = self.csv_upload(self.rows())
+        body = upload.read().replace(b'Basics question?', b'Basics \xff question?')
+        report = import_quiz_file(SimpleUploadedFile('bank.csv', body), default_lesson=self.intro, skip_invalid=True)
+        self.assertEqual(report.errors, [{'row': 3, 'messages': ['row is not valid UTF-8 text']}])
+        self.assertEqual(report.created, 4)
+
+    def test_report_keeps_the_first_rejected_rows(self):
+        rows = [
+            ['Unknown lesson?', 'Yes', 'No', 'A', 'missing', ''],  # rejected when its batch is resolved
+            ['Bad answer?', 'Yes', 'No', 'E', '', ''],
+            ['Another bad answer?', 'Yes', 'No', 'E', '', ''],
+        ]
+        with mock.patch('myApp.utils.quiz_import.MAX_REPORTED_ERRORS', 2):
+            report = import_quiz_file(self.csv_upload(rows), default_lesson=self.intro)
+        self.assertEqual([error['row'] for error in report.errors], [2, 3])
+        self.assertTrue(report.errors_truncated)
+
+    def xlsx_upload(self, rows):
+        workbook = quiz_import.openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append([name.replace('_', ' ').title() for name in self.HEADER])  # headers are normalized
+        for row in rows:
+            sheet.append([cell or None for cell in row])
+        content = io.BytesIO()
+        workbook.save(content)
+        return SimpleUploadedFile('bank.xlsx', content.getvalue())
+
+    def docx_upload(self, rows=None, paragraphs=()):
+        document = quiz_import.docx.Document()
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+        if rows is not None:
+            table = document.add_table(rows=0, cols=len(self.HEADER))
+            for row in [self.HEADER] + rows:
+                for cell, value in zip(table.add_row().cells, row):
+                    cell.text = value
+        content = io.BytesIO()
+        document.save(content)
+        return SimpleUploadedFile('bank.docx', content.getvalue())
+
+    @skipUnless(XLSX_AVAILABLE, 'openpyxl is not installed')
+    def test_xlsx_rows_routed_by_lesson_slug(self):
+        self.assert_routed(import_quiz_file(self.xlsx_upload(self.rows()), default_lesson=self.intro))
+
+    @skipUnless(XLSX_AVAILABLE, 'openpyxl is not installed')
+    def test_xlsx_invalid_row_rolls_back_the_import(self):
+        rows = self.rows() + [['', 'Yes', 'No', 'A', '', '']]
+        report = import_quiz_file(self.xlsx_upload(rows), default_lesson=self.intro)
+        self.assertFalse(report.committed)
+        self.assertEqual(report.errors, [{'row': 7, 'messages': ['question is empty']}])
+        self.assertFalse(LessonQuizQuestion.objects.exists())
+
+    @skipUnless(DOCX_AVAILABLE, 'python-docx is not installed')
+    def test_docx_table_rows_routed_by_lesson_slug(self):
+        upload = self.docx_upload(self.rows(), paragraphs=['Chapter 1 question bank'])
+        self.assert_routed(import_quiz_file(upload, default_lesson=self.intro))
+
+    @skipUnless(DOCX_AVAILABLE, 'python-docx is not installed')
+    def test_docx_free_text_needs_an_answer_line(self):
+        upload = self.docx_upload(paragraphs=[
+            'Chapter 1',
+            '1. Which colour is the sky',
+            'on a clear day?',
+            'A. Green',
+            'B. Blue',
+            'Answer: B',
+            '2. Which one is a fruit?',
+            'A) Apple',
+            'B) Stone',
+        ])
+        report = import_quiz_file(upload, default_lesson=self.intro)
+        self.assertFalse(report.committed)
+        self.assertEqual(report.errors, [{'row': 2, 'messages': ['correct_answer is empty (no answer given)']}])
+
+        report = import_quiz_file(upload, default_lesson=self.intro, skip_invalid=True)
+        self.assertEqual(report.created, 1)
+        question = LessonQuizQuestion.objects.get()
+        self.assertEqual(
+            (question.text, question.option_b, question.correct_option),
+            ('Which colour is the sky on a clear day?', 'Blue', 'B'),
+        )
+
+
+class QuestionParserTests(SimpleTestCase):
+    """Free-text questions (PDF pages, DOCX paragraphs) fed line by line"""
+
+    def parse(self, pages):
+        parser = QuestionParser()
+        questions = []
+        for page, text in enumerate(pages, start=1):
+            for line in text.splitlines():
+                question = parser.feed(line, page)
+                if question:
+                    questions.append(question)
+        if parser.current:
+            questions.append(parser.close())
+        return questions
+
+    def test_multi_line_questions_and_options(self):
+        questions = self.parse([
+            'Unit 3 exam\nAnswer all questions.\n'
+            '1. Which of these\nis a prime\nnumber?\nA. 4\nB. 7\nwhich is odd\nAnswer: B\n',
+            '2) What is 2 + 2?\n(A) 3\n(B) 4\nC) 5\nCorrect - b\n',
+        ])
+        self.assertEqual(len(questions), 2)
+        first, second = questions
+        self.assertEqual(first['text'], ['Which of these', 'is a prime', 'number?'])
+        self.assertEqual(first['options'], {'A': ['4'], 'B': ['7', 'which is odd']})
+        self.assertEqual((first['answer'], first['page']), ('B', 1))
+        self.assertEqual(second['options'], {'A': ['3'], 'B': ['4'], 'C': ['5']})
+        self.assertEqual((second['number'], second['answer'], second['page']), (2, 'B', 2))
+
+    def test_question_continues_across_pages(self):
+        questions = self.parse(['1. Name the largest\n', 'planet.\nA. Mars\nB. Jupiter\nAnswer: B'])
+        self.assertEqual(len(questions), 1)
+        self.assertEqual(questions[0]['text'], ['Name the largest', 'planet.'])
+        self.assertEqual(questions[0]['page'], 1)
+
+
+@skipUnless(PDF_AVAILABLE, 'PyMuPDF is not installed')
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='quiz-import-tests-'))
+class PdfQuizImportJobTests(TestCase):
+    """PDF uploads are extracted by a QuizImportJob from a copy in default storage"""
+
+    def setUp(self):
+        super().setUp()
+        course = Course.objects.create(name='Course', slug='course', short_description='Short', description='Description')
+        self.lesson = Lesson.objects.create(course=course, title='Lesson', slug='lesson', order=0)
+
+    def pdf_upload(self, pages):
+        import fitz
+
+        document = fitz.open()
+        for text in pages:
+            document.new_page().insert_text((72, 72), text)
+        return SimpleUploadedFile('exam.pdf', document.tobytes(), content_type='application/pdf')
+
+    def test_job_imports_questions_page_by_page(self):
+        upload = self.pdf_upload([
+            '1. What is the capital of France?\nA. London\nB. Paris\nAnswer: B\n2. Pick a vowel\nA. E\nB. K',
+            '3. Only one option?\nA. Yes\n4. Which is a mammal?\nA. Whale\nB. Shark\nCorrect: A',
+        ])
+        job = queue_quiz_import(self.lesson, upload)
+        self.assertTrue(default_storage.exists(job.source_path))
+
+        job = run_quiz_import_job(job, workers=1)
+        self.assertEqual(job.status, 'completed', job.error)
+        self.assertEqual((job.total_pages, job.processed_pages, job.ocr_pages), (2, 2, 0))
+        self.assertEqual((job.questions_found, job.questions_created), (4, 3))
+        self.assertEqual(job.problems, [
+            {'page': 2, 'question': 3, 'messages': ['option_a and option_b are required']},
+        ])
+        self.assertEqual(
+            list(LessonQuizQuestion.objects.order_by('order').values_list('text', 'correct_option')),
+            [('What is the capital of France?', 'B'), ('Pick a vowel', 'A'), ('Which is a mammal?', 'A')],
+        )
+        self.assertFalse(default_storage.exists(job.source_path))
+
+    def test_stale_jobs_are_resumed_or_failed(self):
+        stale = timezone.now() - timedelta(hours=2)
+        resumed = queue_quiz_import(self.lesson, self.pdf_upload(['1. Resumed?\nA. Yes\nB. No\nAnswer: A']))
+        failed = queue_quiz_import(self.lesson, self.pdf_upload(['1. Failed?\nA. Yes\nB. No\nAnswer: A']))
+        recent = queue_quiz_import(self.lesson, self.pdf_upload(['1. Still queued?\nA. Yes\nB. No\nAnswer: A']))
+        QuizImportJob.objects.filter(id=resumed.id).update(status='processing', started_at=stale, updated_at=stale)
+        QuizImportJob.objects.filter(id=failed.id).update(created_at=stale, updated_at=stale)
+
+        call_command('run_quiz_import_jobs', job=resumed.id, stdout=io.StringIO())
+        call_command('run_quiz_import_jobs', fail=True, stdout=io.StringIO())
+
+        statuses = dict(QuizImportJob.objects.values_list('id', 'status'))
+        self.assertEqual(
+            [statuses[resumed.id], statuses[failed.id], statuses[recent.id]],
+            ['completed', 'failed', 'pending'],
+        )
+        self.assertFalse(default_storage.exists(failed.source_path))
+        self.assertTrue(default_storage.exists(recent.source_path))
+        self.assertEqual(list(LessonQuizQuestion.objects.values_list('text', flat=True)), ['Resumed?'])
+
+    def test_long_running_job_is_not_stale(self):
+        job = queue_quiz_import(self.lesson, self.pdf_upload(['1. Slow?\nA. Yes\nB. No\nAnswer: A']))
+        QuizImportJob.objects.filter(id=job.id).update(
+            status='processing', started_at=timezone.now() - timedelta(hours=2)  # progress saved just now
+        )
+
+        call_command('run_quiz_import_jobs', fail=True, stdout=io.StringIO())
+        self.assertEqual(QuizImportJob.objects.get(id=job.id).status, 'processing')
+        self.assertTrue(default_storage.exists(job.source_path))
+
+    def test_run_stops_when_another_run_claims_the_job(self):
+        job = queue_quiz_import(self.lesson, self.pdf_upload(['1. Twice?\nA. Yes\nB. No\nAnswer: A']))
+        page_count = pdf_quiz.page_count
+
+        def claimed_meanwhile(path):
+            QuizImportJob.objects.filter(id=job.id).update(started_at=timezone.now() + timedelta(seconds=1))
+            return page_count(path)
+
+        with mock.patch.object(pdf_quiz, 'page_count', claimed_meanwhile):
+            self.assertIsNone(run_quiz_import_job(job, workers=1))
+        self.assertFalse(LessonQuizQuestion.objects.exists())
+        self.assertEqual(QuizImportJob.objects.get(id=job.id).status, 'processing')
+        self.assertTrue(default_storage.exists(job.source_path))  # still needed by the other run
@@ -2,9 +2,12 @@
 Access Control Utilities
 Core concept: "Access is a thing, not a side effect"
 """
+from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q
-from ..models import CourseAccess, Course, CohortMember, BundlePurchase
+from ..models import CourseAccess, Course, CohortMember, BundlePurchase, CourseEnrollment
+from .entitlements import get_entitlement_snapshot, invalidate_entitlements, invalidate_entitlements_many
 
 
 def has_course_access(user, course):
@@ -15,36 +18,39 @@ def has_course_access(user, course):
     if not user.is_authenticated:
         return False, None, "Not authenticated"
     
-    # Get all active access records for this user and course
-    active_accesses = CourseAccess.objects.filter(
-        user=user,
-        course=course,
-        status='unlocked'
-    ).exclude(
-        # Exclude expired accesses
-        Q(expires_at__isnull=False) & Q(expires_at__lt=timezone.now())
-    )
+    course_id = getattr(course, 'id', course)
     
-    if active_accesses.exists():
-        access = active_accesses.first()
-        return True, access, f"Access granted via {access.get_source_display()}"
+    # Active access comes from the entitlement snapshot (expiry checked in memory)
+    access_id = get_entitlement_snapshot(user).active_access_id(course_id)
+    if access_id:
+        access = CourseAccess.objects.filter(id=access_id).first()
+        if access:
+            return True, access, f"Access granted via {access.get_source_display()}"
     
     # Check if access exists but is expired/revoked
-    any_access = CourseAccess.objects.filter(user=user, course=course).first()
+    any_access = CourseAccess.objects.filter(user=user, course_id=course_id).first()
     if any_access:
         if any_access.status == 'expired':
             return False, any_access, "Access has expired"
         elif any_access.status == 'revoked':
             return False, any_access, f"Access revoked: {any_access.revocation_reason or 'No reason provided'}"
         elif any_access.expires_at and timezone.now() > any_access.expires_at:
-            # Mark as expired
-            any_access.status = 'expired'
-            any_access.save()
+            # Past expires_at but not yet swept - expire_course_access marks it expired
             return False, any_access, "Access has expired"
     
     return False, None, "No access found"
 
 
+def user_has_course_access(user, course):
+    """
+    Boolean access check with no queries once the user's snapshot is loaded.
+    Use this in loops; has_course_access when the record or reason is needed.
+    """
+    if not user.is_authenticated:
+        return False
+    return get_entitlement_snapshot(user).has_access(getattr(course, 'id', course))
+
+
 def grant_course_access(user, course, access_type, granted_by=None, bundle_purchase=None, 
                        cohort=None, purchase_id=None, expires_at=None, notes=""):
     """
@@ -63,9 +69,135 @@ def grant_course_access(user, course, access_type, granted_by=None, bundle_purch
         expires_at=expires_at,
         notes=notes
     )
+    invalidate_entitlements(user)
     return access
 
 
+def migrate_legacy_enrollments(enrollments=None):
+    """
+    Grant purchase access for legacy CourseEnrollments that have no CourseAccess
+    record at all. Enrollments whose access was revoked or has expired are left
+    alone. Returns the list of created CourseAccess objects.
+    """
+    if enrollments is None:
+        enrollments = CourseEnrollment.objects.all()
+
+    existing = set(
+        CourseAccess.objects.filter(
+            user_id__in=enrollments.values('user_id'),
+            course_id__in=enrollments.values('course_id')
+        ).values_list('user_id', 'course_id')
+    )
+
+    to_create = []
+    for user_id, course_id in enrollments.values_list('user_id', 'course_id'):
+        if (user_id, course_id) in existing:
+            continue
+        existing.add((user_id, course_id))
+        to_create.append(CourseAccess(
+            user_id=user_id,
+            course_id=course_id,
+            access_type='purchase',
+            status='unlocked',
+            notes="Migrated from legacy enrollment"
+        ))
+
+    created = CourseAccess.objects.bulk_create(to_create, batch_size=1000)
+    # bulk_create skips post_save, so drop the snapshots here
+    invalidate_entitlements_many(access.user_id for access in created)
+    return created
+
+
+def enroll_staff_in_courses(user_ids=None, course_ids=None):
+    """
+    Enroll staff/superusers in every active course they aren't enrolled in yet,
+    optionally limited to some users or courses. Runs from signals and the
+    enroll_staff command, not on page loads. Returns the number of enrollments created.
+    """
+    staff = User.objects.filter(Q(is_staff=True) | Q(is_superuser=True))
+    courses = Course.objects.filter(status='active')
+    if user_ids is not None:
+        staff = staff.filter(id__in=user_ids)
+    if course_ids is not None:
+        courses = courses.filter(id__in=course_ids)
+
+    staff_ids = list(staff.values_list('id', flat=True))
+    active_ids = list(courses.values_list('id', flat=True))
+    if not staff_ids or not active_ids:
+        return 0
+
+    existing = set(
+        CourseEnrollment.objects.filter(
+            user_id__in=staff_ids, course_id__in=active_ids
+        ).values_list('user_id', 'course_id')
+    )
+    to_create = [
+        CourseEnrollment(user_id=user_id, course_id=course_id, payment_type='full')
+        for user_id in staff_ids
+        for course_id in active_ids
+        if (user_id, course_id) not in existing
+    ]
+    if not to_create:
+        return 0
+
+    with transaction.atomic():
+        CourseEnrollment.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+        # bulk_create skips the enrollment post_save, so give them access here
+        migrate_legacy_enrollments(CourseEnrollment.objects.filter(
+            user_id__in={enrollment.user_id for enrollment in to_create},
+            course_id__in={enrollment.course_id for enrollment in to_create}
+        ))
+    return len(to_create)
+
+
+def bulk_grant_course_access(user_ids, course_ids, access_type, granted_by=None, expires_at=None,
+                             notes="", cohort=None, batch_size=1000):
+    """
+    Grant access for every user x course pair that has no unlocked access yet.
+    Unlocked rows already past expires_at are marked expired first (so they
+    don't count as granted), existing pairs are loaded in one query and new
+    rows are inserted with chunked bulk_create, all in a single transaction.
+    Unknown ids are ignored. Returns (granted_count, skipped_count).
+    """
+    user_ids = set(User.objects.filter(id__in=set(user_ids)).values_list('id', flat=True))
+    course_ids = set(Course.objects.filter(id__in=set(course_ids)).values_list('id', flat=True))
+    if not user_ids or not course_ids:
+        return 0, 0
+    
+    with transaction.atomic():
+        unlocked = CourseAccess.objects.filter(
+            user_id__in=user_ids,
+            course_id__in=course_ids,
+            status='unlocked'
+        )
+        past_due = unlocked.filter(expires_at__lte=timezone.now())
+        expired_user_ids = set(past_due.values_list('user_id', flat=True))
+        if expired_user_ids:
+            past_due.update(status='expired')
+        existing = set(unlocked.values_list('user_id', 'course_id'))
+        
+        to_create = [
+            CourseAccess(
+                user_id=user_id,
+                course_id=course_id,
+                access_type=access_type,
+                status='unlocked',
+                granted_by=granted_by,
+                cohort=cohort,
+                expires_at=expires_at,
+                notes=notes
+            )
+            for user_id in user_ids
+            for course_id in course_ids
+            if (user_id, course_id) not in existing
+        ]
+        CourseAccess.objects.bulk_create(to_create, batch_size=batch_size)
+    
+    # update() and bulk_create skip post_save, so drop the snapshots here
+    invalidate_entitlements_many(expired_user_ids | {access.user_id for access in to_create})
+    return len(to_create), len(existing)
+
+
 def revoke_course_access(user, course, revoked_by, reason="", notes=""):
     """
     Revoke access to a course.
@@ -85,10 +217,36 @@ def revoke_course_access(user, course, revoked_by, reason="", notes=""):
         if notes:
             access.notes = f"{access.notes}\n{notes}" if access.notes else notes
         access.save()
+        invalidate_entitlements(user)
         return access
     return None
 
 
+def expire_course_accesses(now=None, batch_size=1000):
+    """
+    Mark unlocked accesses past expires_at as expired, in batched UPDATEs.
+    Uses the (status, expires_at) index. Returns the number of rows expired.
+    """
+    now = now or timezone.now()
+    expired = 0
+    while True:
+        batch = list(
+            CourseAccess.objects.filter(
+                status='unlocked',
+                expires_at__lt=now
+            ).values_list('id', 'user_id')[:batch_size]
+        )
+        if not batch:
+            break
+        expired += CourseAccess.objects.filter(
+            id__in=[access_id for access_id, _ in batch],
+            status='unlocked'
+        ).update(status='expired')
+        # update() skips post_save, so drop the snapshots here
+        invalidate_entitlements_many(user_id for _, user_id in batch)
+    return expired
+
+
 def get_user_accessible_courses(user):
     """
     Get all courses the user has active access to.
@@ -97,15 +255,7 @@ def get_user_accessible_courses(user):
     if not user.is_authenticated:
         return Course.objects.none()
     
-    now = timezone.now()
-    access_ids = CourseAccess.objects.filter(
-        user=user,
-        status='unlocked'
-    ).exclude(
-        Q(expires_at__isnull=False) & Q(expires_at__lt=now)
-    ).values_list('course_id', flat=True)
-    
-    return Course.objects.filter(id__in=access_ids)
+    return Course.objects.filter(id__in=get_entitlement_snapshot(user).course_ids())
 
 
 def get_courses_by_visibility(user):
@@ -151,31 +301,12 @@ def get_courses_by_visibility(user):
 def check_course_prerequisites(user, course):
     """
     Check if user has met prerequisites for a course.
-    Returns (met: bool, missing_prerequisites: list)
+    Returns (met: bool, missing_prerequisites: list) - missing includes the
+    unmet prerequisites of unmet prerequisites. For many courses at once use
+    utils.prerequisites.check_prerequisites_bulk.
     """
-    if not course.prerequisite_courses.exists():
-        return True, []
-    
-    missing = []
-    for prereq in course.prerequisite_courses.all():
-        has_access, _, _ = has_course_access(user, prereq)
-        if not has_access:
-            missing.append(prereq)
-            continue
-        
-        # Check if prerequisite is completed
-        from ..models import UserProgress
-        total_lessons = prereq.lessons.count()
-        completed_lessons = UserProgress.objects.filter(
-            user=user,
-            lesson__course=prereq,
-            completed=True
-        ).count()
-        
-        if total_lessons > 0 and completed_lessons < total_lessons:
-            missing.append(prereq)
-    
-    return len(missing) == 0, missing
+    from .prerequisites import check_prerequisites_bulk
+    return check_prerequisites_bulk(user, [course])[getattr(course, 'id', course)]
 
 
 def grant_bundle_access(user, bundle_purchase):
@@ -212,24 +343,32 @@ def grant_bundle_access(user, bundle_purchase):
             )
             granted_accesses.append(access)
     
+    invalidate_entitlements(user)
     return granted_accesses
 
 
 def grant_cohort_access(user, cohort):
     """
-    Grant access to all courses associated with a cohort.
-    Note: This assumes cohorts have associated courses (you may need to add this relationship).
+    Add a user to a cohort and grant access to the cohort's courses.
+    New members are granted by the CohortMember signal; existing members are
+    topped up here (courses attached since they joined).
+    Returns the user's unlocked CourseAccess records from this cohort.
     """
-    # For now, we'll grant access when user joins cohort
-    # You may want to add a many-to-many relationship between Cohort and Course
-    # to define which courses a cohort grants access to
-    from ..models import CohortMember
     member, created = CohortMember.objects.get_or_create(
         user=user,
         cohort=cohort
     )
     
-    # TODO: Add cohort.courses relationship if needed
-    # For now, return empty list
-    return []
-
+    if not created:
+        course_ids = list(cohort.courses.values_list('id', flat=True))
+        if course_ids:
+            bulk_grant_course_access(
+                [user.id],
+                course_ids,
+                access_type='cohort',
+                cohort=cohort,
+                notes=f"Granted via cohort: {cohort.name}"
+            )
+    invalidate_entitlements(user)
+    
+    return list(CourseAccess.objects.filter(user=user, cohort=cohort, status='unlocked'))
@@ -0,0 +1,149 @@
+"""
+Activity Feed Utilities
+ActivityEvent rows are written where the activity happens (lesson completion,
+video progress milestones, quiz/exam attempts, certification issuance) and the
+feed is read back with one keyset-paginated query on the event id. New events
+are also announced to connected staff dashboards over the channel layer: only
+the event id is sent from the request, and each consumer loads and renders
+the event itself (see consumers.py).
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.template.loader import render_to_string
+from ..models import ActivityEvent
+
+
+logger = logging.getLogger(__name__)
+
+FEED_PAGE_SIZE = 50
+FEED_MAX_PAGE_SIZE = 100
+ACTIVITY_FEED_GROUP = 'activity_feed'
+
+# Watch percentages that put a progress_update in the feed (completion is its own event)
+PROGRESS_MILESTONES = (50,)
+
+
+def record_activity(user, event_type, course_id=None, lesson=None, source_id=None, **data):
+    """
+    Append one event. course_id defaults to the lesson's course.
+    With a source_id (the attempt/certification behind it) the event is
+    recorded once per event type: returns None if it already exists.
+    """
+    if lesson is not None and course_id is None:
+        course_id = lesson.course_id
+    fields = {'user': user, 'course_id': course_id, 'lesson': lesson, 'data': data}
+    if source_id is None:
+        event = ActivityEvent.objects.create(event_type=event_type, **fields)
+    else:
+        event, created = ActivityEvent.objects.get_or_create(
+            event_type=event_type, source_id=source_id, defaults=fields
+        )
+        if not created:
+            return None
+    transaction.on_commit(lambda: broadcast_activity_event(event))
+    return event
+
+
+def serialize_activity_event(event):
+    """JSON payload for one event (feed endpoint and websocket push), with its rendered feed item."""
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'user': event.user.get_full_name() or event.user.username,
+        'course': event.course.name if event.course_id else None,
+        'lesson': event.lesson.title if event.lesson_id else None,
+        'data': event.data,
+        'created_at': event.created_at.isoformat(),
+        'html': render_to_string('dashboard/_activity_event.html', {'activity': event}),
+    }
+
+
+def broadcast_activity_event(event):
+    """
+    Announce an event to every connected staff dashboard - just its id, so the
+    request that wrote it doesn't render anything. Never fails that write.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(ACTIVITY_FEED_GROUP, {
+            'type': 'activity.event',
+            'event_id': event.id,
+        })
+    except Exception:
+        logger.exception("Could not broadcast activity event %s", event.id)
+
+
+def record_lesson_completed(user, lesson, progress):
+    return record_activity(
+        user, 'lesson_completed', lesson=lesson,
+        watch_percentage=progress.video_watch_percentage
+    )
+
+
+def record_progress_milestones(user, lesson, previous_percentage, current_percentage):
+    """Record a progress_update when the watch percentage just crossed a milestone (lesson not completed)."""
+    crossed = [m for m in PROGRESS_MILESTONES if previous_percentage < m <= current_percentage]
+    if not crossed:
+        return None
+    return record_activity(
+        user, 'progress_update', lesson=lesson,
+        watch_percentage=current_percentage, status='in_progress'
+    )
+
+
+def record_quiz_attempt(attempt, lesson):
+    return record_activity(
+        attempt.user, 'quiz_attempt', lesson=lesson, source_id=attempt.id,
+        attempt_id=attempt.id, score=attempt.score, passed=attempt.passed
+    )
+
+
+def record_exam_attempt(attempt):
+    """Once per attempt, when it has a result (ExamAttempt post_save)."""
+    if attempt.score is None and not attempt.completed_at:
+        return None
+    return record_activity(
+        attempt.user, 'exam_attempt', course_id=attempt.exam.course_id, source_id=attempt.id,
+        attempt_id=attempt.id, score=attempt.score, passed=attempt.passed,
+        attempt_number=attempt.attempt_number()
+    )
+
+
+def record_certification_issued(certification):
+    """Once per certification, when it gets an issue date (Certification post_save)."""
+    if not certification.issued_at:
+        return None
+    return record_activity(
+        certification.user, 'certification_issued', course_id=certification.course_id, source_id=certification.id,
+        certification_id=certification.id, certificate_id=certification.accredible_certificate_id
+    )
+
+
+def get_activity_feed(limit=FEED_PAGE_SIZE, after=None, before=None, user=None):
+    """
+    Newest-first list of ActivityEvents in one query.
+
+    after: only events with id > after (the client's cursor). The oldest
+           `limit` of them are returned, so polling again from the new
+           cursor never skips events.
+    before: only events with id < before (loading older pages).
+    """
+    limit = max(1, min(limit, FEED_MAX_PAGE_SIZE))
+    events = ActivityEvent.objects.select_related('user', 'course', 'lesson')
+    if user is not None:
+        events = events.filter(user=user)
+    if before is not None:
+        events = events.filter(id__lt=before)
+    if after is not None:
+        return list(events.filter(id__gt=after).order_by('id')[:limit])[::-1]
+    return list(events.order_by('-id')[:limit])
+
+
+def get_activity_event(event_id):
+    """One event with what serialize_activity_event() needs, or None if it's gone."""
+    return ActivityEvent.objects.select_related('user', 'course', 'lesson').filter(id=event_id).first()
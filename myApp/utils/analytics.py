@@ -0,0 +1,399 @@
+"""
+Analytics Utilities
+Builds AnalyticsDailySnapshot rows from grouped queries and turns them back
+into the numbers the dashboard analytics page shows.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Avg, Count, Exists, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from ..models import (
+    AnalyticsDailySnapshot, BundlePurchase, Certification, CohortMember, Course, CourseAccess,
+    CourseEnrollment, ExamAttempt, Lesson, LessonQuizAttempt, UserProgress
+)
+from .completion import get_completion_stats
+
+
+ACTIVITY_BACKFILL_DAYS = 31
+
+# Highest tier first: (name, passed certifications needed)
+TROPHY_TIERS = [
+    ('ultimate', 20),
+    ('diamond', 12),
+    ('platinum', 8),
+    ('gold', 5),
+    ('silver', 3),
+    ('bronze', 1),
+]
+
+STUDENT_Q = Q(is_staff=False, is_superuser=False)
+
+
+def trophy_tier(cert_count):
+    for tier, needed in TROPHY_TIERS:
+        if cert_count >= needed:
+            return tier
+    return None
+
+
+def _grouped(queryset, *fields):
+    """{tuple(fields) or single field value: count} from one GROUP BY query"""
+    rows = queryset.values(*fields).annotate(n=Count('id')).values_list(*fields, 'n')
+    if len(fields) == 1:
+        return {row[0]: row[1] for row in rows}
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def collect_daily_activity(start_date, end_date):
+    """
+    New students, enrollments and certifications per day (and per course)
+    between start_date and end_date inclusive.
+    Returns {(date, course_id or None): {field: count}}.
+    """
+    activity = {}
+
+    def add(key, field, count):
+        activity.setdefault(key, {})
+        activity[key][field] = activity[key].get(field, 0) + count
+
+    date_range = {'__date__gte': start_date, '__date__lte': end_date}
+
+    def in_range(field):
+        return {f'{field}{lookup}': value for lookup, value in date_range.items()}
+
+    enrollments = _grouped(
+        CourseEnrollment.objects.filter(**in_range('enrolled_at')).annotate(day=TruncDate('enrolled_at')),
+        'day', 'course_id'
+    )
+    for (day, course_id), count in enrollments.items():
+        add((day, course_id), 'new_enrollments', count)
+        add((day, None), 'new_enrollments', count)
+
+    certifications = _grouped(
+        Certification.objects.filter(**in_range('issued_at')).annotate(day=TruncDate('issued_at')),
+        'day', 'course_id'
+    )
+    for (day, course_id), count in certifications.items():
+        add((day, course_id), 'new_certifications', count)
+        add((day, None), 'new_certifications', count)
+
+    students = _grouped(
+        User.objects.filter(STUDENT_Q, **in_range('date_joined')).annotate(day=TruncDate('date_joined')),
+        'day'
+    )
+    for day, count in students.items():
+        add((day, None), 'new_students', count)
+
+    return activity
+
+
+def collect_course_totals(completion):
+    """
+    Per-course student, lesson, completion and certification counts.
+    completion is the result of utils.completion.get_completion_stats().
+    Returns {course_id: {field: value}}.
+    """
+    enrollments = _grouped(CourseEnrollment.objects.all(), 'course_id')
+    accesses = _grouped(CourseAccess.objects.filter(status='unlocked'), 'course_id')
+    lessons = _grouped(Lesson.objects.all(), 'course_id')
+    completed = _grouped(UserProgress.objects.filter(completed=True), 'lesson__course_id')
+    certifications = _grouped(Certification.objects.filter(status='passed'), 'course_id')
+    completers = completion['per_course']['completers']
+
+    return {
+        course_id: {
+            'total_students': enrollments.get(course_id, 0) + accesses.get(course_id, 0),
+            'lessons': lessons.get(course_id, 0),
+            'completed_lessons': completed.get(course_id, 0),
+            'certifications': certifications.get(course_id, 0),
+            'completers': int(completers.get(course_id, 0)),
+        }
+        for course_id in Course.objects.values_list('id', flat=True)
+    }
+
+
+def collect_site_totals(completion, now=None):
+    """Site-wide headline numbers and the trophy histogram, as of now."""
+    now = now or timezone.now()
+    last_7_days = now - timedelta(days=7)
+    last_30_days = now - timedelta(days=30)
+    last_90_days = now - timedelta(days=90)
+
+    students = User.objects.filter(STUDENT_Q).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(last_login__gte=last_30_days)),
+        inactive=Count('id', filter=Q(last_login__lt=last_90_days)),
+    )
+    accesses = CourseAccess.objects.aggregate(
+        unlocked=Count('id', filter=Q(status='unlocked')),
+        expired=Count('id', filter=Q(status='expired')),
+        pending=Count('id', filter=Q(status='pending')),
+    )
+    progress = UserProgress.objects.aggregate(
+        total=Count('id'),
+        completed_count=Count('id', filter=Q(completed=True)),
+        recent=Count('id', filter=Q(last_accessed__gte=last_7_days)),
+        completing_students=Count('user_id', filter=Q(completed=True), distinct=True),
+    )
+    certifications = Certification.objects.aggregate(
+        total=Count('id'),
+        issued=Count('id', filter=Q(issued_at__isnull=False)),
+    )
+    exams = ExamAttempt.objects.aggregate(
+        total=Count('id'), passed_count=Count('id', filter=Q(passed=True)), avg_score=Avg('score')
+    )
+    quizzes = LessonQuizAttempt.objects.aggregate(
+        total=Count('id'), passed_count=Count('id', filter=Q(passed=True)), avg_score=Avg('score')
+    )
+
+    has_progress = UserProgress.objects.filter(user_id=OuterRef('pk'))
+    students_zero_progress = User.objects.filter(STUDENT_Q).filter(~Exists(has_progress)).count()
+
+    trophy_distribution = {tier: 0 for tier, _ in TROPHY_TIERS}
+    cert_counts = Certification.objects.filter(
+        status='passed', user__is_staff=False, user__is_superuser=False
+    ).values('user_id').annotate(n=Count('id')).values_list('n', flat=True)
+    for cert_count in cert_counts:
+        tier = trophy_tier(cert_count)
+        if tier:
+            trophy_distribution[tier] += 1
+
+    return {
+        'total_students': students['total'],
+        'active_students': students['active'],
+        'inactive_students': students['inactive'],
+        'total_enrollments': CourseEnrollment.objects.count(),
+        'total_accesses': accesses['unlocked'],
+        'expired_accesses': accesses['expired'],
+        'pending_accesses': accesses['pending'],
+        'total_progress': progress['total'],
+        'completed_lessons': progress['completed_count'],
+        'progress_7d': progress['recent'],
+        'students_with_completions': progress['completing_students'],
+        'students_zero_progress': students_zero_progress,
+        'total_certifications': certifications['total'],
+        'certifications_issued': certifications['issued'],
+        'total_exam_attempts': exams['total'],
+        'passed_exams': exams['passed_count'],
+        'avg_exam_score': exams['avg_score'] or 0,
+        'total_quiz_attempts': quizzes['total'],
+        'passed_quizzes': quizzes['passed_count'],
+        'avg_quiz_score': quizzes['avg_score'] or 0,
+        'bundle_purchases': BundlePurchase.objects.count(),
+        'cohort_members': CohortMember.objects.count(),
+        'students_started': completion['students_started'],
+        'students_completed': completion['students_completed'],
+        'trophy_distribution': trophy_distribution,
+    }
+
+
+def build_analytics_snapshots(days=None, now=None):
+    """
+    Refresh the snapshot table.
+
+    Daily activity is recomputed from the day before the latest existing
+    snapshot (or the last `days` days when given / when the table is empty)
+    through today. Point-in-time totals are written to today's rows.
+    Returns the number of rows written.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+
+    if days is None:
+        latest = AnalyticsDailySnapshot.objects.filter(course__isnull=True).values_list('date', flat=True).first()
+        start_date = latest - timedelta(days=1) if latest else today - timedelta(days=ACTIVITY_BACKFILL_DAYS)
+    else:
+        start_date = today - timedelta(days=days)
+    start_date = min(start_date, today)
+
+    activity = collect_daily_activity(start_date, today)
+    completion = get_completion_stats()
+    course_totals = collect_course_totals(completion)
+    site_totals = collect_site_totals(completion, now)
+
+    existing = {
+        (row.date, row.course_id): row
+        for row in AnalyticsDailySnapshot.objects.filter(date__gte=start_date, date__lte=today)
+    }
+    rows = {}
+
+    def row_for(day, course_id):
+        key = (day, course_id)
+        if key not in rows:
+            row = existing.get(key) or AnalyticsDailySnapshot(date=day, course_id=course_id)
+            # Activity for days in range is recomputed from scratch
+            row.new_students = row.new_enrollments = row.new_certifications = 0
+            row.updated_at = now  # bulk_update skips auto_now
+            rows[key] = row
+        return rows[key]
+
+    for key in existing:
+        row_for(*key)
+    for (day, course_id), counts in activity.items():
+        row = row_for(day, course_id)
+        for field, count in counts.items():
+            setattr(row, field, count)
+    for course_id, totals in course_totals.items():
+        row = row_for(today, course_id)
+        for field, value in totals.items():
+            setattr(row, field, value)
+    row_for(today, None).totals = site_totals
+
+    to_update = [row for row in rows.values() if row.pk]
+    to_create = [row for row in rows.values() if not row.pk]
+    with transaction.atomic():
+        AnalyticsDailySnapshot.objects.bulk_update(
+            to_update,
+            ['new_students', 'new_enrollments', 'new_certifications', 'total_students', 'lessons',
+             'completed_lessons', 'certifications', 'completers', 'totals', 'updated_at'],
+            batch_size=500
+        )
+        AnalyticsDailySnapshot.objects.bulk_create(to_create, batch_size=500)
+    return len(rows)
+
+
+def get_analytics_summary(now=None):
+    """
+    Everything the analytics page shows except the live "most active students"
+    list, read from the snapshot table in a few queries. Builds today's
+    snapshot first if the table is empty.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    trend_start = today - timedelta(days=30)
+
+    site_rows = list(AnalyticsDailySnapshot.objects.filter(course__isnull=True, date__gte=trend_start))
+    latest = next((row for row in site_rows if row.totals), None)
+    if latest is None:
+        latest = AnalyticsDailySnapshot.objects.filter(course__isnull=True).exclude(totals={}).first()
+    if latest is None:
+        build_analytics_snapshots(now=now)
+        return get_analytics_summary(now)
+
+    totals = latest.totals
+    by_date = {row.date: row for row in site_rows}
+
+    def activity_since(field, days):
+        since = today - timedelta(days=days)
+        return sum(getattr(row, field) for day, row in by_date.items() if day >= since)
+
+    def trend(field):
+        points = []
+        for i in range(30, 0, -1):
+            day = today - timedelta(days=i)
+            row = by_date.get(day)
+            points.append({'date': day.strftime('%m/%d'), 'count': getattr(row, field) if row else 0})
+        return points
+
+    recent_enrollments = dict(
+        AnalyticsDailySnapshot.objects.filter(
+            course__isnull=False, date__gte=today - timedelta(days=7)
+        ).values('course_id').annotate(n=Sum('new_enrollments')).values_list('course_id', 'n')
+    )
+
+    course_performance = []
+    course_type_totals = {course_type: {'total_courses': 0, 'total_students': 0, 'lessons': 0, 'completed': 0}
+                          for course_type, _ in Course.COURSE_TYPES}
+    eligible_students_count = 0
+    course_rows = AnalyticsDailySnapshot.objects.filter(
+        date=latest.date, course__isnull=False
+    ).select_related('course')
+    for row in course_rows:
+        total_possible = row.lessons * row.total_students
+        completion_rate = (row.completed_lessons / total_possible * 100) if total_possible > 0 else 0
+        course_performance.append({
+            'course': row.course,
+            'total_students': row.total_students,
+            'completion_rate': min(completion_rate, 100),
+            'certifications': row.certifications,
+            'lessons': row.lessons,
+            'recent_enrollments': recent_enrollments.get(row.course_id, 0),
+            'completed_lessons': row.completed_lessons,
+        })
+        eligible_students_count += row.completers
+
+        type_totals = course_type_totals.get(row.course.course_type)
+        if type_totals is not None:
+            type_totals['total_courses'] += 1
+            type_totals['total_students'] += row.total_students
+            type_totals['lessons'] += row.lessons
+            type_totals['completed'] += row.completed_lessons
+
+    course_performance.sort(key=lambda x: x['total_students'], reverse=True)
+
+    course_type_stats = {}
+    for course_type, type_totals in course_type_totals.items():
+        total_possible = type_totals['lessons'] * type_totals['total_students']
+        completion_rate = (type_totals['completed'] / total_possible * 100) if total_possible > 0 else 0
+        course_type_stats[course_type] = {
+            'total_courses': type_totals['total_courses'],
+            'total_students': type_totals['total_students'],
+            'completion_rate': min(completion_rate, 100),
+        }
+
+    total_students = totals['total_students']
+    total_progress = totals['total_progress']
+    completed_lessons = totals['completed_lessons']
+    total_certifications = totals['total_certifications']
+    students_started = totals['students_started']
+    drop_off_count = students_started - totals['students_completed']
+    has_issued = totals['certifications_issued'] > 0
+
+    return {
+        'snapshot_date': latest.date,
+        'snapshot_updated_at': latest.updated_at,
+        'total_students': total_students,
+        'active_students': totals['active_students'],
+        'new_students_7d': activity_since('new_students', 7),
+        'new_students_30d': activity_since('new_students', 30),
+        'inactive_students': totals['inactive_students'],
+        'total_enrollments': totals['total_enrollments'],
+        'enrollments_7d': activity_since('new_enrollments', 7),
+        'enrollments_30d': activity_since('new_enrollments', 30),
+        'total_accesses': totals['total_accesses'],
+        'expired_accesses': totals['expired_accesses'],
+        'pending_accesses': totals['pending_accesses'],
+        'total_progress': total_progress,
+        'completed_lessons': completed_lessons,
+        'progress_7d': totals['progress_7d'],
+        'completion_rate': round((completed_lessons / total_progress * 100) if total_progress > 0 else 0, 1),
+        'total_certifications': total_certifications,
+        'certifications_7d': activity_since('new_certifications', 7) if has_issued else 0,
+        'certifications_30d': activity_since('new_certifications', 30) if has_issued else 0,
+        'course_performance': course_performance,
+        'enrollment_trend': trend('new_enrollments'),
+        'certification_trend': trend('new_certifications') if has_issued else [],
+        'top_courses': course_performance[:5],
+        'students_zero_progress': totals['students_zero_progress'],
+        'students_with_completions': totals['students_with_completions'],
+        'avg_lessons_per_student': round(completed_lessons / total_students, 1) if total_students > 0 else 0,
+        'course_type_stats': course_type_stats,
+        'certification_rate': round(
+            (total_certifications / eligible_students_count * 100) if eligible_students_count > 0 else 0, 1
+        ),
+        'trophy_distribution': totals['trophy_distribution'],
+        'total_exam_attempts': totals['total_exam_attempts'],
+        'passed_exams': totals['passed_exams'],
+        'exam_pass_rate': round(
+            (totals['passed_exams'] / totals['total_exam_attempts'] * 100) if totals['total_exam_attempts'] > 0 else 0, 1
+        ),
+        'avg_exam_score': round(totals['avg_exam_score'], 1),
+        'total_quiz_attempts': totals['total_quiz_attempts'],
+        'passed_quizzes': totals['passed_quizzes'],
+        'quiz_pass_rate': round(
+            (totals['passed_quizzes'] / totals['total_quiz_attempts'] * 100) if totals['total_quiz_attempts'] > 0 else 0, 1
+        ),
+        'avg_quiz_score': round(totals['avg_quiz_score'], 1),
+        'access_by_method': {
+            'enrollment': totals['total_enrollments'],
+            'course_access': totals['total_accesses'],
+            'bundle': totals['bundle_purchases'],
+            'cohort': totals['cohort_members'],
+        },
+        'drop_off_count': drop_off_count,
+        'drop_off_rate': round((drop_off_count / students_started * 100) if students_started > 0 else 0, 1),
+        'eligible_students_count': eligible_students_count,
+    }
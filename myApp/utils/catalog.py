@@ -0,0 +1,70 @@
+"""
+Course Catalog Utilities
+Builds the /courses/ listing from a fixed number of queries, however many
+courses the catalog holds.
+"""
+from django.db.models import Count, OuterRef, Subquery
+from ..models import Lesson, FavoriteCourse
+from .progress import get_user_course_progress_map
+
+
+def annotate_catalog_courses(courses):
+    """
+    Annotate a Course queryset with what the catalog cards need:
+    - lesson_total: number of lessons (read by Course.get_lesson_count)
+    - first_lesson_slug: slug of the first lesson, for Start/Continue links
+    """
+    first_lesson = Lesson.objects.filter(course=OuterRef('pk')).order_by('order', 'id')
+    return courses.annotate(
+        lesson_total=Count('lessons', distinct=True),
+        first_lesson_slug=Subquery(first_lesson.values('slug')[:1]),
+    )
+
+
+def load_course_catalog(courses, user=None):
+    """
+    Build the catalog entries for a Course queryset.
+
+    One query for the annotated courses, and for a logged-in user one query
+    for their progress rollups and one for their favorite course ids.
+
+    Returns (courses_data, in_progress_courses, not_started_courses).
+    """
+    courses = list(annotate_catalog_courses(courses))
+
+    progress_by_course = {}
+    favorite_ids = set()
+    if user and user.is_authenticated:
+        course_ids = [course.id for course in courses]
+        progress_by_course = get_user_course_progress_map(user, course_ids)
+        favorite_ids = set(
+            FavoriteCourse.objects.filter(
+                user=user,
+                course_id__in=course_ids
+            ).values_list('course_id', flat=True)
+        )
+    else:
+        user = None
+
+    courses_data = []
+    in_progress_courses = []
+    not_started_courses = []
+
+    for course in courses:
+        rollup = progress_by_course.get(course.id)
+        course_info = {
+            'course': course,
+            'has_any_progress': rollup.has_any_progress if rollup else False,
+            'progress_percentage': rollup.progress_percentage if rollup else 0,
+            'is_favorited': course.id in favorite_ids,
+        }
+
+        # Separate into in-progress and not-started (guests see everything as not started)
+        if user and course_info['has_any_progress']:
+            in_progress_courses.append(course_info)
+        else:
+            not_started_courses.append(course_info)
+
+        courses_data.append(course_info)
+
+    return courses_data, in_progress_courses, not_started_courses
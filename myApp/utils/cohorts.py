@@ -0,0 +1,150 @@
+"""
+Cohort Access Utilities
+Fans cohort course access out to every member in chunks: batched inserts for
+grants, batched UPDATEs for revokes. Large fan-outs run as a CohortSyncJob in
+a background thread and report progress on the job row.
+"""
+import threading
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from ..models import CourseAccess, CohortMember, CohortSyncJob
+from .access import bulk_grant_course_access
+from .entitlements import invalidate_entitlements_many
+
+
+COHORT_SYNC_BATCH_SIZE = 500
+
+
+def _member_id_chunks(cohort_id, batch_size=COHORT_SYNC_BATCH_SIZE):
+    """Yield lists of member user ids, batch_size at a time, in id order"""
+    members = CohortMember.objects.filter(cohort_id=cohort_id)
+    user_ids = list(members.order_by('user_id').values_list('user_id', flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        yield user_ids[start:start + batch_size]
+
+
+def grant_cohort_courses(cohort, course_ids, user_ids, granted_by=None):
+    """
+    Grant cohort access to course_ids for one chunk of users.
+    Returns (granted_count, skipped_count).
+    """
+    return bulk_grant_course_access(
+        user_ids,
+        course_ids,
+        access_type='cohort',
+        granted_by=granted_by,
+        cohort=cohort,
+        notes=f"Granted via cohort: {cohort.name}"
+    )
+
+
+def revoke_cohort_courses(cohort, course_ids, user_ids, revoked_by=None, reason=""):
+    """
+    Revoke access granted through this cohort for one chunk of users.
+    Only touches CourseAccess rows that came from the cohort. Returns the number revoked.
+    """
+    accesses = CourseAccess.objects.filter(
+        cohort=cohort,
+        user_id__in=user_ids,
+        status='unlocked'
+    )
+    if course_ids is not None:
+        accesses = accesses.filter(course_id__in=course_ids)
+    revoked = accesses.update(
+        status='revoked',
+        revoked_at=timezone.now(),
+        revoked_by=revoked_by,
+        revocation_reason=reason[:200]
+    )
+    # update() skips post_save, so drop the snapshots here
+    if revoked:
+        invalidate_entitlements_many(user_ids)
+    return revoked
+
+
+def run_cohort_sync_job(job, batch_size=COHORT_SYNC_BATCH_SIZE):
+    """
+    Process a CohortSyncJob chunk by chunk, saving progress after each chunk.
+    A revoke (course detached from the cohort) applies to every member:
+    CohortMember.remove_access_on_leave only covers leaving the cohort, and
+    the course is no longer part of it.
+    """
+    cohort = job.cohort
+    is_revoke = job.action == 'revoke'
+    chunks = list(_member_id_chunks(cohort.id, batch_size=batch_size))
+
+    job.status = 'processing'
+    job.started_at = timezone.now()
+    job.total_members = sum(len(chunk) for chunk in chunks)
+    job.processed_members = 0
+    job.save(update_fields=['status', 'started_at', 'total_members', 'processed_members'])
+
+    try:
+        for chunk in chunks:
+            if is_revoke:
+                job.revoked_count += revoke_cohort_courses(
+                    cohort, job.course_ids, chunk,
+                    reason=f"Course removed from cohort: {cohort.name}"
+                )
+            else:
+                granted, skipped = grant_cohort_courses(cohort, job.course_ids, chunk)
+                job.granted_count += granted
+                job.skipped_count += skipped
+            job.processed_members += len(chunk)
+            job.save(update_fields=['processed_members', 'granted_count', 'revoked_count', 'skipped_count'])
+
+        job.status = 'completed'
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def _run_job_in_thread(job_id):
+    close_old_connections()
+    try:
+        job = CohortSyncJob.objects.select_related('cohort').get(id=job_id)
+        run_cohort_sync_job(job)
+    finally:
+        close_old_connections()
+
+
+def queue_cohort_sync(cohort, action, course_ids):
+    """
+    Create a CohortSyncJob and start it in a background thread once the
+    current transaction commits. Returns the job (poll it for progress).
+    """
+    job = CohortSyncJob.objects.create(
+        cohort=cohort,
+        action=action,
+        course_ids=sorted(course_ids)
+    )
+
+    def start():
+        thread = threading.Thread(target=_run_job_in_thread, args=(job.id,))
+        thread.daemon = True
+        thread.start()
+
+    transaction.on_commit(start)
+    return job
+
+
+def sync_member_joined(member):
+    """New member - grant the cohort's courses to just this user."""
+    course_ids = list(member.cohort.courses.values_list('id', flat=True))
+    if not course_ids:
+        return 0, 0
+    return grant_cohort_courses(member.cohort, course_ids, [member.user_id])
+
+
+def sync_member_left(member):
+    """Member removed - revoke cohort access unless remove_access_on_leave is off."""
+    if not member.remove_access_on_leave:
+        return 0
+    return revoke_cohort_courses(
+        member.cohort_id, None, [member.user_id],
+        reason="Removed from cohort"
+    )
@@ -0,0 +1,77 @@
+"""
+Watch Coverage Utilities
+Which seconds of a lesson video a student actually watched, stored on
+UserProgress.watched_bitmap as a bitmap: bit i (little-endian) is second i.
+Segments reported by the player are merged with a bitwise OR and coverage is
+a popcount, so seeking to the end no longer counts as watching it.
+UserProgress.rewatched_bitmap marks the seconds played more than once.
+A one-hour lesson takes 450 bytes per bitmap.
+"""
+import math
+
+
+MAX_SEGMENTS_PER_SAMPLE = 100
+
+
+def parse_segments(raw):
+    """
+    Validate player segments: a list of [start, end] pairs in seconds.
+    Raises ValueError on anything else.
+    """
+    if not isinstance(raw, list):
+        raise ValueError('segments must be a list')
+    if len(raw) > MAX_SEGMENTS_PER_SAMPLE:
+        raise ValueError(f'at most {MAX_SEGMENTS_PER_SAMPLE} segments per sample')
+    segments = []
+    for segment in raw:
+        if not isinstance(segment, (list, tuple)) or len(segment) != 2:
+            raise ValueError('each segment must be [start, end]')
+        start, end = float(segment[0]), float(segment[1])
+        if not (math.isfinite(start) and math.isfinite(end)) or end < start:
+            raise ValueError('segment bounds must be finite with start <= end')
+        segments.append((start, end))
+    return segments
+
+
+def bitmap_to_int(bitmap):
+    return int.from_bytes(bytes(bitmap or b''), 'little')
+
+
+def int_to_bitmap(bits, duration):
+    """Pack to exactly ceil(duration / 8) bytes, dropping seconds past the end"""
+    size = (duration + 7) // 8
+    return (bits & ((1 << duration) - 1)).to_bytes(size, 'little')
+
+
+def segments_to_masks(segments, duration, watched=0):
+    """
+    OR the seconds touched by each segment into an int bitmap.
+    Returns (bits, rewatched): rewatched has the seconds that were already
+    watched (in `watched` or an earlier segment) and got played again.
+    """
+    bits = rewatched = 0
+    for start, end in segments:
+        # Rounded, so back-to-back segments don't share (and "rewatch") a second
+        first = max(round(start), 0)
+        last = min(round(end), duration)
+        if last > first:
+            mask = ((1 << (last - first)) - 1) << first
+            rewatched |= (watched | bits) & mask
+            bits |= mask
+    return bits, rewatched
+
+
+def merge_bitmaps(*bitmaps):
+    """Bitwise OR of stored bitmaps (bytes) and/or ints, as an int"""
+    bits = 0
+    for bitmap in bitmaps:
+        bits |= bitmap if isinstance(bitmap, int) else bitmap_to_int(bitmap)
+    return bits
+
+
+def coverage_percentage(bits, duration):
+    """Share of the video's seconds that are watched (0-100)"""
+    if duration <= 0:
+        return 0.0
+    watched = (bits & ((1 << duration) - 1)).bit_count()
+    return watched * 100.0 / duration
@@ -0,0 +1,108 @@
+"""
+Dashboard Cache Utilities
+Caches computed dashboard contexts with a TTL. In stale-while-revalidate mode
+an expired context keeps being served while a single request (holding a short
+cache lock) recomputes it, so a burst of refreshes doesn't all hit the DB.
+A cold miss takes the same lock: other requests get a placeholder (PENDING)
+right away instead of all computing it at once - nobody sleeps in a request
+thread waiting for someone else's result.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+DEFAULT_TTL = 60  # seconds
+DEFAULT_MAX_STALE = 60 * 10  # how long an expired context may still be served
+REFRESH_LOCK_TIMEOUT = 60  # give up on a stuck recompute after this long
+
+
+class CacheReport:
+    """How a cached context was served: status, age and how long it took to compute."""
+
+    HIT = 'hit'              # fresh cached copy (possibly just computed by another request)
+    STALE = 'stale'          # expired copy, another request is recomputing
+    MISS = 'miss'            # nothing cached (or too old), computed now
+    PENDING = 'pending'      # nothing cached, another request is computing it - placeholder served
+    REFRESHED = 'refreshed'  # expired or forced, recomputed by this request
+
+    def __init__(self, status, computed_at, compute_seconds):
+        self.status = status
+        self.computed_at = computed_at
+        self.compute_seconds = compute_seconds
+        self.age = max(time.time() - computed_at, 0)
+
+    @property
+    def computed(self):
+        """True when this request did the work"""
+        return self.status in (self.MISS, self.REFRESHED)
+
+    @property
+    def pending(self):
+        return self.status == self.PENDING
+
+    def header(self):
+        return f'{self.status}; age={self.age:.0f}; compute={self.compute_seconds:.3f}'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_cached_context(key, compute, ttl=None, stale_while_revalidate=None, force=False, placeholder=None):
+    """
+    Return (context, CacheReport) for a dashboard page.
+
+    compute() builds the context dict; it must be picklable (evaluate
+    querysets to lists). ttl and stale_while_revalidate default to the
+    DASHBOARD_CACHE_TTL / DASHBOARD_CACHE_STALE_WHILE_REVALIDATE settings.
+    force=True recomputes regardless of age ("refresh now").
+    placeholder is returned (default {}) with a PENDING report when nothing
+    is cached yet and another request is already computing it.
+    """
+    ttl = _setting('DASHBOARD_CACHE_TTL', DEFAULT_TTL) if ttl is None else ttl
+    if stale_while_revalidate is None:
+        stale_while_revalidate = _setting('DASHBOARD_CACHE_STALE_WHILE_REVALIDATE', True)
+    max_stale = _setting('DASHBOARD_CACHE_MAX_STALE', DEFAULT_MAX_STALE)
+    lock_key = f'{key}:refreshing'
+
+    entry = None if force else cache.get(key)
+    was_cached = entry is not None
+    holds_lock = False
+    if was_cached:
+        age = time.time() - entry['computed_at']
+        if age < ttl:
+            return entry['context'], CacheReport(CacheReport.HIT, entry['computed_at'], entry['compute_seconds'])
+        if stale_while_revalidate:
+            holds_lock = cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT)
+            if not holds_lock:
+                # Someone else is recomputing - serve what we have
+                return entry['context'], CacheReport(CacheReport.STALE, entry['computed_at'], entry['compute_seconds'])
+    elif not force:
+        holds_lock = cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT)
+        if not holds_lock:
+            # Cold miss someone else is already computing - don't wait for it
+            context = {} if placeholder is None else placeholder
+            return context, CacheReport(CacheReport.PENDING, time.time(), 0.0)
+
+    try:
+        started = time.monotonic()
+        context = compute()
+        entry = {
+            'context': context,
+            'computed_at': time.time(),
+            'compute_seconds': time.monotonic() - started,
+        }
+        # Keep it around past the TTL so stale copies can still be served
+        cache.set(key, entry, ttl + max_stale if stale_while_revalidate else ttl)
+    finally:
+        if holds_lock:
+            cache.delete(lock_key)
+
+    status = CacheReport.REFRESHED if was_cached or force else CacheReport.MISS
+    return context, CacheReport(status, entry['computed_at'], entry['compute_seconds'])
+
+
+def invalidate_cached_context(key):
+    cache.delete(key)
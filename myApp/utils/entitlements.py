@@ -0,0 +1,100 @@
+"""
+Entitlement Snapshot Utilities
+Per-user snapshot of unlocked CourseAccess records (course id + expiry),
+memoized on the user object for the request and cached across requests.
+Expiry is checked against the cached timestamps, so an access that runs out
+stops counting without a DB hit.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+from ..models import CourseAccess
+
+
+ENTITLEMENT_CACHE_TIMEOUT = 60 * 60  # 1 hour - invalidated on change anyway
+_REQUEST_ATTR = '_entitlement_snapshot'
+
+
+def _entitlement_cache_key(user_id):
+    return f"entitlements:{user_id}"
+
+
+class EntitlementSnapshot:
+    """Unlocked accesses for one user, keyed by course id."""
+
+    def __init__(self, user_id, rows):
+        """
+        rows: iterable of (access_id, course_id, expires_at) for the user's
+        unlocked accesses, newest grant first.
+        """
+        self.user_id = user_id
+        self.grants = {}
+        for access_id, course_id, expires_at in rows:
+            self.grants.setdefault(course_id, []).append((access_id, expires_at))
+
+        expiries = [
+            expires_at
+            for grants in self.grants.values()
+            for _, expires_at in grants
+            if expires_at
+        ]
+        # Earliest expiry across all grants (None when nothing expires)
+        self.next_expiry = min(expiries) if expiries else None
+
+    def active_access_id(self, course_id, now=None):
+        """Id of the newest unexpired access for a course, or None"""
+        now = now or timezone.now()
+        for access_id, expires_at in self.grants.get(course_id, ()):
+            if not expires_at or expires_at >= now:
+                return access_id
+        return None
+
+    def has_access(self, course_id, now=None):
+        return self.active_access_id(course_id, now) is not None
+
+    def course_ids(self, now=None):
+        """Set of course ids the user can currently open"""
+        now = now or timezone.now()
+        return {course_id for course_id in self.grants if self.has_access(course_id, now)}
+
+
+def build_entitlement_snapshot(user_id):
+    """Build the snapshot from one query (no caching)."""
+    rows = CourseAccess.objects.filter(
+        user_id=user_id,
+        status='unlocked'
+    ).order_by('-granted_at').values_list('id', 'course_id', 'expires_at')
+    return EntitlementSnapshot(user_id, rows)
+
+
+def get_entitlement_snapshot(user):
+    """
+    Get the entitlement snapshot for a user.
+    Memoized on the user object (request.user) and cached between requests.
+    """
+    snapshot = getattr(user, _REQUEST_ATTR, None)
+    if snapshot is not None:
+        return snapshot
+
+    key = _entitlement_cache_key(user.id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_entitlement_snapshot(user.id)
+        cache.set(key, snapshot, ENTITLEMENT_CACHE_TIMEOUT)
+    setattr(user, _REQUEST_ATTR, snapshot)
+    return snapshot
+
+
+def invalidate_entitlements(user):
+    """Drop the cached snapshot for a user (User instance or id)."""
+    user_id = getattr(user, 'id', user)
+    if user_id:
+        cache.delete(_entitlement_cache_key(user_id))
+    if hasattr(user, _REQUEST_ATTR):
+        delattr(user, _REQUEST_ATTR)
+
+
+def invalidate_entitlements_many(user_ids):
+    """Drop the cached snapshots for many users at once (bulk grants/updates)."""
+    keys = [_entitlement_cache_key(user_id) for user_id in set(user_ids) if user_id]
+    if keys:
+        cache.delete_many(keys)
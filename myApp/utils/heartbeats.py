@@ -0,0 +1,540 @@
+"""
+Video Heartbeat Utilities
+Write-coalescing buffer for video progress heartbeats. Each heartbeat only
+updates a buffered (max watch %, latest timestamp, watched and rewatched
+seconds bitmaps) per (user, lesson); the buffer is flushed to UserProgress in batched bulk_updates once per flush
+interval, by a timer thread in each process (start_flush_timer) and/or
+`manage.py flush_progress_heartbeats` on a scheduler - never inside a
+player request. Crossing the completion threshold is written to the
+database immediately, as before. Heartbeats leave the buffer only once the
+flush that read them has committed; if it fails they stay for the next one.
+
+Two buffers share one interface:
+  CacheHeartbeatBuffer - in the Django cache, shared by every worker (Redis).
+                         Required when more than one process serves requests.
+  LocalHeartbeatBuffer - in-process stand-in for local development. Each
+                         process only sees its own heartbeats, and whatever
+                         is unflushed is lost if the process dies (a clean
+                         exit still flushes).
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from ..models import Lesson, UserProgress
+from .activity import record_lesson_completed, record_progress_milestones
+from .coverage import coverage_percentage, int_to_bitmap, merge_bitmaps, segments_to_masks
+from .progress import refresh_user_course_progress_many
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 30  # seconds
+FLUSH_GRACE = 2  # let in-flight writes to a closed generation land before flushing it
+FLUSH_LOCK_TIMEOUT = 60
+ENTRY_TIMEOUT = 60 * 60  # unflushed heartbeats survive this long without a flush
+STATE_TIMEOUT = 60 * 60 * 6
+
+FLUSH_FIELDS = [
+    'video_watch_percentage', 'last_watched_timestamp', 'progress_percentage', 'status', 'started_at',
+    'last_accessed', 'watched_bitmap', 'rewatched_bitmap',
+]
+
+
+def flush_interval():
+    return getattr(settings, 'PROGRESS_HEARTBEAT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+
+def _merge(old, percentage, timestamp, bits=0, rewatched=0, seen_at=0.0, client_ts=None):
+    """
+    Keep the highest watch percentage, the latest playback position and every
+    (re)watched second. seen_at is when the latest heartbeat arrived (epoch
+    seconds), so a flush can tell whether the row was written after it.
+    The position is the one with the highest client_ts (when the player
+    took it), so a batch resent late doesn't move it back; heartbeats
+    without one are ordered by arrival.
+    """
+    if old is None:
+        return (percentage, timestamp, bits, rewatched, seen_at, client_ts)
+    if old[5] is not None and client_ts is not None:
+        newer = client_ts >= old[5]
+    else:
+        newer = seen_at >= old[4]
+    position = (timestamp, client_ts) if newer else (old[1], old[5])
+    return (max(old[0], percentage), position[0], old[2] | bits, old[3] | rewatched, max(old[4], seen_at), position[1])
+
+
+class LocalHeartbeatBuffer:
+    """In-process buffer. Only sees this process's heartbeats."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def add(self, user_id, lesson_id, percentage, timestamp, bits=0, rewatched=0, client_ts=None):
+        key = (user_id, lesson_id)
+        with self._lock:
+            self._entries[key] = _merge(
+                self._entries.get(key), percentage, timestamp, bits, rewatched, time.time(), client_ts
+            )
+
+    def peek(self, user_id, lesson_id):
+        return self._entries.get((user_id, lesson_id))
+
+    def flush_due(self):
+        return bool(self._entries) and time.monotonic() - self._last_flush >= flush_interval()
+
+    @contextmanager
+    def drain(self, force=False):
+        """
+        Yield every buffered entry:
+        {(user_id, lesson_id): (percentage, timestamp, bits, rewatched, seen_at, client_ts)}.
+        They are dropped only if the block finishes without an error, and
+        not if a heartbeat updated them meanwhile (writing one twice is harmless).
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._last_flush < flush_interval():
+                entries = {}
+            else:
+                entries = dict(self._entries)
+        yield entries
+        with self._lock:
+            for key, entry in entries.items():
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            self._last_flush = time.monotonic()
+
+
+class CacheHeartbeatBuffer:
+    """
+    Buffer in the Django cache, bucketed into flush-interval generations.
+    Heartbeats are only appended - each one is stored under its own number
+    from an atomic incr and merged when read - so concurrent requests for
+    the same pair can't overwrite each other. A pair's first heartbeat in a
+    generation also claims a numbered slot, so a flush can find every pair
+    without scanning keys. Only closed generations are flushed, so writers
+    and the flusher never touch the same entries.
+    """
+
+    prefix = 'heartbeat'
+
+    def _generation(self, now=None):
+        return int((now if now is not None else time.time()) // flush_interval())
+
+    def _pair_key(self, generation, user_id, lesson_id):
+        return f'{self.prefix}:{generation}:{user_id}:{lesson_id}'
+
+    def _closed_generation(self):
+        return self._generation(time.time() - FLUSH_GRACE) - 1
+
+    def _first_unflushed(self, generation):
+        """Oldest generation that may still hold heartbeats (older ones have expired or been flushed)"""
+        oldest = generation - ENTRY_TIMEOUT // flush_interval()
+        flushed = cache.get(f'{self.prefix}:flushed')
+        return oldest if flushed is None else max(flushed + 1, oldest)
+
+    def _incr(self, key):
+        cache.add(key, 0, ENTRY_TIMEOUT)
+        return cache.incr(key)
+
+    def add(self, user_id, lesson_id, percentage, timestamp, bits=0, rewatched=0, client_ts=None):
+        generation = self._generation()
+        pair_key = self._pair_key(generation, user_id, lesson_id)
+        number = self._incr(f'{pair_key}:count')
+        sample = (percentage, timestamp, bits, rewatched, time.time(), client_ts)
+        cache.set(f'{pair_key}:{number}', sample, ENTRY_TIMEOUT)
+        if number == 1:
+            slot = self._incr(f'{self.prefix}:{generation}:count')
+            cache.set(f'{self.prefix}:{generation}:slot:{slot}', (user_id, lesson_id), ENTRY_TIMEOUT)
+
+    def _read_samples(self, pair_keys):
+        """
+        {pair key: merged entry} for the given pair keys, plus every cache key
+        read for them. Samples are merged in arrival order.
+        """
+        count_keys = [f'{pair_key}:count' for pair_key in pair_keys]
+        counts = cache.get_many(count_keys)
+        sample_keys = [
+            f'{pair_key}:{number}'
+            for pair_key in pair_keys
+            for number in range(1, counts.get(f'{pair_key}:count', 0) + 1)
+        ]
+        samples = cache.get_many(sample_keys)
+        merged = {}
+        for key in sample_keys:
+            if key in samples:
+                pair_key = key.rsplit(':', 1)[0]
+                merged[pair_key] = _merge(merged.get(pair_key), *samples[key])
+        return merged, [key for key in count_keys if key in counts] + sample_keys
+
+    def peek(self, user_id, lesson_id):
+        """Everything not flushed yet, however far behind the flusher is"""
+        generation = self._generation()
+        merged, _ = self._read_samples([
+            self._pair_key(g, user_id, lesson_id) for g in range(self._first_unflushed(generation), generation + 1)
+        ])
+        value = None
+        for entry in merged.values():  # generations in order
+            value = _merge(value, *entry)
+        return value
+
+    def flush_due(self):
+        flushed = cache.get(f'{self.prefix}:flushed')
+        return flushed is None or flushed < self._closed_generation()
+
+    @contextmanager
+    def drain(self, force=False):
+        """
+        Yield every entry from closed, unflushed generations (one flusher at a
+        time). They are deleted, and the generations marked flushed, only if
+        the block finishes without an error.
+        """
+        lock_key = f'{self.prefix}:flush-lock'
+        if not cache.add(lock_key, True, FLUSH_LOCK_TIMEOUT):
+            yield {}
+            return
+        try:
+            if not force and not self.flush_due():
+                yield {}
+                return
+            closed = self._closed_generation()
+            entries = {}
+            keys = []
+            for generation in range(self._first_unflushed(closed), closed + 1):
+                count = cache.get(f'{self.prefix}:{generation}:count') or 0
+                if not count:
+                    continue
+                slot_keys = [f'{self.prefix}:{generation}:slot:{slot}' for slot in range(1, count + 1)]
+                pairs = {self._pair_key(generation, *pair): pair for pair in cache.get_many(slot_keys).values()}
+                merged, sample_keys = self._read_samples(list(pairs))
+                for pair_key, value in merged.items():
+                    pair = pairs[pair_key]
+                    entries[pair] = _merge(entries.get(pair), *value)
+                keys += slot_keys + sample_keys + [f'{self.prefix}:{generation}:count']
+
+            yield entries
+            cache.set(f'{self.prefix}:flushed', closed, None)
+            cache.delete_many(keys)
+        finally:
+            cache.delete(lock_key)
+
+
+_local_buffer = LocalHeartbeatBuffer()
+
+
+def get_heartbeat_buffer():
+    """PROGRESS_HEARTBEAT_BUFFER = 'cache' shares the buffer between workers; anything else is in-process."""
+    if getattr(settings, 'PROGRESS_HEARTBEAT_BUFFER', 'local') == 'cache':
+        return CacheHeartbeatBuffer()
+    return _local_buffer
+
+
+def _state_key(user_id, lesson_id):
+    return f'heartbeat_state:{user_id}:{lesson_id}'
+
+
+def get_progress_state(user_id, lesson_id):
+    """Cached completion flag, threshold, highest saved watch % and watched bitmap for one UserProgress"""
+    key = _state_key(user_id, lesson_id)
+    state = cache.get(key)
+    if state is None:
+        row = UserProgress.objects.filter(user_id=user_id, lesson_id=lesson_id).values_list(
+            'completed', 'video_completion_threshold', 'video_watch_percentage', 'watched_bitmap'
+        ).first()
+        if row:
+            state = {'completed': row[0], 'threshold': row[1], 'max_percentage': row[2], 'bitmap': bytes(row[3])}
+        else:
+            state = {
+                'completed': False,
+                'threshold': UserProgress._meta.get_field('video_completion_threshold').default,
+                'max_percentage': 0.0,
+                'bitmap': b'',
+            }
+        cache.set(key, state, STATE_TIMEOUT)
+    return state
+
+
+def invalidate_progress_state(user_id, lesson_id):
+    cache.delete(_state_key(user_id, lesson_id))
+
+
+def _merge_bitmaps_into(progress, bits, rewatched, duration):
+    if bits:
+        progress.watched_bitmap = int_to_bitmap(merge_bitmaps(progress.watched_bitmap, bits), duration)
+    if rewatched:
+        progress.rewatched_bitmap = int_to_bitmap(merge_bitmaps(progress.rewatched_bitmap, rewatched), duration)
+
+
+def _complete_now(user, lesson, percentage, timestamp, bits, rewatched):
+    """Completion threshold crossed - write it straight to the database."""
+    progress, created = UserProgress.objects.get_or_create(user=user, lesson=lesson)
+    was_completed = progress.completed
+    progress.video_watch_percentage = max(progress.video_watch_percentage, percentage)
+    progress.last_watched_timestamp = timestamp
+    _merge_bitmaps_into(progress, bits, rewatched, lesson.vimeo_duration_seconds)
+    progress.progress_percentage = int(progress.video_watch_percentage)
+    progress.update_status()  # saves
+    if progress.completed and not was_completed:
+        record_lesson_completed(user, lesson, progress)
+    return progress
+
+
+def record_heartbeat(user, lesson, percentage, timestamp, segments=None, client_ts=None):
+    """
+    Handle one progress heartbeat.
+    segments: [(start, end), ...] seconds played since the last heartbeat.
+    Whenever the video's duration is known the watch % is capped at the
+    real coverage (saved and buffered, plus these segments), so seeking to
+    the end - or posting 100 without segments - doesn't complete the lesson.
+    client_ts: when the player took the sample; the position kept is the
+    one with the highest client_ts.
+    Returns (watch_percentage, status, completed) for the response.
+    """
+    state = get_progress_state(user.id, lesson.id)
+    buffer = get_heartbeat_buffer()
+
+    bits = rewatched = 0
+    buffered = buffer.peek(user.id, lesson.id)
+    duration = lesson.vimeo_duration_seconds
+    if duration > 0:
+        previously = merge_bitmaps(state['bitmap'], buffered[2] if buffered else 0)
+        if segments is not None:
+            bits, rewatched = segments_to_masks(segments, duration, previously)
+        percentage = min(percentage, coverage_percentage(previously | bits, duration))
+
+    if not state['completed'] and percentage >= state['threshold']:
+        # Also save what's still buffered, so the bitmaps are complete on the row
+        if buffered:
+            bits, rewatched = bits | buffered[2], rewatched | buffered[3]
+            timestamp = _merge(buffered, percentage, timestamp, seen_at=time.time(), client_ts=client_ts)[1]
+        progress = _complete_now(user, lesson, percentage, timestamp, bits, rewatched)
+        return progress.video_watch_percentage, progress.status, progress.completed
+
+    buffer.add(user.id, lesson.id, percentage, timestamp, bits, rewatched, client_ts)
+    best = max(percentage, buffered[0] if buffered else 0.0, state['max_percentage'])
+
+    if not state['completed'] and record_progress_milestones(user, lesson, state['max_percentage'], best):
+        state['max_percentage'] = best
+        cache.set(_state_key(user.id, lesson.id), state, STATE_TIMEOUT)
+
+    start_flush_timer()
+
+    if state['completed']:
+        status = 'completed'
+    else:
+        status = 'in_progress' if best > 0 else 'not_started'
+    return best, status, state['completed']
+
+
+def collapse_heartbeat_samples(samples):
+    """
+    Reduce a batch of samples to
+    {lesson_id: (max percentage, latest timestamp, segments or None, its client_ts)}.
+    A sample resent in the same batch (same lesson and client_ts, e.g. a
+    failed batch re-queued by the player) is only counted once, so its
+    segments aren't played "twice"; the rest are ordered by client_ts (batch
+    order when missing). Duplicate and out-of-order samples therefore give
+    the same result as the in-order batch.
+    """
+    unique = {}
+    for position, sample in enumerate(samples):
+        if sample.get('client_ts') is not None:
+            key = (sample['lesson_id'], sample['client_ts'])
+        else:
+            key = (sample['lesson_id'], None, sample['timestamp'], repr(sample.get('segments')))
+        unique.setdefault(key, (position, sample))
+    ordered = sorted(
+        unique.values(),
+        key=lambda item: (item[1].get('client_ts') is None, item[1].get('client_ts') or 0, item[0])
+    )
+    collapsed = {}
+    for _, sample in ordered:
+        lesson_id = sample['lesson_id']
+        percentage, _, segments, _ = collapsed.get(lesson_id, (sample['watch_percentage'], None, None, None))
+        if sample.get('segments') is not None:
+            segments = (segments or []) + sample['segments']
+        collapsed[lesson_id] = (
+            max(percentage, sample['watch_percentage']), sample['timestamp'], segments, sample.get('client_ts')
+        )
+    return collapsed
+
+
+def record_heartbeat_batch(user, samples):
+    """
+    Apply a batch of heartbeat samples for one user: lessons are validated in
+    one query and every lesson's collapsed sample goes through record_heartbeat.
+    Each lesson is buffered on its own, like a single heartbeat; a batch
+    arriving after a newer one keeps the newer position (see _merge).
+    Returns ({lesson_id: (watch_percentage, status, completed)}, unknown lesson ids).
+    """
+    collapsed = collapse_heartbeat_samples(samples)
+    lessons = Lesson.objects.in_bulk(list(collapsed))
+
+    results = {}
+    for lesson_id, (percentage, timestamp, segments, client_ts) in collapsed.items():
+        if lesson_id in lessons:
+            results[lesson_id] = record_heartbeat(
+                user, lessons[lesson_id], percentage, timestamp, segments, client_ts
+            )
+    return results, sorted(set(collapsed) - set(lessons))
+
+
+def peek_heartbeat(user_id, lesson_id):
+    """Unflushed (percentage, timestamp, bits, rewatched, seen_at, client_ts) for a pair, or None - lets pages show the latest position."""
+    return get_heartbeat_buffer().peek(user_id, lesson_id)
+
+
+def _apply_entry(progress, entry, duration, now):
+    """
+    Merge one buffered entry into a (locked) row. Never lowers the watch %,
+    leaves completed rows' status and progress alone, and only moves the
+    playback position (and last_accessed) if the row wasn't written after
+    the heartbeat arrived. Returns True when anything changed.
+    """
+    percentage, timestamp, bits, rewatched, seen_at, _ = entry
+    seen = datetime.fromtimestamp(seen_at, tz=dt_timezone.utc) if seen_at else now
+    before = (
+        progress.video_watch_percentage, progress.last_watched_timestamp, progress.progress_percentage,
+        progress.status, progress.last_accessed,
+        bytes(progress.watched_bitmap or b''), bytes(progress.rewatched_bitmap or b''),
+    )
+    progress.video_watch_percentage = max(progress.video_watch_percentage, percentage)
+    if progress.last_accessed is None or progress.last_accessed <= seen:
+        progress.last_watched_timestamp = timestamp
+        progress.last_accessed = seen  # bulk writes skip auto_now
+    _merge_bitmaps_into(progress, bits, rewatched, duration)
+    if not progress.completed:
+        progress.progress_percentage = int(progress.video_watch_percentage)
+        if progress.video_watch_percentage > 0 and progress.status == 'not_started':
+            progress.status = 'in_progress'
+            progress.started_at = progress.started_at or now
+    after = (
+        progress.video_watch_percentage, progress.last_watched_timestamp, progress.progress_percentage,
+        progress.status, progress.last_accessed,
+        bytes(progress.watched_bitmap or b''), bytes(progress.rewatched_bitmap or b''),
+    )
+    return after != before
+
+
+def _locked_rows(pairs):
+    """{(user_id, lesson_id): UserProgress} for the pairs, locked until the transaction ends"""
+    return {
+        (progress.user_id, progress.lesson_id): progress
+        for progress in UserProgress.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            lesson_id__in={lesson_id for _, lesson_id in pairs},
+        )
+        if (progress.user_id, progress.lesson_id) in pairs
+    }
+
+
+def flush_heartbeats(buffer=None, force=False):
+    """
+    Write buffered heartbeats to UserProgress: the rows are read with
+    SELECT ... FOR UPDATE and written with batched bulk_update / bulk_create
+    in one transaction, so a completion or another flush can't slip in
+    between the read and the write. Completion is never changed here.
+    The buffer keeps the heartbeats if anything here fails.
+    Returns the number of (user, lesson) pairs written.
+    """
+    buffer = buffer or get_heartbeat_buffer()
+    with buffer.drain(force=force) as drained:
+        if not drained:
+            return 0
+        return _write_entries(drained)
+
+
+def _write_entries(entries):
+    """Merge drained entries into UserProgress; returns the number of pairs written"""
+    now = timezone.now()
+    lessons = {
+        lesson_id: (course_id, duration)
+        for lesson_id, course_id, duration in Lesson.objects.filter(
+            id__in={lesson_id for _, lesson_id in entries}
+        ).values_list('id', 'course_id', 'vimeo_duration_seconds')
+    }
+    entries = {pair: entry for pair, entry in entries.items() if pair[1] in lessons}  # skip deleted lessons
+
+    with transaction.atomic():
+        existing = _locked_rows(set(entries))
+        to_update = []
+        to_create = []
+        for (user_id, lesson_id), entry in entries.items():
+            progress = existing.get((user_id, lesson_id))
+            if progress is None:
+                progress = UserProgress(user_id=user_id, lesson_id=lesson_id)
+                _apply_entry(progress, entry, lessons[lesson_id][1], now)
+                to_create.append(progress)
+            elif _apply_entry(progress, entry, lessons[lesson_id][1], now):
+                to_update.append(progress)
+
+        UserProgress.objects.bulk_update(to_update, FLUSH_FIELDS, batch_size=500)
+        UserProgress.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+
+        # A row created concurrently wins the insert; merge into it instead
+        if to_create:
+            created = {(progress.user_id, progress.lesson_id) for progress in to_create}
+            raced = [
+                progress for pair, progress in _locked_rows(created).items()
+                if _apply_entry(progress, entries[pair], lessons[pair[1]][1], now)
+            ]
+            UserProgress.objects.bulk_update(raced, FLUSH_FIELDS, batch_size=500)
+
+    # Bulk writes skip post_save, so refresh the rollups and cached states here
+    refresh_user_course_progress_many({(user_id, lessons[lesson_id][0]) for user_id, lesson_id in entries})
+    cache.delete_many([_state_key(user_id, lesson_id) for user_id, lesson_id in entries])
+    return len(entries)
+
+
+_timer_lock = threading.Lock()
+_timer_pid = None
+
+
+def _flush_loop():
+    while True:
+        time.sleep(flush_interval())
+        close_old_connections()
+        try:
+            flush_heartbeats()
+        except Exception:
+            logger.exception("Could not flush progress heartbeats")
+        finally:
+            close_old_connections()
+
+
+def _flush_at_exit():
+    buffer = get_heartbeat_buffer()
+    if isinstance(buffer, LocalHeartbeatBuffer):
+        try:
+            flush_heartbeats(buffer, force=True)
+        except Exception:
+            logger.exception("Could not flush progress heartbeats at exit")
+
+
+def start_flush_timer():
+    """
+    Start this process's flush thread (once per process, also after a fork).
+    Off with PROGRESS_HEARTBEAT_FLUSH_TIMER = False, e.g. when only the
+    management command flushes. With the cache buffer every process runs one,
+    and the buffer's flush lock lets one of them through per interval.
+    """
+    global _timer_pid
+    if _timer_pid == os.getpid() or not getattr(settings, 'PROGRESS_HEARTBEAT_FLUSH_TIMER', True):
+        return
+    with _timer_lock:
+        if _timer_pid == os.getpid():
+            return
+        _timer_pid = os.getpid()
+        thread = threading.Thread(target=_flush_loop, name='heartbeat-flush')
+        thread.daemon = True
+        thread.start()
+        atexit.register(_flush_at_exit)
@@ -0,0 +1,146 @@
+"""
+Course Navigation Utilities
+Precomputed lesson ordering and module boundaries for a course, built from
+two flat queries and cached until a Lesson or Module in the course changes.
+"""
+from django.core.cache import cache
+from ..models import Lesson, Module
+
+
+NAVIGATION_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours - invalidated on change anyway
+
+
+def _navigation_cache_key(course_id):
+    return f"course_navigation:{course_id}"
+
+
+class CourseNavigation:
+    """
+    Ordered lessons for one course with prev/next and module boundaries.
+    All lookups are dict reads keyed by lesson id.
+    """
+
+    def __init__(self, course_id, rows, module_ids):
+        """
+        rows: iterable of (lesson_id, module_id) ordered by lesson (order, id).
+        module_ids: the course's module ids ordered by (order, id), including
+        modules that have no lessons yet.
+        """
+        self.course_id = course_id
+        self.module_ids = list(module_ids)
+        self.module_position = {module_id: idx for idx, module_id in enumerate(self.module_ids)}
+        self.lesson_ids = []
+        self.module_of = {}
+        self.module_lessons = {}
+
+        for lesson_id, module_id in rows:
+            self.lesson_ids.append(lesson_id)
+            self.module_of[lesson_id] = module_id
+            if module_id:
+                self.module_lessons.setdefault(module_id, []).append(lesson_id)
+
+        self.position = {lesson_id: idx for idx, lesson_id in enumerate(self.lesson_ids)}
+
+        self.prev = {}
+        self.next = {}
+        self.prev_in_module = {}
+        self.next_in_module = {}
+        self.first_in_module = {}
+        self.last_in_module = {}
+        self.crosses_module = {}
+
+        for module_lesson_ids in self.module_lessons.values():
+            for idx, lesson_id in enumerate(module_lesson_ids):
+                self.prev_in_module[lesson_id] = module_lesson_ids[idx - 1] if idx > 0 else None
+                self.next_in_module[lesson_id] = module_lesson_ids[idx + 1] if idx + 1 < len(module_lesson_ids) else None
+                self.first_in_module[lesson_id] = idx == 0
+                self.last_in_module[lesson_id] = idx == len(module_lesson_ids) - 1
+
+        for idx, lesson_id in enumerate(self.lesson_ids):
+            self.prev[lesson_id] = self.lesson_ids[idx - 1] if idx > 0 else None
+            module_id = self.module_of[lesson_id]
+            next_id = None
+            has_more_modules = False
+
+            if module_id and self.module_ids:
+                if self.last_in_module[lesson_id]:
+                    # Last lesson in module - go to the first lesson of the next
+                    # module that has lessons
+                    start = self.module_position.get(module_id)
+                    if start is not None:
+                        for next_module_id in self.module_ids[start + 1:]:
+                            if next_module_id in self.module_lessons:
+                                next_id = self.module_lessons[next_module_id][0]
+                                has_more_modules = True
+                                break
+                else:
+                    next_id = self.next_in_module[lesson_id]
+
+            # Fallback: sequential navigation
+            if next_id is None and idx + 1 < len(self.lesson_ids):
+                next_id = self.lesson_ids[idx + 1]
+                next_module_id = self.module_of[next_id]
+                if module_id and next_module_id and module_id != next_module_id:
+                    has_more_modules = True
+
+            self.next[lesson_id] = next_id
+            self.crosses_module[lesson_id] = has_more_modules
+
+    def __contains__(self, lesson_id):
+        return lesson_id in self.position
+
+    def __len__(self):
+        return len(self.lesson_ids)
+
+    def first_lesson_id(self):
+        return self.lesson_ids[0] if self.lesson_ids else None
+
+    def next_lesson_id(self, lesson_id):
+        return self.next.get(lesson_id)
+
+    def prev_lesson_id(self, lesson_id):
+        return self.prev.get(lesson_id)
+
+    def has_more_modules(self, lesson_id):
+        """True when the next lesson starts a different module"""
+        return self.crosses_module.get(lesson_id, False)
+
+    def is_first_in_module(self, lesson_id):
+        return self.first_in_module.get(lesson_id, False)
+
+    def is_last_in_module(self, lesson_id):
+        return self.last_in_module.get(lesson_id, False)
+
+    def prev_lesson_in_module_id(self, lesson_id):
+        return self.prev_in_module.get(lesson_id)
+
+
+def build_course_navigation(course_id):
+    """Build navigation for a course from two flat queries (no caching)."""
+    rows = Lesson.objects.filter(
+        course_id=course_id
+    ).order_by('order', 'id').values_list('id', 'module_id')
+    module_ids = Module.objects.filter(
+        course_id=course_id
+    ).order_by('order', 'id').values_list('id', flat=True)
+    return CourseNavigation(course_id, rows, module_ids)
+
+
+def get_course_navigation(course):
+    """
+    Get the cached navigation for a course (Course instance or id).
+    Builds and caches it on a miss.
+    """
+    course_id = getattr(course, 'id', course)
+    key = _navigation_cache_key(course_id)
+    navigation = cache.get(key)
+    if navigation is None:
+        navigation = build_course_navigation(course_id)
+        cache.set(key, navigation, NAVIGATION_CACHE_TIMEOUT)
+    return navigation
+
+
+def invalidate_course_navigation(course_id):
+    """Drop the cached navigation for a course."""
+    if course_id:
+        cache.delete(_navigation_cache_key(course_id))
@@ -0,0 +1,124 @@
+"""
+PDF Extraction Utilities
+Page-by-page text of a PDF for the quiz importer (see utils/pdf_quiz.py),
+streamed in page order. The embedded text layer is read in-process - it is
+fast, and starting worker processes would cost more than it saves - while
+pages without one (scans) are rendered and OCRed with Tesseract in a pool of
+worker processes, a few pages ahead of the reader. The pool is only started
+once a scanned page turns up.
+No Django imports here, so spawned workers start quickly.
+"""
+import importlib.util
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+
+try:
+    import fitz  # PyMuPDF
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+# pytesseract imports pandas, so it's only imported once a page needs OCR
+OCR_AVAILABLE = importlib.util.find_spec('pytesseract') is not None
+
+
+MIN_TEXT_CHARS = 20  # a page with less embedded text than this counts as a scan
+OCR_DPI = 300
+OCR_PAGES_PER_WORKER = 2  # OCR pages in flight per worker before the reader waits
+
+# Page sources
+TEXT = 'text'
+OCR = 'ocr'
+BLANK = 'blank'
+OCR_UNAVAILABLE = 'ocr_unavailable'
+
+_tesseract_missing = False  # per process: stop trying once the binary isn't found
+
+
+def ocr_page(page):
+    """Text of a rendered page, or None when Tesseract isn't available"""
+    global _tesseract_missing
+    if not OCR_AVAILABLE or _tesseract_missing:
+        return None
+    import pytesseract
+    from PIL import Image
+
+    pixmap = page.get_pixmap(dpi=OCR_DPI, colorspace=fitz.csGRAY)
+    image = Image.frombytes('L', (pixmap.width, pixmap.height), pixmap.samples)
+    try:
+        return pytesseract.image_to_string(image)
+    except pytesseract.TesseractNotFoundError:
+        _tesseract_missing = True
+        return None
+
+
+def _ocr_page_at(path, index):
+    """ocr_page() for one page of a file; runs in a worker process"""
+    with fitz.open(path) as doc:
+        return ocr_page(doc[index])
+
+
+def needs_ocr(page, text):
+    """A page with (almost) no embedded text but an image on it is a scan"""
+    return len(text.strip()) < MIN_TEXT_CHARS and bool(page.get_images())
+
+
+def page_count(path):
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def _resolve(entry):
+    """(page number, text, source) for a queued page, waiting for its OCR if needed"""
+    number, text, result = entry
+    if not isinstance(result, Future):
+        return number, text, result
+    ocr_text = result.result()
+    if ocr_text is None:
+        return number, text, OCR_UNAVAILABLE
+    return number, ocr_text, OCR
+
+
+def extract_pages(path, workers=1):
+    """
+    Yield (page number, text, source) for every page, in page order.
+    source is TEXT, OCR, BLANK, or OCR_UNAVAILABLE for a scan that couldn't
+    be OCRed (its embedded text, if any, is passed through). With workers > 1
+    scanned pages are OCRed in parallel, at most OCR_PAGES_PER_WORKER pages
+    per worker in flight.
+    """
+    pool = None
+    limit = max(workers, 1) * OCR_PAGES_PER_WORKER
+    pending = deque()  # (page number, text, source or Future of OCR text) in page order
+    in_flight = 0
+    try:
+        with fitz.open(path) as doc:
+            for index, page in enumerate(doc):
+                text = page.get_text()
+                if not needs_ocr(page, text):
+                    pending.append((index + 1, text, TEXT if text.strip() else BLANK))
+                elif workers > 1 and OCR_AVAILABLE:
+                    if pool is None:
+                        # spawn, not fork: the caller is a thread in a multi-threaded server process
+                        pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+                    pending.append((index + 1, text, pool.submit(_ocr_page_at, path, index)))
+                    in_flight += 1
+                else:
+                    ocr_text = ocr_page(page)
+                    pending.append((index + 1, text, OCR_UNAVAILABLE) if ocr_text is None else (index + 1, ocr_text, OCR))
+
+                # Hand over everything ready at the head; wait only when too much OCR is queued
+                while pending and (
+                    not isinstance(pending[0][2], Future) or pending[0][2].done() or in_flight >= limit
+                ):
+                    entry = pending.popleft()
+                    if isinstance(entry[2], Future):
+                        in_flight -= 1
+                    yield _resolve(entry)
+
+        while pending:
+            yield _resolve(pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -0,0 +1,207 @@
+"""
+PDF Quiz Import Utilities
+Quiz questions from exam PDFs, extracted in a background QuizImportJob so a
+large upload doesn't hold a request thread. Pages stream in page order from
+utils/pdf_extract.py (scanned pages OCRed in worker processes) and are fed
+line by line to QuestionParser, a small state machine; the questions then go
+through the validation and bulk insert shared with the CSV importer
+(utils/quiz_import.py), which also describes the expected layout.
+The upload is kept in Django's default storage (quiz_imports/) until its job
+finishes, so a job whose thread died with the worker can be resumed - or
+failed and cleaned up - by `manage.py run_quiz_import_jobs`. A running job
+keeps updated_at fresh; a job that stops doing so counts as stale.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from ..models import QuizImportJob
+from .pdf_extract import OCR, OCR_UNAVAILABLE, extract_pages, page_count
+from .quiz_import import PARSED_COLUMNS, PDF_DEFAULT_ANSWER, QuestionParser, import_quiz_rows, question_cells
+
+
+PROGRESS_SAVE_PAGES = 25
+PROGRESS_SAVE_SECONDS = 60  # OCR pages are slow: also save (and so show the job is alive) this often
+MAX_STORED_PROBLEMS = 500
+
+
+UPLOAD_DIR = 'quiz_imports'
+
+FINISH_FIELDS = ['status', 'error', 'questions_found', 'questions_created', 'problems', 'finished_at']
+
+
+class JobTakenOver(Exception):
+    """Another run (run_quiz_import_jobs) claimed the job"""
+
+
+def remove_job_upload(job):
+    """Delete a job's stored upload, if it's still there"""
+    if job.source_path and default_storage.exists(job.source_path):
+        default_storage.delete(job.source_path)
+
+
+def _as_read(job):
+    """The job's row if nobody has changed it since it was read"""
+    return QuizImportJob.objects.filter(
+        id=job.id, status=job.status, started_at=job.started_at, updated_at=job.updated_at
+    )
+
+
+def _held(job):
+    """The job's row while this run holds it: started_at is the run's claim"""
+    return QuizImportJob.objects.filter(id=job.id, status='processing', started_at=job.started_at)
+
+
+def _save_held(job, fields):
+    """Save fields and the updated_at heartbeat, or raise JobTakenOver if another run claimed the job"""
+    job.updated_at = timezone.now()
+    if not _held(job).update(updated_at=job.updated_at, **{field: getattr(job, field) for field in fields}):
+        raise JobTakenOver(f'Job {job.id} was claimed by another run')
+
+
+def _finish(job, problems):
+    job.problems = problems[:MAX_STORED_PROBLEMS]
+    job.finished_at = timezone.now()
+    _save_held(job, FINISH_FIELDS)
+
+
+def run_quiz_import_job(job, workers=None):
+    """
+    Extract, parse and import a job's PDF, saving progress every
+    PROGRESS_SAVE_PAGES pages or PROGRESS_SAVE_SECONDS. Invalid questions are
+    skipped and listed in job.problems. Nothing is imported until the last
+    page is read, so a job can be re-run from the start. The stored upload is
+    removed at the end.
+    The run claims the job from the state it was loaded in. If another run
+    claims it meanwhile, this one stops at its next save without importing
+    anything and returns None; otherwise it returns the job.
+    """
+    workers = workers or getattr(settings, 'PDF_IMPORT_WORKERS', 1)
+    started_at = timezone.now()
+    claimed = _as_read(job).update(
+        status='processing', started_at=started_at, updated_at=started_at,
+        total_pages=0, processed_pages=0, ocr_pages=0, error='',
+    )
+    if not claimed:
+        return None
+    job.status = 'processing'
+    job.started_at = job.updated_at = started_at
+    job.total_pages = job.processed_pages = job.ocr_pages = 0
+    job.error = ''
+
+    problems = []
+    local_path = None
+    try:
+        # PyMuPDF and the OCR workers need a path on this machine
+        with default_storage.open(job.source_path, 'rb') as stored, \
+                tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as local:
+            local_path = local.name
+            shutil.copyfileobj(stored, local)
+
+        job.total_pages = page_count(local_path)
+        _save_held(job, ['total_pages'])
+
+        parser = QuestionParser()
+        questions = []
+        last_save = time.monotonic()
+        for page, text, source in extract_pages(local_path, workers=workers):
+            if source == OCR:
+                job.ocr_pages += 1
+            elif source == OCR_UNAVAILABLE:
+                problems.append({'page': page, 'messages': ['page has no text layer and OCR is not available']})
+            for line in text.splitlines():
+                question = parser.feed(line, page)
+                if question:
+                    questions.append(question)
+            job.processed_pages += 1
+            if job.processed_pages % PROGRESS_SAVE_PAGES == 0 or time.monotonic() - last_save >= PROGRESS_SAVE_SECONDS:
+                _save_held(job, ['processed_pages', 'ocr_pages'])
+                last_save = time.monotonic()
+        if parser.current:
+            questions.append(parser.close())
+
+        pages = {question['number']: question['page'] for question in questions}
+        with transaction.atomic():
+            # Hold the row until the import commits, so a takeover can't import the questions again
+            if not _held(job).select_for_update().exists():
+                raise JobTakenOver(f'Job {job.id} was claimed by another run')
+            report = import_quiz_rows(
+                PARSED_COLUMNS,
+                ((question['number'], question_cells(question, PDF_DEFAULT_ANSWER)) for question in questions),
+                default_lesson=job.lesson,
+                skip_invalid=True,
+            )
+            problems.extend(
+                {'page': pages.get(error['row']), 'question': error['row'], 'messages': error['messages']}
+                for error in report.errors
+            )
+            job.questions_found = len(questions)
+            job.questions_created = report.created
+            job.status = 'completed'
+            _finish(job, problems)
+    except JobTakenOver:
+        return None
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        try:
+            _finish(job, problems)
+        except JobTakenOver:
+            return None
+    finally:
+        if local_path and os.path.exists(local_path):
+            os.remove(local_path)
+    remove_job_upload(job)
+    return job
+
+
+def fail_quiz_import_job(job, error):
+    """
+    Mark a job failed and delete its upload, unless it changed since it was
+    read (a run that's still alive saved progress). Returns True if failed.
+    """
+    now = timezone.now()
+    if not _as_read(job).update(status='failed', error=job.error or error, finished_at=now, updated_at=now):
+        return False
+    remove_job_upload(job)
+    return True
+
+
+def _run_job_in_thread(job_id):
+    close_old_connections()
+    try:
+        job = QuizImportJob.objects.select_related('lesson__course').get(id=job_id)
+        run_quiz_import_job(job)
+    finally:
+        close_old_connections()
+
+
+def queue_quiz_import(lesson, uploaded_file, user=None):
+    """
+    Save the upload to default storage, create a QuizImportJob and start it
+    in a background thread once the current transaction commits. Returns the
+    job (poll it for progress).
+    """
+    uploaded_file.seek(0)
+    source_path = default_storage.save(f'{UPLOAD_DIR}/{uuid.uuid4().hex}.pdf', uploaded_file)
+    job = QuizImportJob.objects.create(
+        lesson=lesson,
+        created_by=user,
+        file_name=uploaded_file.name[:255],
+        source_path=source_path,
+    )
+
+    def start():
+        thread = threading.Thread(target=_run_job_in_thread, args=(job.id,))
+        thread.daemon = True
+        thread.start()
+
+    transaction.on_commit(start)
+    return job
@@ -0,0 +1,149 @@
+"""
+Course Prerequisite Utilities
+Prerequisite status for many courses at once, over a cached copy of the
+Course.prerequisite_courses graph (with its transitive closure).
+"""
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+from ..models import Course, Lesson
+from .entitlements import get_entitlement_snapshot
+from .progress import get_user_course_progress_map
+
+
+PREREQUISITE_GRAPH_CACHE_KEY = 'course_prerequisite_graph'
+PREREQUISITE_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours - invalidated on change anyway
+
+
+class PrerequisiteGraph:
+    """
+    Directed graph course -> direct prerequisites.
+    ancestors(course_id) is the transitive closure, memoized per course.
+    """
+
+    def __init__(self, edges):
+        """edges: iterable of (course_id, prerequisite_course_id)"""
+        self.parents = {}
+        for course_id, prereq_id in edges:
+            self.parents.setdefault(course_id, []).append(prereq_id)
+        for prereq_ids in self.parents.values():
+            prereq_ids.sort()
+        self._ancestors = {}
+
+    def direct(self, course_id):
+        return self.parents.get(course_id, [])
+
+    def ancestors(self, course_id):
+        """All courses reachable through prerequisites (excluding course_id itself)"""
+        if course_id in self._ancestors:
+            return self._ancestors[course_id]
+        seen = set()
+        stack = list(self.direct(course_id))
+        while stack:
+            prereq_id = stack.pop()
+            if prereq_id in seen:
+                continue
+            seen.add(prereq_id)
+            stack.extend(self.direct(prereq_id))
+        seen.discard(course_id)
+        self._ancestors[course_id] = seen
+        return seen
+
+    def would_create_cycle(self, course_id, prereq_ids):
+        """True if adding prereq_ids as prerequisites of course_id closes a loop"""
+        return any(
+            prereq_id == course_id or course_id in self.ancestors(prereq_id)
+            for prereq_id in prereq_ids
+        )
+
+
+def build_prerequisite_graph():
+    """Build the graph from the M2M through table in one query (no caching)."""
+    edges = Course.prerequisite_courses.through.objects.values_list('from_course_id', 'to_course_id')
+    return PrerequisiteGraph(edges)
+
+
+def get_prerequisite_graph():
+    """Get the cached prerequisite graph, building it on a miss."""
+    graph = cache.get(PREREQUISITE_GRAPH_CACHE_KEY)
+    if graph is None:
+        graph = build_prerequisite_graph()
+        cache.set(PREREQUISITE_GRAPH_CACHE_KEY, graph, PREREQUISITE_GRAPH_CACHE_TIMEOUT)
+    return graph
+
+
+def invalidate_prerequisite_graph():
+    cache.delete(PREREQUISITE_GRAPH_CACHE_KEY)
+
+
+def validate_prerequisites(course_id, prereq_ids, graph=None):
+    """Raise ValidationError if these prerequisites would make the graph cyclic."""
+    graph = graph or build_prerequisite_graph()
+    if graph.would_create_cycle(course_id, prereq_ids):
+        raise ValidationError("A course can't require itself, directly or through other prerequisites.")
+
+
+def check_prerequisites_bulk(user, courses):
+    """
+    Prerequisite status for many courses in one pass.
+
+    A prerequisite is satisfied when the user has access to it and has
+    completed all of its lessons (courses with no lessons only need access).
+    For each unsatisfied prerequisite, its own unsatisfied prerequisites are
+    included too, so missing lists the whole chain, deepest first.
+
+    Returns {course_id: (met: bool, missing_prerequisites: list of Course)}.
+    """
+    course_ids = [getattr(course, 'id', course) for course in courses]
+    if not course_ids:
+        return {}
+    graph = get_prerequisite_graph()
+
+    needed = set()
+    for course_id in course_ids:
+        needed |= graph.ancestors(course_id)
+    if not needed:
+        return {course_id: (True, []) for course_id in course_ids}
+
+    entitled = get_entitlement_snapshot(user).course_ids() if user.is_authenticated else set()
+    progress = get_user_course_progress_map(user, needed)
+    lesson_totals = dict(
+        Lesson.objects.filter(course_id__in=needed).values('course_id').annotate(
+            total=Count('id')
+        ).values_list('course_id', 'total')
+    )
+
+    def satisfied(prereq_id):
+        if prereq_id not in entitled:
+            return False
+        total = lesson_totals.get(prereq_id, 0)
+        rollup = progress.get(prereq_id)
+        completed = rollup.completed_lessons if rollup else 0
+        return total == 0 or completed >= total
+
+    unsatisfied = {prereq_id for prereq_id in needed if not satisfied(prereq_id)}
+
+    def missing_chain(course_id):
+        """Unsatisfied prerequisites reachable through unsatisfied courses, deepest first"""
+        chain = []
+        visited = set()
+
+        def visit(node_id):
+            for prereq_id in graph.direct(node_id):
+                if prereq_id in visited or prereq_id not in unsatisfied:
+                    continue
+                visited.add(prereq_id)
+                visit(prereq_id)
+                chain.append(prereq_id)
+
+        visit(course_id)
+        return chain
+
+    chains = {course_id: missing_chain(course_id) for course_id in course_ids}
+    missing_ids = {prereq_id for chain in chains.values() for prereq_id in chain}
+    courses_by_id = Course.objects.in_bulk(missing_ids) if missing_ids else {}
+
+    return {
+        course_id: (not chain, [courses_by_id[prereq_id] for prereq_id in chain if prereq_id in courses_by_id])
+        for course_id, chain in chains.items()
+    }
@@ -0,0 +1,174 @@
+"""
+Course Progress Utilities
+Maintains the UserCourseProgress rollup so views read one indexed row per
+(user, course) instead of counting UserProgress rows on every request.
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+from ..models import Lesson, UserProgress, UserCourseProgress
+
+
+# Same definition of "started" the course listing and dashboard have always used
+ANY_PROGRESS_Q = Q(completed=True) | Q(video_watch_percentage__gt=0) | Q(status__in=['in_progress', 'completed'])
+
+PROGRESS_AGGREGATES = {
+    'completed_lessons': Count('id', filter=Q(completed=True)),
+    'started_lessons': Count('id', filter=ANY_PROGRESS_Q),
+    'avg_watch_percentage': Avg('video_watch_percentage'),
+    'last_activity': Max('last_accessed'),
+    'progress_rows': Count('id'),
+}
+
+
+def refresh_user_course_progress(user_id, course_id):
+    """
+    Recompute the rollup row for one (user, course) from its UserProgress rows.
+    Deletes the row when no UserProgress rows remain.
+    Returns the row, or None if there is no progress.
+    """
+    stats = UserProgress.objects.filter(
+        user_id=user_id,
+        lesson__course_id=course_id
+    ).aggregate(**PROGRESS_AGGREGATES)
+
+    if not stats['progress_rows']:
+        UserCourseProgress.objects.filter(user_id=user_id, course_id=course_id).delete()
+        return None
+
+    row, _ = UserCourseProgress.objects.update_or_create(
+        user_id=user_id,
+        course_id=course_id,
+        defaults={
+            'completed_lessons': stats['completed_lessons'],
+            'total_lessons': Lesson.objects.filter(course_id=course_id).count(),
+            'avg_watch_percentage': stats['avg_watch_percentage'] or 0.0,
+            'has_any_progress': stats['started_lessons'] > 0,
+            'last_activity': stats['last_activity'],
+        }
+    )
+    return row
+
+
+ROLLUP_FIELDS = ['completed_lessons', 'total_lessons', 'avg_watch_percentage', 'has_any_progress', 'last_activity', 'updated_at']
+
+
+def refresh_user_course_progress_many(pairs, batch_size=500):
+    """
+    refresh_user_course_progress() for many (user_id, course_id) pairs in a
+    fixed number of queries: one grouped aggregate, one lesson count, one
+    read of the existing rows, then bulk writes. Returns the number of pairs.
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    user_ids = {user_id for user_id, _ in pairs}
+    course_ids = {course_id for _, course_id in pairs}
+
+    grouped = UserProgress.objects.filter(
+        user_id__in=user_ids, lesson__course_id__in=course_ids
+    ).values('user_id', 'lesson__course_id').annotate(**PROGRESS_AGGREGATES)
+    stats = {(row['user_id'], row['lesson__course_id']): row for row in grouped}
+    lesson_totals = dict(
+        Lesson.objects.filter(course_id__in=course_ids).values('course_id').annotate(
+            total=Count('id')
+        ).values_list('course_id', 'total')
+    )
+    existing = {
+        (row.user_id, row.course_id): row
+        for row in UserCourseProgress.objects.filter(user_id__in=user_ids, course_id__in=course_ids)
+    }
+
+    now = timezone.now()
+    to_update, to_create, to_delete = [], [], []
+    for user_id, course_id in pairs:
+        row = existing.get((user_id, course_id))
+        pair_stats = stats.get((user_id, course_id))
+        if not pair_stats or not pair_stats['progress_rows']:
+            if row is not None:
+                to_delete.append(row.id)
+            continue
+        if row is None:
+            row = UserCourseProgress(user_id=user_id, course_id=course_id)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        row.completed_lessons = pair_stats['completed_lessons']
+        row.total_lessons = lesson_totals.get(course_id, 0)
+        row.avg_watch_percentage = pair_stats['avg_watch_percentage'] or 0.0
+        row.has_any_progress = pair_stats['started_lessons'] > 0
+        row.last_activity = pair_stats['last_activity']
+        row.updated_at = now  # bulk_update skips auto_now
+
+    with transaction.atomic():
+        UserCourseProgress.objects.bulk_update(to_update, ROLLUP_FIELDS, batch_size=batch_size)
+        UserCourseProgress.objects.bulk_create(to_create, batch_size=batch_size, ignore_conflicts=True)
+        if to_delete:
+            UserCourseProgress.objects.filter(id__in=to_delete).delete()
+    return len(pairs)
+
+
+def refresh_course_lesson_totals(course_id):
+    """Update total_lessons on every rollup row of a course (lesson added/removed)."""
+    total = Lesson.objects.filter(course_id=course_id).count()
+    UserCourseProgress.objects.filter(course_id=course_id).exclude(
+        total_lessons=total
+    ).update(total_lessons=total)
+    return total
+
+
+def rebuild_user_course_progress(course_ids=None, batch_size=1000):
+    """
+    Rebuild rollup rows from scratch with one grouped query.
+    Limits the rebuild to course_ids when given. Returns the number of rows written.
+    """
+    progress = UserProgress.objects.all()
+    lessons = Lesson.objects.all()
+    existing = UserCourseProgress.objects.all()
+    if course_ids is not None:
+        progress = progress.filter(lesson__course_id__in=course_ids)
+        lessons = lessons.filter(course_id__in=course_ids)
+        existing = existing.filter(course_id__in=course_ids)
+
+    lesson_totals = dict(
+        lessons.values('course_id').annotate(total=Count('id')).values_list('course_id', 'total')
+    )
+    grouped = progress.values('user_id', 'lesson__course_id').annotate(**PROGRESS_AGGREGATES)
+
+    rows = [
+        UserCourseProgress(
+            user_id=stats['user_id'],
+            course_id=stats['lesson__course_id'],
+            completed_lessons=stats['completed_lessons'],
+            total_lessons=lesson_totals.get(stats['lesson__course_id'], 0),
+            avg_watch_percentage=stats['avg_watch_percentage'] or 0.0,
+            has_any_progress=stats['started_lessons'] > 0,
+            last_activity=stats['last_activity'],
+        )
+        for stats in grouped.iterator()
+    ]
+
+    with transaction.atomic():
+        existing.delete()
+        UserCourseProgress.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def get_user_course_progress_map(user, course_ids=None):
+    """
+    Get {course_id: UserCourseProgress} for a user in one query.
+    Courses with no progress are simply absent from the dict.
+    """
+    if not user.is_authenticated:
+        return {}
+    rows = UserCourseProgress.objects.filter(user=user)
+    if course_ids is not None:
+        rows = rows.filter(course_id__in=course_ids)
+    return {row.course_id: row for row in rows}
+
+
+def get_user_course_progress(user, course):
+    """Get the rollup row for one user/course, or None if there is no progress."""
+    if not user.is_authenticated:
+        return None
+    return UserCourseProgress.objects.filter(user=user, course=course).first()
@@ -0,0 +1,200 @@
+"""
+Quiz Item Analysis Utilities
+Per-question statistics for lesson quizzes, computed with NumPy from the
+answers stored on LessonQuizAttempt (one byte per question, see
+utils/quiz_keys.py) in a single chunked pass - no model instances, no
+re-scoring beyond comparing bytes with the attempt's own answer key.
+
+  difficulty      - p-value, the share of attempts answering correctly
+  discrimination  - point-biserial correlation between getting the item
+                    right and the score on the other items
+  options         - selection rate of every option (and of no answer)
+  trend           - weekly p-value over the last TREND_WEEKS weeks
+
+Results are cached per quiz and only ever computed by
+`python manage.py build_quiz_item_analysis` on a scheduler - the dashboards
+read the cache and show "pending" for quizzes it hasn't reached yet.
+"""
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from ..models import LessonQuizAnswerKey, LessonQuizAttempt
+
+
+DEFAULT_ANALYSIS_TTL = 60 * 60 * 6
+ANALYSIS_CHUNK_ROWS = 50000
+TREND_WEEKS = 12
+WEEK_SECONDS = 7 * 24 * 60 * 60
+WEEK_OFFSET = 3 * 24 * 60 * 60  # the epoch is a Thursday; weeks start on Monday
+OPTION_CODES = b'ABCD-'
+OPTION_NAMES = {ord('A'): 'A', ord('B'): 'B', ord('C'): 'C', ord('D'): 'D', ord('-'): 'unanswered'}
+
+# Classical test theory rules of thumb for flagging items
+EASY_P_VALUE = 0.9
+HARD_P_VALUE = 0.3
+LOW_DISCRIMINATION = 0.2
+
+
+def _cache_key(quiz_id):
+    return f'quiz_item_analysis:{quiz_id}'
+
+
+def _week(timestamp):
+    return int((timestamp + WEEK_OFFSET) // WEEK_SECONDS)
+
+
+class _ItemTotals:
+    """Sufficient statistics for one question, summed over answer key versions"""
+
+    def __init__(self):
+        self.n = 0
+        self.correct = 0
+        self.sum_rest = 0.0
+        self.sum_rest_sq = 0.0
+        self.sum_correct_rest = 0.0
+        self.options = np.zeros(len(OPTION_CODES), dtype=np.int64)
+        self.trend_n = np.zeros(TREND_WEEKS, dtype=np.int64)
+        self.trend_correct = np.zeros(TREND_WEEKS, dtype=np.int64)
+
+    def discrimination(self):
+        """Pearson r of correct (0/1) vs rest score from the running sums, None when undefined"""
+        n, sx = self.n, self.correct
+        denominator = (n * sx - sx * sx) * (n * self.sum_rest_sq - self.sum_rest ** 2)
+        if denominator <= 0:
+            return None
+        return (n * self.sum_correct_rest - sx * self.sum_rest) / math.sqrt(denominator)
+
+
+def _accumulate(totals, key, rows, first_week):
+    """Add one chunk of attempts graded with one answer key"""
+    question_ids, correct_options = key
+    count = len(question_ids)
+    rows = [row for row in rows if len(row[0]) == count]
+    if not rows or not count:
+        return
+
+    answers = np.frombuffer(b''.join(row[0] for row in rows), dtype=np.uint8).reshape(len(rows), count)
+    correct = answers == np.frombuffer(correct_options, dtype=np.uint8)
+    scores = correct.sum(axis=1)
+    # Score on the other items (0-1), so an item isn't correlated with itself
+    rest = (scores[:, None] - correct) / (count - 1) if count > 1 else np.zeros(correct.shape)
+    option_counts = np.stack([(answers == code).sum(axis=0) for code in OPTION_CODES], axis=1)
+
+    week = np.array([row[1] for row in rows], dtype=np.int64) - first_week
+    recent = (week >= 0) & (week < TREND_WEEKS)
+    trend_n = np.bincount(week[recent], minlength=TREND_WEEKS)
+    trend_correct = np.zeros((TREND_WEEKS, count), dtype=np.int64)
+    np.add.at(trend_correct, week[recent], correct[recent])
+
+    sums = {
+        'correct': correct.sum(axis=0),
+        'sum_rest': rest.sum(axis=0),
+        'sum_rest_sq': (rest ** 2).sum(axis=0),
+        'sum_correct_rest': (rest * correct).sum(axis=0),
+    }
+    for column, question_id in enumerate(question_ids):
+        item = totals.setdefault(question_id, _ItemTotals())
+        item.n += len(rows)
+        item.correct += int(sums['correct'][column])
+        item.sum_rest += float(sums['sum_rest'][column])
+        item.sum_rest_sq += float(sums['sum_rest_sq'][column])
+        item.sum_correct_rest += float(sums['sum_correct_rest'][column])
+        item.options += option_counts[column]
+        item.trend_n += trend_n
+        item.trend_correct += trend_correct[:, column]
+
+
+def _summarize(item, first_week):
+    p_value = item.correct / item.n
+    discrimination = item.discrimination()
+    flags = []
+    if p_value >= EASY_P_VALUE:
+        flags.append('easy')
+    elif p_value <= HARD_P_VALUE:
+        flags.append('hard')
+    if discrimination is not None and discrimination < LOW_DISCRIMINATION:
+        flags.append('low discrimination')
+    return {
+        'attempts': item.n,
+        'p_value': round(p_value, 3),
+        'discrimination': round(discrimination, 3) if discrimination is not None else None,
+        'options': {
+            OPTION_NAMES[code]: round(int(selected) / item.n, 3) for code, selected in zip(OPTION_CODES, item.options)
+        },
+        'trend': [
+            {
+                'week': datetime.fromtimestamp(
+                    (first_week + index) * WEEK_SECONDS - WEEK_OFFSET, dt_timezone.utc
+                ).date(),
+                'attempts': int(attempts),
+                'p_value': round(int(correct) / int(attempts), 3) if attempts else None,
+            }
+            for index, (attempts, correct) in enumerate(zip(item.trend_n, item.trend_correct))
+        ],
+        'flags': flags,
+    }
+
+
+def compute_item_analysis(rows, keys, now=None, chunk_rows=ANALYSIS_CHUNK_ROWS):
+    """
+    Item statistics from an iterable of (answer_key_id, answers, completed_at)
+    rows. keys: {answer_key_id: (question_ids, correct_options)}.
+    Returns {'attempts': n, 'questions': {question_id: stats}}.
+    """
+    now = now or time.time()
+    first_week = _week(now) - TREND_WEEKS + 1
+    totals = {}
+    attempts = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        by_key = {}
+        for key_id, answers, completed_at in chunk:
+            if key_id in keys:
+                by_key.setdefault(key_id, []).append((bytes(answers), _week(completed_at.timestamp())))
+        for key_id, key_rows in by_key.items():
+            _accumulate(totals, keys[key_id], key_rows, first_week)
+        attempts += sum(len(key_rows) for key_rows in by_key.values())
+
+    return {
+        'attempts': attempts,
+        'questions': {question_id: _summarize(item, first_week) for question_id, item in totals.items() if item.n},
+    }
+
+
+def build_quiz_analysis(quiz):
+    """Compute and cache one quiz's item analysis."""
+    keys = {
+        key_id: (question_ids, bytes(correct_options))
+        for key_id, question_ids, correct_options in LessonQuizAnswerKey.objects.filter(quiz=quiz).values_list(
+            'id', 'question_ids', 'correct_options'
+        )
+    }
+    rows = LessonQuizAttempt.objects.filter(quiz=quiz, answer_key__isnull=False).values_list(
+        'answer_key_id', 'answers', 'completed_at'
+    ).iterator(chunk_size=ANALYSIS_CHUNK_ROWS)
+
+    started = time.monotonic()
+    analysis = compute_item_analysis(rows, keys)
+    analysis['compute_seconds'] = time.monotonic() - started
+    analysis['computed_at'] = time.time()
+
+    p_values = [stats['p_value'] for stats in analysis['questions'].values()]
+    analysis['average_p_value'] = round(sum(p_values) / len(p_values), 3) if p_values else None
+    analysis['flagged'] = sum(1 for stats in analysis['questions'].values() if stats['flags'])
+
+    cache.set(_cache_key(quiz.id), analysis, getattr(settings, 'QUIZ_ANALYSIS_TTL', DEFAULT_ANALYSIS_TTL))
+    return analysis
+
+
+def get_quiz_analyses(quizzes):
+    """{quiz_id: analysis, or None until build_quiz_item_analysis has run} from the cache."""
+    cached = cache.get_many([_cache_key(quiz.id) for quiz in quizzes])
+    return {quiz.id: cached.get(_cache_key(quiz.id)) for quiz in quizzes}
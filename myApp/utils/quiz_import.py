@@ -0,0 +1,529 @@
+"""
+Quiz Import Utilities
+Bulk import of quiz questions from uploads. A reader turns the upload into a
+header plus (row number, cells) rows without loading it whole - CSV decoded
+line by line, XLSX through openpyxl's read-only mode, DOCX from its first
+question table - and every row is validated; valid rows are inserted with
+bulk_create in batches inside one transaction. Rows may target different
+lessons through a `lesson_slug` column (plus `course_slug` when a slug is
+used in several courses), so one file can fill many quizzes. The result is a
+QuizImportReport listing every rejected row and why.
+
+Free text (PDFs, DOCX files without a table) is read by QuestionParser:
+numbered questions ("1." or "1)"), options "A." to "D." (or "A)"), and an
+"Answer: B" / "Correct: B" line. A DOCX question without one is rejected;
+PDFs keep their old default of A.
+"""
+import csv
+import heapq
+import re
+
+from zipfile import BadZipFile
+
+from django.db import models, transaction
+from ..models import Lesson, LessonQuiz, LessonQuizQuestion
+from .quiz_keys import VALID_OPTIONS, invalidate_answer_key
+try:
+    import openpyxl
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+try:
+    import docx
+    from docx.opc.exceptions import OpcError
+    DOCX_AVAILABLE = True
+except ImportError:
+    DOCX_AVAILABLE = False
+
+
+IMPORT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 500
+REQUIRED_COLUMNS = ('question', 'option_a', 'option_b', 'correct_answer')
+OPTION_COLUMNS = {'A': 'option_a', 'B': 'option_b', 'C': 'option_c', 'D': 'option_d'}
+OPTION_MAX_LENGTH = LessonQuizQuestion._meta.get_field('option_a').max_length
+
+LONE_CR = re.compile(r'(?<=\r)(?!\n)')  # split point after a \r line end that has no \n
+
+# Free-text layout (PDF, DOCX paragraphs)
+QUESTION_LINE = re.compile(r'^(\d{1,3})[.)]\s+(.*)$')
+OPTION_LINE = re.compile(r'^\(?([A-D])[.)]\s*(.*)$', re.IGNORECASE)
+ANSWER_LINE = re.compile(r'^(?:correct\s+)?(?:answer|correct)\s*[:\-]\s*\(?([A-D])\b', re.IGNORECASE)
+PARSED_COLUMNS = ('question', 'option_a', 'option_b', 'option_c', 'option_d', 'correct_answer')
+PDF_DEFAULT_ANSWER = 'A'  # as the PDF importer always did: no answer line means A
+
+
+class QuizImportError(ValueError):
+    """The upload can't be imported at all (unreadable file, missing columns)"""
+
+
+class _Rollback(Exception):
+    pass
+
+
+class QuizImportReport:
+    """Outcome of an import: counts per lesson and the rejected rows"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.committed = False
+        self.lessons = {}  # lesson id -> {'title', 'course', 'created'}
+        self.error_rows = 0
+        # Errors arrive out of row order (lesson lookups run per batch); keep
+        # the MAX_REPORTED_ERRORS lowest rows in a heap keyed on -row
+        self._errors = []
+
+    def add_error(self, row_number, messages):
+        self.error_rows += 1
+        entry = (-row_number, self.error_rows, messages)
+        if len(self._errors) < MAX_REPORTED_ERRORS:
+            heapq.heappush(self._errors, entry)
+        elif entry > self._errors[0]:
+            heapq.heapreplace(self._errors, entry)
+
+    @property
+    def errors(self):
+        """The reported errors, {'row': n, 'messages': [...]}, by row number"""
+        return [
+            {'row': -row, 'messages': messages}
+            for row, _, messages in sorted(self._errors, reverse=True)
+        ]
+
+    @property
+    def errors_truncated(self):
+        return self.error_rows > len(self._errors)
+
+    @property
+    def valid_rows(self):
+        return self.rows - self.error_rows
+
+
+def _cell(value):
+    """Normalize a cell from any reader (None, numbers from spreadsheets) to a stripped string"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def has_quiz_columns(header):
+    try:
+        normalize_header(header)
+    except QuizImportError:
+        return False
+    return True
+
+
+def normalize_header(header):
+    """Lower-cased, stripped column names; raises QuizImportError on missing required columns"""
+    columns = [_cell(name).lower().replace(' ', '_') for name in header]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise QuizImportError(f'Missing required column(s): {", ".join(missing)}.')
+    return columns
+
+
+class UnreadableRow:
+    """Stands in for a row's cells when the reader couldn't decode it; import_quiz_rows reports it"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+class _DecodedLines:
+    """
+    Lines of a binary stream, each decoded on its own: a bad byte spoils only
+    its own line (decoded with replacement characters and listed in
+    bad_lines, by line number) instead of failing the whole read.
+    """
+
+    def __init__(self, binary):
+        self.binary = binary
+        self.line_count = 0
+        self.bad_lines = set()
+
+    def __iter__(self):
+        encoding = 'utf-8-sig'  # drop a BOM at the start of the file
+        for raw in self.binary:
+            try:
+                text, bad = raw.decode(encoding), False
+            except UnicodeDecodeError:
+                text, bad = raw.decode(encoding, errors='replace'), True
+            encoding = 'utf-8'
+            # Also split after a lone \r (old Mac line ends), which the binary stream doesn't
+            split = [line for line in LONE_CR.split(text) if line] if '\r' in text[:-2] else (text,)
+            for line in split:
+                self.line_count += 1
+                if bad:
+                    self.bad_lines.add(self.line_count)
+                yield line
+
+
+def read_csv_rows(binary):
+    """
+    (header, rows) from a binary stream, decoded and parsed lazily row by
+    row. Row numbers count the header as row 1; blank rows are skipped and a
+    row that isn't valid UTF-8 comes through as an UnreadableRow.
+    """
+    lines = _DecodedLines(binary)
+    reader = csv.reader(lines)
+    try:
+        header = next(reader, None)
+    except csv.Error as e:
+        raise QuizImportError(f'Could not read the CSV header: {e}')
+    if header is None:
+        raise QuizImportError('The file is empty.')
+    if lines.bad_lines:
+        raise QuizImportError('The CSV header is not valid UTF-8 text.')
+
+    def rows():
+        row_number = 1
+        while True:
+            first_line = reader.line_num + 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                raise QuizImportError(f'Row {row_number + 1}: {e}')
+            row_number += 1
+            if lines.bad_lines and any(line in lines.bad_lines for line in range(first_line, reader.line_num + 1)):
+                lines.bad_lines.difference_update(range(first_line, reader.line_num + 1))
+                yield row_number, UnreadableRow('row is not valid UTF-8 text')
+            elif any(cell.strip() for cell in row):
+                yield row_number, row
+
+    return header, rows()
+
+
+def read_xlsx_rows(workbook):
+    """
+    (header, rows) from the first worksheet of a workbook opened in read-only
+    mode: rows are streamed from the sheet XML, never loaded as a whole.
+    Row numbers are the spreadsheet's own; blank rows are skipped.
+    """
+    sheet = workbook.worksheets[0]
+    # Sheets written by other tools often carry a wrong size; read what's there
+    sheet.reset_dimensions()
+    sheet_rows = sheet.iter_rows(values_only=True)
+    header = next(sheet_rows, None)
+    if header is None:
+        raise QuizImportError('The first worksheet is empty.')
+
+    def rows():
+        for row_number, row in enumerate(sheet_rows, start=2):
+            if any(_cell(cell) for cell in row):
+                yield row_number, row
+
+    return header, rows()
+
+
+def read_docx_rows(document):
+    """
+    (header, rows) from a Word document: its first table with the quiz
+    columns in the header row (row numbers count within that table), or
+    else the paragraphs as free text, numbered by question.
+    """
+    for table in document.tables:
+        table_rows = iter(table.rows)
+        header_row = next(table_rows, None)
+        if header_row is None:
+            continue
+        header = [cell.text for cell in header_row.cells]
+        if not has_quiz_columns(header):
+            continue
+
+        def rows(table_rows=table_rows):
+            for row_number, row in enumerate(table_rows, start=2):
+                cells = [cell.text for cell in row.cells]
+                if any(cell.strip() for cell in cells):
+                    yield row_number, cells
+
+        return header, rows()
+
+    def questions():
+        parser = QuestionParser()
+        for paragraph in document.paragraphs:
+            for line in paragraph.text.splitlines():
+                question = parser.feed(line, None)
+                if question:
+                    yield question['number'], question_cells(question)
+        if parser.current:
+            question = parser.close()
+            yield question['number'], question_cells(question)
+
+    return PARSED_COLUMNS, questions()
+
+
+class QuestionParser:
+    """
+    Incremental question parser: feed() lines in document order; it returns
+    a question each time the next one starts, close() returns the last.
+    Text before the first numbered line is ignored, continuation lines are
+    appended to the question or to the option being read.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.option = None  # letter of the option being read, None while reading the question
+        self.count = 0
+
+    def feed(self, line, page):
+        line = line.strip()
+        if not line:
+            return None
+        question = QUESTION_LINE.match(line)
+        if question:
+            finished = self.close()
+            self.count += 1
+            self.current = {'number': self.count, 'page': page, 'text': [question.group(2)], 'options': {}, 'answer': None}
+            self.option = None
+            return finished
+        if self.current is None:
+            return None
+
+        answer = ANSWER_LINE.match(line)
+        if answer:
+            if self.current['answer'] is None:
+                self.current['answer'] = answer.group(1).upper()
+            self.option = None
+            return None
+        option = OPTION_LINE.match(line)
+        if option and option.group(1).upper() not in self.current['options']:
+            self.option = option.group(1).upper()
+            self.current['options'][self.option] = [option.group(2)]
+        elif self.option:
+            self.current['options'][self.option].append(line)
+        elif not self.current['options']:
+            self.current['text'].append(line)
+        return None
+
+    def close(self):
+        finished, self.current, self.option = self.current, None, None
+        return finished
+
+
+def question_cells(question, default_answer=''):
+    """
+    Row cells in PARSED_COLUMNS order for a parsed question. Without an
+    answer line correct_answer is default_answer - empty, so validate_row
+    rejects the question, unless the caller keeps a legacy default.
+    """
+    options = question['options']
+    return [
+        ' '.join(question['text']).strip(),
+        *(' '.join(options.get(letter, [])).strip() for letter in 'ABCD'),
+        question['answer'] or default_answer,
+    ]
+
+
+def validate_row(values):
+    """
+    Check one row (column -> stripped value). Returns (fields, messages):
+    the LessonQuizQuestion fields, or None with the reasons it was rejected.
+    """
+    messages = []
+    if not values.get('question'):
+        messages.append('question is empty')
+    for column in OPTION_COLUMNS.values():
+        if len(values.get(column, '')) > OPTION_MAX_LENGTH:
+            messages.append(f'{column} is longer than {OPTION_MAX_LENGTH} characters')
+    if not values.get('option_a') or not values.get('option_b'):
+        messages.append('option_a and option_b are required')
+
+    correct = values.get('correct_answer', '').upper()
+    if not correct:
+        messages.append('correct_answer is empty (no answer given)')
+    elif correct not in VALID_OPTIONS:
+        messages.append(f'correct_answer must be one of A, B, C, D (got "{values.get("correct_answer", "")}")')
+    elif not values.get(OPTION_COLUMNS[correct]):
+        messages.append(f'correct_answer is {correct} but {OPTION_COLUMNS[correct]} is empty')
+
+    if messages:
+        return None, messages
+    return {
+        'text': values['question'],
+        'option_a': values['option_a'],
+        'option_b': values['option_b'],
+        'option_c': values.get('option_c', ''),
+        'option_d': values.get('option_d', ''),
+        'correct_option': correct,
+    }, []
+
+
+class _LessonResolver:
+    """Lesson and quiz lookups by slug, one query per batch of new slugs"""
+
+    def __init__(self, default_lesson):
+        self.default_lesson = default_lesson
+        self.by_slug = {}  # slug -> [(course slug, lesson)]
+        self.quizzes = {}  # lesson id -> [quiz, next order]
+
+    def load(self, slugs):
+        slugs = {slug for slug in slugs if slug not in self.by_slug}
+        if not slugs:
+            return
+        for slug in slugs:
+            self.by_slug[slug] = []
+        for lesson in Lesson.objects.filter(slug__in=slugs).select_related('course'):
+            self.by_slug[lesson.slug].append((lesson.course.slug, lesson))
+
+    def resolve(self, lesson_slug, course_slug):
+        """(lesson, error message)"""
+        if not lesson_slug:
+            if self.default_lesson is None:
+                return None, 'lesson_slug is empty and no lesson was selected'
+            return self.default_lesson, None
+        matches = [
+            lesson for slug, lesson in self.by_slug.get(lesson_slug, [])
+            if not course_slug or slug == course_slug
+        ]
+        if not matches:
+            where = f' in course "{course_slug}"' if course_slug else ''
+            return None, f'no lesson with slug "{lesson_slug}"{where}'
+        if len(matches) > 1:
+            return None, f'lesson slug "{lesson_slug}" is used in several courses; add a course_slug column'
+        return matches[0], None
+
+    def load_quizzes(self, lessons):
+        """Fetch (or create) the quizzes for lessons not seen yet, with their next question order"""
+        lessons = {lesson.id: lesson for lesson in lessons if lesson.id not in self.quizzes}
+        if not lessons:
+            return
+        quizzes = {quiz.lesson_id: quiz for quiz in LessonQuiz.objects.filter(lesson_id__in=lessons)}
+        for lesson_id, lesson in lessons.items():
+            if lesson_id not in quizzes:
+                quizzes[lesson_id] = LessonQuiz.objects.create(
+                    lesson=lesson, title=f'{lesson.title} Quiz', passing_score=70
+                )
+        max_orders = dict(
+            LessonQuizQuestion.objects.filter(quiz__in=quizzes.values()).values('quiz').annotate(
+                max_order=models.Max('order')
+            ).values_list('quiz', 'max_order')
+        )
+        for lesson_id, quiz in quizzes.items():
+            self.quizzes[lesson_id] = [quiz, (max_orders.get(quiz.id) or 0) + 1]
+
+
+def _insert_batch(batch, resolver, report):
+    """Resolve the batch's lessons and bulk-insert its valid questions"""
+    resolver.load(lesson_slug for _, lesson_slug, _, _ in batch if lesson_slug)
+    resolved = []
+    for row_number, lesson_slug, course_slug, fields in batch:
+        lesson, error = resolver.resolve(lesson_slug, course_slug)
+        if error:
+            report.add_error(row_number, [error])
+        else:
+            resolved.append((lesson, fields))
+
+    resolver.load_quizzes(lesson for lesson, _ in resolved)
+    questions = []
+    for lesson, fields in resolved:
+        entry = resolver.quizzes[lesson.id]
+        questions.append(LessonQuizQuestion(quiz=entry[0], order=entry[1], **fields))
+        entry[1] += 1
+        summary = report.lessons.setdefault(
+            lesson.id, {'title': lesson.title, 'course': lesson.course.name, 'created': 0}
+        )
+        summary['created'] += 1
+    LessonQuizQuestion.objects.bulk_create(questions, batch_size=IMPORT_BATCH_SIZE)
+    report.created += len(questions)
+
+
+def import_quiz_rows(header, rows, default_lesson=None, skip_invalid=False):
+    """
+    Import (row number, cells) rows laid out as `header`. Rows without a
+    lesson_slug go to default_lesson. Unless skip_invalid is set, any
+    rejected row rolls the whole import back. Returns a QuizImportReport;
+    raises QuizImportError when the file can't be imported at all.
+    """
+    columns = normalize_header(header)
+    report = QuizImportReport()
+    resolver = _LessonResolver(default_lesson)
+
+    try:
+        with transaction.atomic():
+            batch = []
+            for row_number, cells in rows:
+                report.rows += 1
+                if isinstance(cells, UnreadableRow):
+                    report.add_error(row_number, [cells.message])
+                    continue
+                values = {column: _cell(cell) for column, cell in zip(columns, cells)}
+                fields, messages = validate_row(values)
+                if messages:
+                    report.add_error(row_number, messages)
+                    continue
+                batch.append((row_number, values.get('lesson_slug', ''), values.get('course_slug', ''), fields))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    _insert_batch(batch, resolver, report)
+                    batch = []
+            if batch:
+                _insert_batch(batch, resolver, report)
+
+            if report.error_rows and not skip_invalid:
+                raise _Rollback()
+    except _Rollback:
+        report.created = 0
+        report.lessons = {}
+    else:
+        report.committed = True
+    finally:
+        # bulk_create skips post_save, so drop the cached answer keys here
+        for quiz, _ in resolver.quizzes.values():
+            invalidate_answer_key(quiz.id)
+
+    return report
+
+
+def import_csv_quiz(uploaded_file, default_lesson=None, skip_invalid=False):
+    """Import a CSV question bank, decoded line by line from the upload; see import_quiz_rows."""
+    uploaded_file.seek(0)
+    header, rows = read_csv_rows(uploaded_file.file)
+    return import_quiz_rows(header, rows, default_lesson=default_lesson, skip_invalid=skip_invalid)
+
+
+def import_xlsx_quiz(uploaded_file, default_lesson=None, skip_invalid=False):
+    """Import an Excel question bank row by row (read-only workbook); see import_quiz_rows."""
+    if not XLSX_AVAILABLE:
+        raise QuizImportError('Excel import is not available. Please install openpyxl.')
+    uploaded_file.seek(0)
+    try:
+        workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    except (BadZipFile, KeyError, OSError, ValueError) as e:
+        raise QuizImportError(f'Could not open the workbook: {e}')
+    try:
+        header, rows = read_xlsx_rows(workbook)
+        return import_quiz_rows(header, rows, default_lesson=default_lesson, skip_invalid=skip_invalid)
+    finally:
+        # Read-only workbooks keep the archive open until closed
+        workbook.close()
+
+
+def import_docx_quiz(uploaded_file, default_lesson=None, skip_invalid=False):
+    """Import a Word question bank (a question table or numbered paragraphs); see import_quiz_rows."""
+    if not DOCX_AVAILABLE:
+        raise QuizImportError('Word import is not available. Please install python-docx.')
+    uploaded_file.seek(0)
+    try:
+        document = docx.Document(uploaded_file)
+    except (BadZipFile, OpcError, KeyError, OSError, ValueError) as e:
+        raise QuizImportError(f'Could not open the document: {e}')
+    header, rows = read_docx_rows(document)
+    return import_quiz_rows(header, rows, default_lesson=default_lesson, skip_invalid=skip_invalid)
+
+
+IMPORTERS = {
+    'csv': import_csv_quiz,
+    'xlsx': import_xlsx_quiz,
+    'docx': import_docx_quiz,
+}
+
+
+def import_quiz_file(uploaded_file, default_lesson=None, skip_invalid=False):
+    """Import an upload with the importer for its extension (see IMPORTERS)."""
+    extension = uploaded_file.name.rsplit('.', 1)[-1].lower()
+    if extension not in IMPORTERS:
+        raise QuizImportError(f'Unsupported file format: {extension}.')
+    return IMPORTERS[extension](uploaded_file, default_lesson=default_lesson, skip_invalid=skip_invalid)
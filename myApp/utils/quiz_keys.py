@@ -0,0 +1,82 @@
+"""
+Quiz Answer Key Utilities
+Lesson quizzes are graded against a compiled answer key (question ids in
+order plus one correct-option byte each) that is cached per quiz and dropped
+when its questions change. Attempts store the chosen options in the same
+order, one byte per question, next to the key they were graded with.
+"""
+import hashlib
+
+from django.core.cache import cache
+from ..models import LessonQuizAnswerKey
+
+
+UNANSWERED = '-'
+VALID_OPTIONS = frozenset('ABCD')
+ANSWER_KEY_TIMEOUT = 60 * 60 * 24
+
+
+class AnswerKey:
+    """Cached, picklable view of a LessonQuizAnswerKey row"""
+
+    def __init__(self, id, version, question_ids, correct_options):
+        self.id = id
+        self.version = version
+        self.question_ids = tuple(question_ids)
+        self.correct_options = bytes(correct_options)
+        self.fields = tuple(f'q_{question_id}' for question_id in self.question_ids)
+
+    def __len__(self):
+        return len(self.question_ids)
+
+
+def _cache_key(quiz_id):
+    return f'quiz_answer_key:{quiz_id}'
+
+
+def compile_answer_key(quiz):
+    """Build the key from the current questions, storing a new version if they changed."""
+    rows = list(quiz.questions.order_by('order', 'id').values_list('id', 'correct_option'))
+    question_ids = [question_id for question_id, _ in rows]
+    correct_options = ''.join(option for _, option in rows).encode('ascii')
+    version = hashlib.sha1(f'{question_ids}:{correct_options}'.encode()).hexdigest()
+
+    key, created = LessonQuizAnswerKey.objects.get_or_create(
+        quiz=quiz, version=version,
+        defaults={'question_ids': question_ids, 'correct_options': correct_options}
+    )
+    return AnswerKey(key.id, version, question_ids, correct_options)
+
+
+def get_answer_key(quiz):
+    """The quiz's compiled answer key, from the cache when possible."""
+    key = cache.get(_cache_key(quiz.id))
+    if key is None:
+        key = compile_answer_key(quiz)
+        cache.set(_cache_key(quiz.id), key, ANSWER_KEY_TIMEOUT)
+    return key
+
+
+def invalidate_answer_key(quiz_id):
+    cache.delete(_cache_key(quiz_id))
+
+
+def grade_answers(key, data):
+    """
+    Grade submitted answers (POST data with q_<question id> fields).
+    Returns (answers, correct): answers is one byte per key question.
+    """
+    answers = ''.join(
+        answer if answer in VALID_OPTIONS else UNANSWERED
+        for answer in map(data.get, key.fields)
+    ).encode('ascii')
+    correct = sum(chosen == expected for chosen, expected in zip(answers, key.correct_options))
+    return answers, correct
+
+
+def decode_answers(key, answers):
+    """{question_id: chosen option or None} for a stored attempt"""
+    return {
+        question_id: chr(chosen) if chr(chosen) != UNANSWERED else None
+        for question_id, chosen in zip(key.question_ids, bytes(answers))
+    }
@@ -0,0 +1,135 @@
+"""
+Student Dashboard Utilities
+Assembles the "My Courses" cards for the student dashboard from one keyed
+lookup per table, so the page costs the same number of queries no matter
+how many courses a student owns.
+"""
+from django.db.models import Prefetch
+from ..models import (
+    Course, CourseAccess, CourseEnrollment, Exam, ExamAttempt, Certification, FavoriteCourse, Bundle
+)
+from .catalog import annotate_catalog_courses
+from .progress import get_user_course_progress_map
+
+
+def _is_exam_available(enrollment, rollup, total_lessons):
+    """
+    CourseEnrollment.is_exam_available evaluated against already-loaded data.
+    Access-only courses (no enrollment) use the full-payment rule.
+    """
+    if enrollment is None or enrollment.payment_type == 'full':
+        if rollup:
+            return rollup.completed_lessons >= rollup.total_lessons
+        return total_lessons == 0
+    return enrollment.days_until_exam() == 0
+
+
+def load_student_courses(user):
+    """
+    Build the My Courses card data for a user.
+
+    Courses come from active CourseAccess records, plus legacy enrollments that
+    have no active access record (these are granted access on write, see
+    migrate_legacy_enrollments). Every related table is read once and keyed by
+    course id.
+
+    Returns a list of dicts in the shape the dashboard template expects.
+    """
+    # Newest record first, matching has_course_access
+    accesses = CourseAccess.objects.filter(user=user).order_by('-granted_at')
+    active_access = {}
+    latest_access = {}
+    for access in accesses:
+        latest_access.setdefault(access.course_id, access)
+        if access.is_active():
+            active_access.setdefault(access.course_id, access)
+
+    enrollments = {
+        enrollment.course_id: enrollment
+        for enrollment in CourseEnrollment.objects.filter(user=user).select_related('course')
+    }
+
+    # Access-based courses first, then legacy enrollments without active access
+    course_ids = list(active_access) + [
+        course_id for course_id in enrollments if course_id not in active_access
+    ]
+    if not course_ids:
+        return []
+
+    courses = {
+        course.id: course
+        for course in annotate_catalog_courses(Course.objects.filter(id__in=course_ids))
+    }
+    progress_by_course = get_user_course_progress_map(user, course_ids)
+    exams = {exam.course_id: exam for exam in Exam.objects.filter(course_id__in=course_ids)}
+
+    attempts_by_exam = {}
+    for attempt in ExamAttempt.objects.filter(user=user, exam__course_id__in=course_ids).order_by('-started_at'):
+        attempts_by_exam.setdefault(attempt.exam_id, []).append(attempt)
+
+    certifications = {
+        cert.course_id: cert
+        for cert in Certification.objects.filter(user=user, course_id__in=course_ids)
+    }
+    favorite_ids = set(
+        FavoriteCourse.objects.filter(user=user, course_id__in=course_ids).values_list('course_id', flat=True)
+    )
+
+    courses_data = []
+    for course_id in course_ids:
+        course = courses.get(course_id)
+        if course is None:
+            continue
+        enrollment = enrollments.get(course_id)
+        rollup = progress_by_course.get(course_id)
+
+        total_lessons = rollup.total_lessons if rollup else course.lesson_total
+        completed_lessons = rollup.completed_lessons if rollup else 0
+        progress_percentage = rollup.progress_percentage if rollup else 0
+
+        exam = exams.get(course_id)
+        if exam:
+            attempts = attempts_by_exam.get(exam.id, [])
+            exam_info = {
+                'exists': True,
+                'attempts_count': len(attempts),
+                'max_attempts': exam.max_attempts,
+                'latest_attempt': attempts[0] if attempts else None,
+                'passed': any(attempt.passed for attempt in attempts),
+                'is_available': _is_exam_available(enrollment, rollup, total_lessons),
+            }
+        else:
+            exam_info = {'exists': False}
+
+        certification = certifications.get(course_id)
+        if certification:
+            cert_status = certification.status
+            cert_display = certification.get_status_display()
+        else:
+            cert_status = 'not_eligible' if progress_percentage < 100 else 'eligible'
+            cert_display = 'Not Eligible' if progress_percentage < 100 else 'Eligible'
+
+        courses_data.append({
+            'course': course,
+            'enrollment': enrollment,
+            'access_record': active_access.get(course_id) or latest_access.get(course_id),
+            'total_lessons': total_lessons,
+            'completed_lessons': completed_lessons,
+            'progress_percentage': progress_percentage,
+            'has_any_progress': rollup.has_any_progress if rollup else False,
+            'avg_watch_percentage': round(rollup.avg_watch_percentage, 1) if rollup else 0,
+            'exam_info': exam_info,
+            'certification': certification,
+            'cert_status': cert_status,
+            'cert_display': cert_display,
+            'is_favorited': course_id in favorite_ids,
+        })
+
+    return courses_data
+
+
+def prefetch_active_bundles(courses):
+    """Attach active bundles to each course as course.active_bundles (one query)."""
+    return courses.prefetch_related(
+        Prefetch('bundles', queryset=Bundle.objects.filter(is_active=True), to_attr='active_bundles')
+    )
@@ -0,0 +1,143 @@
+"""
+Student List Utilities
+Annotated User queryset behind the dashboard student list. Course counts,
+lesson totals, completion, certifications, status and last activity are all
+computed in SQL, so filtering, sorting and pagination happen in the database.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db.models import (
+    Case, CharField, DateTimeField, Exists, F, Func, IntegerField, OuterRef, Q, Subquery, Value, When
+)
+from django.db.models.functions import Coalesce, Greatest, Lower
+from ..models import Certification, Course, CourseAccess, CourseEnrollment, ExamAttempt, Lesson, UserCourseProgress, UserProgress
+
+
+STUDENT_STATUSES = ['active', 'completed', 'certified']
+
+STUDENT_SORTS = {
+    'recent': ['-last_activity', '-id'],
+    'progress': ['-overall_progress', '-id'],
+    'name': [Lower('username'), 'id'],
+    'enrolled': ['-date_joined', '-id'],
+}
+
+# Stand-in for "no activity" so GREATEST() works the same on every backend
+NO_ACTIVITY = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _aggregate(queryset, function, field='id'):
+    """
+    Scalar subquery computing function(field) over queryset, 0 when empty.
+    Func (not Count/Sum) keeps Django from adding a GROUP BY.
+    """
+    value = queryset.order_by().annotate(value=Func(F(field), function=function)).values('value')[:1]
+    return Coalesce(Subquery(value, output_field=IntegerField()), 0)
+
+
+def _latest(queryset, field):
+    return Subquery(queryset.order_by(f'-{field}').values(field)[:1], output_field=DateTimeField())
+
+
+def _owns_course(course_field, course_id=None):
+    """
+    Q for rows (of a subquery on the student) whose course the student is
+    enrolled in or has unlocked access to. Optionally limited to one course.
+    """
+    student = OuterRef(OuterRef('pk'))
+    enrolled = CourseEnrollment.objects.filter(user_id=student, course_id=OuterRef(course_field))
+    unlocked = CourseAccess.objects.filter(user_id=student, course_id=OuterRef(course_field), status='unlocked')
+    owned = Q(Exists(enrolled)) | Q(Exists(unlocked))
+    if course_id is not None:
+        owned &= Q(**{course_field: course_id})
+    return owned
+
+
+def annotate_student_list(users, course_id=None):
+    """
+    Annotate users with total_courses, total_lessons, completed_lessons,
+    certifications_count, overall_progress (0-100, truncated), student_status
+    and last_progress / last_exam / last_cert / last_activity.
+    With course_id, everything is limited to that course.
+    """
+    student = OuterRef('pk')
+    users = users.annotate(
+        total_courses=_aggregate(Course.objects.filter(_owns_course('id', course_id)), 'COUNT'),
+        total_lessons=_aggregate(Lesson.objects.filter(_owns_course('course_id', course_id)), 'COUNT'),
+        completed_lessons=_aggregate(
+            UserCourseProgress.objects.filter(Q(user_id=student) & _owns_course('course_id', course_id)),
+            'SUM', 'completed_lessons'
+        ),
+        certifications_count=_aggregate(
+            Certification.objects.filter(Q(user_id=student, status='passed') & _owns_course('course_id', course_id)),
+            'COUNT'
+        ),
+        last_progress=_latest(UserProgress.objects.filter(user_id=student), 'last_accessed'),
+        last_exam=_latest(ExamAttempt.objects.filter(user_id=student), 'started_at'),
+        last_cert=_latest(Certification.objects.filter(user_id=student, issued_at__isnull=False), 'issued_at'),
+    )
+    no_activity = Value(NO_ACTIVITY, output_field=DateTimeField())
+    return users.annotate(
+        overall_progress=Case(
+            When(total_lessons__gt=0, then=F('completed_lessons') * 100 / F('total_lessons')),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        last_activity=Greatest(
+            Coalesce('last_progress', no_activity),
+            Coalesce('last_exam', no_activity),
+            Coalesce('last_cert', no_activity),
+        ),
+    ).annotate(
+        student_status=Case(
+            When(certifications_count__gt=0, then=Value('certified')),
+            When(overall_progress=100, then=Value('completed')),
+            When(overall_progress__gt=0, then=Value('active')),
+            default=Value('inactive'),
+            output_field=CharField(),
+        ),
+    )
+
+
+def get_student_list(search='', course_id=None, status='all', sort='recent'):
+    """Filtered, sorted, annotated User queryset for the dashboard student list."""
+    users = User.objects.all()
+    if search:
+        users = users.filter(
+            Q(username__icontains=search) |
+            Q(email__icontains=search) |
+            Q(first_name__icontains=search) |
+            Q(last_name__icontains=search)
+        )
+
+    users = annotate_student_list(users, course_id)
+    if course_id is not None:
+        # Only students who have the course
+        users = users.filter(total_courses__gt=0)
+    if status in STUDENT_STATUSES:
+        users = users.filter(student_status=status)
+
+    return users.order_by(*STUDENT_SORTS.get(sort, STUDENT_SORTS['recent']))
+
+
+def student_row(student):
+    """Template row for an annotated student (same keys the list always used)"""
+    activities = [
+        ('progress', student.last_progress),
+        ('exam', student.last_exam),
+        ('cert', student.last_cert),
+    ]
+    activities = [activity for activity in activities if activity[1]]
+    recent_activity = max(activities, key=lambda activity: activity[1]) if activities else None
+
+    return {
+        'student': student,
+        'total_courses': student.total_courses,
+        'total_lessons': student.total_lessons,
+        'completed_lessons': student.completed_lessons,
+        'overall_progress': student.overall_progress,
+        'certifications_count': student.certifications_count,
+        'recent_activity': recent_activity,
+        'status': student.student_status,
+    }
@@ -0,0 +1,95 @@
+"""
+Lesson Unlock Utilities
+Works out which lessons of a course a student can open, in one linear pass
+over the cached course navigation and the student's completed lesson ids.
+
+Rules (unchanged from the original lesson_detail logic):
+- The first lesson of the course is always accessible.
+- The first lesson of a module unlocks once ANY lesson in the previous module
+  (by module order) is completed. The first module's first lesson has no
+  previous module, so it only unlocks if it is the course's first lesson.
+- Any other lesson unlocks when the lesson immediately before it in the same
+  module is completed, or when every earlier lesson in the course is completed.
+"""
+from ..models import UserProgress
+from .navigation import get_course_navigation
+
+
+def compute_accessible_lessons(navigation, completed_ids):
+    """
+    Return the set of accessible lesson ids for a course.
+
+    Args:
+        navigation: CourseNavigation for the course
+        completed_ids: set of lesson ids the student has completed
+    """
+    accessible = set()
+    if not navigation.lesson_ids:
+        return accessible
+
+    # Modules where at least one lesson is completed
+    started_modules = {
+        navigation.module_of[lesson_id]
+        for lesson_id in completed_ids
+        if navigation.module_of.get(lesson_id)
+    }
+
+    all_previous_completed = True
+    for idx, lesson_id in enumerate(navigation.lesson_ids):
+        if idx == 0:
+            accessible.add(lesson_id)
+        elif navigation.module_of[lesson_id] and navigation.is_first_in_module(lesson_id):
+            # First lesson of a module - previous module must be started
+            module_idx = navigation.module_position.get(navigation.module_of[lesson_id])
+            if module_idx:
+                prev_module_id = navigation.module_ids[module_idx - 1]
+                if prev_module_id in started_modules:
+                    accessible.add(lesson_id)
+        else:
+            prev_in_module = navigation.prev_lesson_in_module_id(lesson_id)
+            if (prev_in_module is not None and prev_in_module in completed_ids) or all_previous_completed:
+                accessible.add(lesson_id)
+
+        all_previous_completed = all_previous_completed and lesson_id in completed_ids
+
+    return accessible
+
+
+class LessonLockState:
+    """Completed and accessible lesson ids for one user in one course."""
+
+    def __init__(self, navigation, completed_ids):
+        self.navigation = navigation
+        self.completed_ids = completed_ids
+        self.accessible_ids = compute_accessible_lessons(navigation, completed_ids)
+
+    def is_accessible(self, lesson_id):
+        return lesson_id in self.accessible_ids
+
+    def is_completed(self, lesson_id):
+        return lesson_id in self.completed_ids
+
+    def first_incomplete_lesson_id(self):
+        """First lesson in course order the user has not completed (or None)"""
+        for lesson_id in self.navigation.lesson_ids:
+            if lesson_id not in self.completed_ids:
+                return lesson_id
+        return None
+
+
+def get_lesson_lock_state(user, course):
+    """
+    Build the lock state for a user in a course.
+    Costs one query for completed lesson ids plus the (cached) navigation.
+    """
+    navigation = get_course_navigation(course)
+    completed_ids = set()
+    if user.is_authenticated:
+        completed_ids = set(
+            UserProgress.objects.filter(
+                user=user,
+                lesson__course_id=navigation.course_id,
+                completed=True
+            ).values_list('lesson_id', flat=True)
+        )
+    return LessonLockState(navigation, completed_ids)
@@ -0,0 +1,156 @@
+"""
+Watch Heatmap Utilities
+Per-lesson viewing heatmaps built with NumPy from the watched/rewatched
+bitmaps on UserProgress (see utils/coverage.py): viewers per second, a
+drop-off curve, the most rewatched stretches and the median point where
+viewers stop. Bitmaps are unpacked in chunks, never as model instances.
+Results are cached per lesson and only ever computed by
+`python manage.py build_watch_heatmaps` on a scheduler - the course dashboard
+reads the cache and shows "pending" for lessons it hasn't reached yet.
+"""
+import time
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from ..models import UserProgress
+
+
+DEFAULT_HEATMAP_TTL = 60 * 60 * 6
+HEATMAP_CHUNK_ROWS = 10000
+HEATMAP_POINTS = 60  # buckets shown on the dashboard
+TOP_REWATCH_SEGMENTS = 5
+FINISHED_SHARE = 0.95  # watching past this share of the video isn't abandoning it
+
+
+def _cache_key(lesson_id):
+    return f'lesson_heatmap:{lesson_id}'
+
+
+def _label(seconds):
+    return f'{int(seconds) // 60}:{int(seconds) % 60:02d}'
+
+
+def _unpack(bitmaps, duration):
+    """(rows, duration) 0/1 matrix from stored bitmaps, padded/truncated to the duration"""
+    size = (duration + 7) // 8
+    packed = np.frombuffer(
+        b''.join(bytes(bitmap)[:size].ljust(size, b'\0') for bitmap in bitmaps), dtype=np.uint8
+    ).reshape(len(bitmaps), size)
+    return np.unpackbits(packed, axis=1, count=duration, bitorder='little')
+
+
+def _runs(mask):
+    """[(start, end)) index pairs of the True runs in a boolean array"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def top_rewatch_segments(rewatches, limit=TOP_REWATCH_SEGMENTS):
+    """
+    Stretches rewatched noticeably more than average: runs of seconds above
+    the mean of the rewatched seconds, ranked by total rewatches.
+    """
+    nonzero = rewatches[rewatches > 0]
+    if not nonzero.size:
+        return []
+    runs = _runs(rewatches >= max(nonzero.mean(), 1))
+    segments = [
+        {
+            'start': int(start),
+            'end': int(end),
+            'label': f'{_label(start)}-{_label(end)}',
+            'total': int(rewatches[start:end].sum()),
+            'peak': int(rewatches[start:end].max()),
+        }
+        for start, end in runs
+    ]
+    return sorted(segments, key=lambda segment: segment['total'], reverse=True)[:limit]
+
+
+def compute_lesson_heatmap(rows, duration, points=HEATMAP_POINTS, chunk_rows=HEATMAP_CHUNK_ROWS):
+    """
+    Heatmap from an iterable of (watched_bitmap, rewatched_bitmap) rows.
+
+    viewers[t]   - viewers who watched second t
+    retention[t] - share of viewers still watching at t (last watched second >= t)
+    Returned curves are averaged into `points` buckets for display.
+    """
+    viewers = np.zeros(duration, dtype=np.int64)
+    rewatches = np.zeros(duration, dtype=np.int64)
+    stopped = np.zeros(duration, dtype=np.int64)  # viewers whose last watched second is t
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        watched = _unpack([row[0] for row in chunk], duration)
+        watched = watched[watched.any(axis=1)]
+        if not len(watched):
+            continue
+        viewers += watched.sum(axis=0, dtype=np.int64)
+        rewatches += _unpack([row[1] for row in chunk], duration).sum(axis=0, dtype=np.int64)
+        last = duration - 1 - np.argmax(watched[:, ::-1], axis=1)
+        stopped += np.bincount(last, minlength=duration)
+
+    total = int(stopped.sum())
+    if not total:
+        return {'viewers': 0, 'duration': duration, 'buckets': [], 'top_rewatch': [], 'median_abandonment': None}
+
+    # Still watching at t = everyone minus those who stopped before t
+    retention = (total - np.concatenate(([0], np.cumsum(stopped)[:-1]))) / total
+
+    abandoned_before = int(duration * FINISHED_SHARE)
+    abandoned = np.repeat(np.arange(abandoned_before), stopped[:abandoned_before])
+    median_abandonment = int(np.median(abandoned)) if abandoned.size else None
+
+    points = max(1, min(points, duration))
+    edges = np.linspace(0, duration, points + 1).astype(int)
+    starts = edges[:-1]
+    widths = np.diff(edges)
+    buckets = [
+        {
+            'start': int(start),
+            'label': _label(start),
+            'viewers_pct': round(int(viewers_sum) / int(width) / total * 100, 1),
+            'retention_pct': round(float(retention[start]) * 100, 1),
+            'rewatches': int(rewatch_sum),
+        }
+        for start, width, viewers_sum, rewatch_sum in zip(
+            starts, widths, np.add.reduceat(viewers, starts), np.add.reduceat(rewatches, starts)
+        )
+    ]
+
+    return {
+        'viewers': total,
+        'duration': duration,
+        'buckets': buckets,
+        'top_rewatch': top_rewatch_segments(rewatches),
+        'median_abandonment': median_abandonment,
+        'median_abandonment_label': _label(median_abandonment) if median_abandonment is not None else None,
+        'abandoned_count': int(abandoned.size),
+    }
+
+
+def build_lesson_heatmap(lesson):
+    """Compute and cache one lesson's heatmap. None for lessons without a known duration."""
+    duration = lesson.vimeo_duration_seconds
+    if duration <= 0:
+        return None
+    rows = UserProgress.objects.filter(lesson_id=lesson.id).exclude(watched_bitmap=b'').values_list(
+        'watched_bitmap', 'rewatched_bitmap'
+    ).iterator(chunk_size=HEATMAP_CHUNK_ROWS)
+
+    started = time.monotonic()
+    heatmap = compute_lesson_heatmap(rows, duration)
+    heatmap['compute_seconds'] = time.monotonic() - started
+    heatmap['computed_at'] = time.time()
+    cache.set(_cache_key(lesson.id), heatmap, getattr(settings, 'WATCH_HEATMAP_TTL', DEFAULT_HEATMAP_TTL))
+    return heatmap
+
+
+def get_lesson_heatmaps(lessons):
+    """{lesson_id: heatmap, or None until build_watch_heatmaps has run} from the cache."""
+    cached = cache.get_many([_cache_key(lesson.id) for lesson in lessons])
+    return {lesson.id: cached.get(_cache_key(lesson.id)) for lesson in lessons}
@@ -8,6 +8,7 @@ from django.contrib import messages
 from django.conf import settings
 from datetime import datetime
 import json
+import math
 import re
 import requests
 import os
@@ -29,7 +30,15 @@ from django.db.models import Avg, Count, Q
 from django.db import models
 from django.utils import timezone
 from .utils.transcription import transcribe_video
-from .utils.access import has_course_access
+from .utils.access import user_has_course_access
+from .utils.navigation import get_course_navigation
+from .utils.unlock import get_lesson_lock_state
+from .utils.progress import get_user_course_progress_map
+from .utils.catalog import load_course_catalog
+from .utils.activity import record_lesson_completed, record_quiz_attempt
+from .utils.coverage import parse_segments
+from .utils.heartbeats import peek_heartbeat, record_heartbeat, record_heartbeat_batch
+from .utils.quiz_keys import get_answer_key, grade_answers
 
 
 def home(request):
@@ -79,64 +88,15 @@ def courses(request):
     if search_query:
         courses = courses.filter(name__icontains=search_query)
     
-    # Get progress and favorite status for each course if user is authenticated
-    courses_data = []
-    in_progress_courses = []
-    not_started_courses = []
+    # Progress and favorite status for every course in a fixed number of queries
     user = request.user if request.user.is_authenticated else None
-    
-    for course in courses:
-        course_info = {
-            'course': course,
-            'has_any_progress': False,
-            'progress_percentage': 0,
-            'is_favorited': False,
-        }
-        
-        if user:
-            # Check if course has any progress
-            has_any_progress = UserProgress.objects.filter(
-                user=user,
-                lesson__course=course
-            ).filter(
-                Q(completed=True) | Q(video_watch_percentage__gt=0) | Q(status__in=['in_progress', 'completed'])
-            ).exists()
-            
-            # Calculate progress percentage
-            total_lessons = course.lessons.count()
-            completed_lessons = UserProgress.objects.filter(
-                user=user,
-                lesson__course=course,
-                completed=True
-            ).count()
-            progress_percentage = int((completed_lessons / total_lessons * 100)) if total_lessons > 0 else 0
-            
-            # Check if favorited
-            from .models import FavoriteCourse
-            is_favorited = FavoriteCourse.objects.filter(user=user, course=course).exists()
-            
-            course_info.update({
-                'has_any_progress': has_any_progress,
-                'progress_percentage': progress_percentage,
-                'is_favorited': is_favorited,
-            })
-            
-            # Separate into in-progress and not-started
-            if has_any_progress:
-                in_progress_courses.append(course_info)
-            else:
-                not_started_courses.append(course_info)
-        else:
-            # For non-authenticated users, put all in not_started
-            not_started_courses.append(course_info)
-        
-        courses_data.append(course_info)
+    courses_data, in_progress_courses, not_started_courses = load_course_catalog(courses, user)
     
     return render(request, 'courses.html', {
         'courses_data': courses_data,  # Keep for backward compatibility
         'in_progress_courses': in_progress_courses,
         'not_started_courses': not_started_courses,
-        'courses': courses,  # Keep for backward compatibility
+        'courses': [data['course'] for data in courses_data],  # Keep for backward compatibility
         'selected_type': course_type,
         'search_query': search_query,
     })
@@ -169,13 +129,11 @@ def lesson_detail(request, course_slug, lesson_slug):
     ).first()
     
     progress_percentage = course.get_user_progress(request.user)
-    completed_lessons = list(
-        UserProgress.objects.filter(
-            user=request.user,
-            lesson__course=course,
-            completed=True
-        ).values_list('lesson_id', flat=True)
-    )
+    
+    # Lock state: completed + accessible lesson ids, computed once for the page
+    lock_state = get_lesson_lock_state(request.user, course)
+    completed_lessons = lock_state.completed_ids
+    accessible_lessons = lock_state.accessible_ids
     
     # Get current lesson progress
     current_lesson_progress = UserProgress.objects.filter(
@@ -185,159 +143,30 @@ def lesson_detail(request, course_slug, lesson_slug):
     
     video_watch_percentage = current_lesson_progress.video_watch_percentage if current_lesson_progress else 0.0
     last_watched_timestamp = current_lesson_progress.last_watched_timestamp if current_lesson_progress else 0.0
+    # Heartbeats not flushed yet are newer than the saved row
+    buffered = peek_heartbeat(request.user.id, lesson.id)
+    if buffered:
+        video_watch_percentage = max(video_watch_percentage, buffered[0])
+        last_watched_timestamp = buffered[1]
     lesson_status = current_lesson_progress.status if current_lesson_progress else 'not_started'
     
-    # Get all lessons ordered by order field
-    all_lessons = course.lessons.order_by('order', 'id')
-    
-    # Determine which lessons are accessible
-    accessible_lessons = []
-    # First lesson is always accessible
-    if all_lessons.exists():
-        first_lesson = all_lessons.first()
-        accessible_lessons.append(first_lesson.id)
-        
-        # Get all modules ordered
-        all_modules = course.modules.all().order_by('order', 'id')
-        
-        # For each subsequent lesson, check accessibility
-        for current_lesson in all_lessons[1:]:
-            # Check if this is the first lesson of a module
-            is_first_in_module = False
-            if current_lesson.module:
-                module_lessons = current_lesson.module.lessons.filter(course=course).order_by('order', 'id')
-                if module_lessons.exists():
-                    first_lesson_in_module = module_lessons.first()
-                    if first_lesson_in_module.id == current_lesson.id:
-                        is_first_in_module = True
-                        
-                        # Check if previous module's last lesson is completed
-                        current_module_index = None
-                        for idx, module in enumerate(all_modules):
-                            if module.id == current_lesson.module.id:
-                                current_module_index = idx
-                                break
-                        
-                        if current_module_index and current_module_index > 0:
-                            # Get previous module
-                            prev_module = all_modules[current_module_index - 1]
-                            prev_module_lessons = prev_module.lessons.filter(course=course).order_by('order', 'id')
-                            if prev_module_lessons.exists():
-                                # Check if ANY lesson in the previous module is completed
-                                # This allows access to next module once you've started the previous module
-                                prev_module_has_completed = any(
-                                    lesson.id in completed_lessons 
-                                    for lesson in prev_module_lessons
-                                )
-                                if prev_module_has_completed:
-                                    accessible_lessons.append(current_lesson.id)
-                                    continue
-            
-            # For non-first lessons in modules, check if the IMMEDIATELY PREVIOUS lesson in the SAME module is completed
-            # This allows sequential unlocking within a module
-            if not is_first_in_module:
-                if current_lesson.module:
-                    current_module_lessons = current_lesson.module.lessons.filter(course=course).order_by('order', 'id')
-                    current_module_lessons_list = list(current_module_lessons)
-                    
-                    # Find current lesson's position in module
-                    current_lesson_index = None
-                    for idx, l in enumerate(current_module_lessons_list):
-                        if l.id == current_lesson.id:
-                            current_lesson_index = idx
-                            break
-                    
-                    if current_lesson_index is not None and current_lesson_index > 0:
-                        # Check if the immediately previous lesson in this module is completed
-                        previous_lesson_in_module = current_module_lessons_list[current_lesson_index - 1]
-                        if previous_lesson_in_module.id in completed_lessons:
-                            accessible_lessons.append(current_lesson.id)
-                            continue
-                
-                # Fallback: check if all previous lessons overall are completed (for lessons without modules)
-                previous_lessons = all_lessons.filter(
-                    models.Q(order__lt=current_lesson.order) |
-                    models.Q(order=current_lesson.order, id__lt=current_lesson.id)
-                )
-                
-                all_previous_completed = True
-                for prev_lesson in previous_lessons:
-                    if prev_lesson.id not in completed_lessons:
-                        all_previous_completed = False
-                        break
-                
-                if all_previous_completed:
-                    accessible_lessons.append(current_lesson.id)
-        
-        # Check if current lesson is locked
-        lesson_locked = lesson.id not in accessible_lessons
+    # If lesson is locked, redirect to first incomplete lesson or show message
+    if not lock_state.is_accessible(lesson.id):
+        first_incomplete_id = lock_state.first_incomplete_lesson_id()
+        first_incomplete = Lesson.objects.filter(id=first_incomplete_id).first() if first_incomplete_id else None
         
-        # If lesson is locked, redirect to first incomplete lesson or show message
-        if lesson_locked:
-            # Find first incomplete lesson
-            first_incomplete = None
-            for l in all_lessons:
-                if l.id not in completed_lessons:
-                    first_incomplete = l
-                    break
-            
-            if first_incomplete:
-                messages.warning(request, 'Please complete previous lessons before accessing this one.')
-                return redirect('lesson_detail', course_slug=course_slug, lesson_slug=first_incomplete.slug)
-            else:
-                messages.info(request, 'All lessons completed!')
+        if first_incomplete:
+            messages.warning(request, 'Please complete previous lessons before accessing this one.')
+            return redirect('lesson_detail', course_slug=course_slug, lesson_slug=first_incomplete.slug)
+        else:
+            messages.info(request, 'All lessons completed!')
     
     # Work out next lesson (prioritize next module's first lesson)
-    next_lesson = None
-    has_more_modules = False
-    
-    if all_lessons.exists():
-        all_modules = course.modules.all().order_by('order', 'id')
-        
-        # Check if current lesson has a module
-        if lesson.module and all_modules.exists():
-            # Get all lessons in current module, ordered
-            current_module_lessons = lesson.module.lessons.filter(course=course).order_by('order', 'id')
-            current_module_lessons_list = list(current_module_lessons)
-            
-            # Check if this is the last lesson in the current module
-            is_last_in_module = False
-            if current_module_lessons_list:
-                last_lesson_in_module = current_module_lessons_list[-1]
-                if last_lesson_in_module.id == lesson.id:
-                    is_last_in_module = True
-            
-            if is_last_in_module:
-                # Find next module's first lesson (always go to next module when on last lesson)
-                current_module_found = False
-                for module in all_modules:
-                    if current_module_found:
-                        # This is the next module - get its first lesson
-                        next_module_lessons = module.lessons.filter(course=course).order_by('order', 'id')
-                        if next_module_lessons.exists():
-                            next_lesson = next_module_lessons.first()
-                            has_more_modules = True  # Always true when there's a next module
-                            break
-                    if module.id == lesson.module.id:
-                        current_module_found = True
-            
-            # If not last in module, get next lesson in same module
-            if not is_last_in_module and not next_lesson:
-                for idx, l in enumerate(current_module_lessons_list):
-                    if l.id == lesson.id and idx + 1 < len(current_module_lessons_list):
-                        next_lesson = current_module_lessons_list[idx + 1]
-                        break
-        
-        # Fallback: if no module or no next lesson found, use sequential navigation
-        if not next_lesson:
-            lessons_list = list(all_lessons)
-            for idx, l in enumerate(lessons_list):
-                if l.id == lesson.id and idx + 1 < len(lessons_list):
-                    next_lesson = lessons_list[idx + 1]
-                    # Check if next lesson is in a different module
-                    if lesson.module and next_lesson.module and lesson.module.id != next_lesson.module.id:
-                        has_more_modules = True
-                    break
+    navigation = lock_state.navigation
+    next_lesson_id = navigation.next_lesson_id(lesson.id)
+    next_lesson = Lesson.objects.filter(id=next_lesson_id).first() if next_lesson_id else None
+    has_more_modules = navigation.has_more_modules(lesson.id)
+    is_last_in_module = navigation.is_last_in_module(lesson.id)
 
     # Get quiz and quiz attempts for this user
     lesson_quiz = getattr(lesson, 'quiz', None)
@@ -356,15 +185,6 @@ def lesson_detail(request, course_slug, lesson_slug):
             passed=True
         ).exists()
 
-    # Check if current lesson is the last in its module
-    is_last_in_module = False
-    if lesson.module:
-        current_module_lessons = lesson.module.lessons.filter(course=course).order_by('order', 'id')
-        if current_module_lessons.exists():
-            last_lesson_in_module = current_module_lessons.last()
-            if last_lesson_in_module.id == lesson.id:
-                is_last_in_module = True
-    
     return render(request, 'lesson.html', {
         'course': course,
         'lesson': lesson,
@@ -402,84 +222,34 @@ def lesson_quiz_view(request, course_slug, lesson_slug):
     questions = quiz.questions.all()
     result = None
     
-    # Get next lesson for redirect after passing (use same logic as lesson_detail)
-    all_lessons = course.lessons.order_by('order', 'id')
-    next_lesson = None
-    
-    # Get user's completed lessons to check accessibility
-    completed_lessons = list(
-        UserProgress.objects.filter(
-            user=request.user,
-            lesson__course=course,
-            completed=True
-        ).values_list('lesson_id', flat=True)
-    )
-    
-    if all_lessons.exists():
-        all_modules = course.modules.all().order_by('order', 'id')
-        
-        # Check if current lesson has a module
-        if lesson.module and all_modules.exists():
-            # Get all lessons in current module, ordered
-            current_module_lessons = lesson.module.lessons.filter(course=course).order_by('order', 'id')
-            current_module_lessons_list = list(current_module_lessons)
-            
-            # Check if this is the last lesson in the current module
-            is_last_in_module = False
-            if current_module_lessons_list:
-                last_lesson_in_module = current_module_lessons_list[-1]
-                if last_lesson_in_module.id == lesson.id:
-                    is_last_in_module = True
-            
-            if is_last_in_module:
-                # Find next module's first lesson
-                current_module_found = False
-                for module in all_modules:
-                    if current_module_found:
-                        # This is the next module - get its first lesson
-                        next_module_lessons = module.lessons.filter(course=course).order_by('order', 'id')
-                        if next_module_lessons.exists():
-                            next_lesson = next_module_lessons.first()
-                            break
-                    if module.id == lesson.module.id:
-                        current_module_found = True
-            
-            # If not last in module, get next lesson in same module
-            if not is_last_in_module and not next_lesson:
-                for idx, l in enumerate(current_module_lessons_list):
-                    if l.id == lesson.id and idx + 1 < len(current_module_lessons_list):
-                        next_lesson = current_module_lessons_list[idx + 1]
-                        break
-        
-        # Fallback: if no module or no next lesson found, use sequential navigation
-        if not next_lesson:
-            lessons_list = list(all_lessons)
-            for idx, l in enumerate(lessons_list):
-                if l.id == lesson.id and idx + 1 < len(lessons_list):
-                    next_lesson = lessons_list[idx + 1]
-                    break
+    # Get next lesson for redirect after passing (same navigation as lesson_detail)
+    next_lesson_id = get_course_navigation(course).next_lesson_id(lesson.id)
+    next_lesson = Lesson.objects.filter(id=next_lesson_id).first() if next_lesson_id else None
 
     if request.method == 'POST':
-        total = questions.count()
-        correct = 0
-        for q in questions:
-            answer = request.POST.get(f'q_{q.id}')
-            if answer and answer == q.correct_option:
-                correct += 1
+        answer_key = get_answer_key(quiz)
+        answers, correct = grade_answers(answer_key, request.POST)
+        total = len(answer_key)
 
         score = (correct / total * 100) if total > 0 else 0
         passed = score >= quiz.passing_score
 
-        LessonQuizAttempt.objects.create(
+        attempt = LessonQuizAttempt.objects.create(
             user=request.user,
             quiz=quiz,
             score=score,
             passed=passed,
+            answer_key_id=answer_key.id,
+            answers=answers,
         )
+        record_quiz_attempt(attempt, lesson)
         
         # If quiz is passed and lesson is required, auto-complete the lesson
         if passed and quiz.is_required:
-            UserProgress.objects.update_or_create(
+            already_completed = UserProgress.objects.filter(
+                user=request.user, lesson=lesson, completed=True
+            ).exists()
+            user_progress, _ = UserProgress.objects.update_or_create(
                 user=request.user,
                 lesson=lesson,
                 defaults={
@@ -487,6 +257,8 @@ def lesson_quiz_view(request, course_slug, lesson_slug):
                     'status': 'completed',
                 }
             )
+            if not already_completed:
+                record_lesson_completed(request.user, lesson, user_progress)
 
         result = {
             'score': round(score, 1),
@@ -900,37 +672,86 @@ def update_video_progress(request, lesson_id):
         data = json.loads(request.body)
         watch_percentage = float(data.get('watch_percentage', 0))
         timestamp = float(data.get('timestamp', 0))
+        segments = parse_segments(data['segments']) if data.get('segments') is not None else None
         
-        # Get or create UserProgress
-        user_progress, created = UserProgress.objects.get_or_create(
-            user=request.user,
-            lesson=lesson,
-            defaults={
-                'video_watch_percentage': watch_percentage,
-                'last_watched_timestamp': timestamp,
-                'progress_percentage': int(watch_percentage)
-            }
+        # Buffered - only completion is written to the database right away
+        watch_percentage, status, completed = record_heartbeat(
+            request.user, lesson, watch_percentage, timestamp, segments
         )
         
-        # Update progress
-        if not created:
-            user_progress.video_watch_percentage = watch_percentage
-            user_progress.last_watched_timestamp = timestamp
-            user_progress.progress_percentage = int(watch_percentage)
-        
-        # Auto-update status based on watch progress
-        user_progress.update_status()
-        
         return JsonResponse({
             'success': True,
-            'watch_percentage': user_progress.video_watch_percentage,
-            'status': user_progress.status,
-            'completed': user_progress.completed
+            'watch_percentage': watch_percentage,
+            'status': status,
+            'completed': completed
         })
-    except (json.JSONDecodeError, ValueError, KeyError) as e:
+    except (json.JSONDecodeError, ValueError, KeyError, TypeError) as e:
         return JsonResponse({'error': f'Invalid data: {str(e)}'}, status=400)
 
 
+MAX_PROGRESS_BATCH_SAMPLES = 500
+
+
+def _parse_progress_samples(request):
+    """
+    Samples from a JSON body ({"samples": [...]} or a bare list) or from a
+    form field "samples" holding the JSON list - the form lets
+    navigator.sendBeacon send the CSRF token alongside.
+    """
+    if request.content_type == 'application/json':
+        payload = json.loads(request.body)
+    else:
+        payload = json.loads(request.POST.get('samples', '[]'))
+    if isinstance(payload, dict):
+        payload = payload.get('samples', [])
+    if not isinstance(payload, list):
+        raise ValueError('samples must be a list')
+    if len(payload) > MAX_PROGRESS_BATCH_SAMPLES:
+        raise ValueError(f'at most {MAX_PROGRESS_BATCH_SAMPLES} samples per batch')
+
+    samples = []
+    for sample in payload:
+        if not isinstance(sample, dict):
+            raise ValueError('each sample must be an object')
+        parsed = {
+            'lesson_id': int(sample['lesson_id']),
+            'watch_percentage': float(sample.get('watch_percentage', 0)),
+            'timestamp': float(sample.get('timestamp', 0)),
+            'client_ts': float(sample['client_ts']) if sample.get('client_ts') is not None else None,
+            'segments': parse_segments(sample['segments']) if sample.get('segments') is not None else None,
+        }
+        numbers = [parsed['watch_percentage'], parsed['timestamp'], parsed['client_ts'] or 0]
+        if not all(math.isfinite(number) for number in numbers):
+            raise ValueError('sample values must be finite numbers')
+        samples.append(parsed)
+    return samples
+
+
+@require_http_methods(["POST"])
+@login_required
+def update_video_progress_batch(request):
+    """Apply a batch of video progress samples (several heartbeats / lessons in one request)"""
+    try:
+        samples = _parse_progress_samples(request)
+    except (json.JSONDecodeError, ValueError, KeyError, TypeError) as e:
+        return JsonResponse({'error': f'Invalid data: {str(e)}'}, status=400)
+    
+    results, unknown_lessons = record_heartbeat_batch(request.user, samples)
+    
+    return JsonResponse({
+        'success': True,
+        'lessons': {
+            str(lesson_id): {
+                'watch_percentage': watch_percentage,
+                'status': status,
+                'completed': completed
+            }
+            for lesson_id, (watch_percentage, status, completed) in results.items()
+        },
+        'unknown_lessons': unknown_lessons
+    })
+
+
 @require_http_methods(["POST"])
 @login_required
 def complete_lesson(request, lesson_id):
@@ -967,6 +788,7 @@ def complete_lesson(request, lesson_id):
         user=request.user,
         lesson=lesson
     )
+    was_completed = user_progress.completed
 
     # Mark as completed
     user_progress.completed = True
@@ -975,6 +797,9 @@ def complete_lesson(request, lesson_id):
     user_progress.progress_percentage = 100
     user_progress.save()
     
+    if not was_completed:
+        record_lesson_completed(request.user, lesson, user_progress)
+    
     return JsonResponse({
         'success': True,
         'message': 'Lesson marked as complete',
@@ -1144,191 +969,33 @@ def student_dashboard(request):
     user = request.user
     
     # Use access control system to organize courses
-    from .utils.access import get_courses_by_visibility, has_course_access, check_course_prerequisites
+    from .utils.access import get_courses_by_visibility
+    from .utils.prerequisites import check_prerequisites_bulk
+    from .utils.student_dashboard import load_student_courses, prefetch_active_bundles
     
     courses_by_visibility = get_courses_by_visibility(user)
-    my_courses = courses_by_visibility['my_courses']
     available_to_unlock = courses_by_visibility['available_to_unlock']
     not_available = courses_by_visibility['not_available']
     
-    # Also check legacy enrollments for backward compatibility
-    enrollments = CourseEnrollment.objects.filter(user=user).select_related('course')
-    if not enrollments.exists() and user.is_staff:
-        # Auto-enroll admin/staff in all active courses
-        for course in Course.objects.filter(status='active'):
-            CourseEnrollment.objects.get_or_create(user=user, course=course)
-        enrollments = CourseEnrollment.objects.filter(user=user).select_related('course')
-    
-    # Process My Courses (courses with access)
-    my_courses_data = []
-    for course in my_courses:
-        # Check access record
-        has_access, access_record, _ = has_course_access(user, course)
-        if not has_access:
-            continue
-            
-        # Get enrollment (legacy) or create access-based data
-        enrollment = CourseEnrollment.objects.filter(user=user, course=course).first()
-        
-        # Calculate progress
-        total_lessons = course.lessons.count()
-        completed_lessons = UserProgress.objects.filter(
-            user=user,
-            lesson__course=course,
-            completed=True
-        ).count()
-        
-        progress_percentage = int((completed_lessons / total_lessons * 100)) if total_lessons > 0 else 0
-        
-        # Check if course has any progress at all (watched videos, even if not completed)
-        has_any_progress = UserProgress.objects.filter(
-            user=user,
-            lesson__course=course
-        ).filter(
-            Q(completed=True) | Q(video_watch_percentage__gt=0) | Q(status__in=['in_progress', 'completed'])
-        ).exists()
-        
-        # Get average video watch percentage
-        avg_watch = UserProgress.objects.filter(
-            user=user,
-            lesson__course=course
-        ).aggregate(avg=Avg('video_watch_percentage'))['avg'] or 0
-        
-        # Get exam info
-        exam_info = None
-        try:
-            exam = Exam.objects.get(course=course)
-            exam_attempts = ExamAttempt.objects.filter(user=user, exam=exam).order_by('-started_at')
-            latest_attempt = exam_attempts.first()
-            exam_info = {
-                'exists': True,
-                'attempts_count': exam_attempts.count(),
-                'max_attempts': exam.max_attempts,
-                'latest_attempt': latest_attempt,
-                'passed': exam_attempts.filter(passed=True).exists(),
-                'is_available': enrollment.is_exam_available(),
-            }
-        except Exam.DoesNotExist:
-            exam_info = {'exists': False}
-        
-        # Get certification status
-        try:
-            certification = Certification.objects.get(user=user, course=course)
-            cert_status = certification.status
-            cert_display = certification.get_status_display()
-        except Certification.DoesNotExist:
-            cert_status = 'not_eligible' if progress_percentage < 100 else 'eligible'
-            cert_display = 'Not Eligible' if progress_percentage < 100 else 'Eligible'
-            certification = None
-        
-        # Check if course is favorited
-        from .models import FavoriteCourse
-        is_favorited = FavoriteCourse.objects.filter(user=user, course=course).exists()
-        
-        my_courses_data.append({
-            'course': course,
-            'enrollment': enrollment,
-            'access_record': access_record,
-            'total_lessons': total_lessons,
-            'completed_lessons': completed_lessons,
-            'progress_percentage': progress_percentage,
-            'has_any_progress': has_any_progress,
-            'avg_watch_percentage': round(avg_watch, 1),
-            'exam_info': exam_info,
-            'certification': certification,
-            'cert_status': cert_status,
-            'cert_display': cert_display,
-            'is_favorited': is_favorited,
-        })
-    
-    # Also include legacy enrollments that might not have access records yet
-    for enrollment in enrollments:
-        course = enrollment.course
-        # Skip if already in my_courses_data
-        if any(cd['course'].id == course.id for cd in my_courses_data):
-            continue
-            
-        # Check if course has access
-        has_access, access_record, _ = has_course_access(user, course)
-        if not has_access:
-            # Try to create access from enrollment (migration path)
-            from .utils.access import grant_course_access
-            access_record = grant_course_access(
-                user=user,
-                course=course,
-                access_type='purchase',
-                notes="Migrated from legacy enrollment"
-            )
-        
-        # Calculate progress
-        total_lessons = course.lessons.count()
-        completed_lessons = UserProgress.objects.filter(
-            user=user,
-            lesson__course=course,
-            completed=True
-        ).count()
-        progress_percentage = int((completed_lessons / total_lessons * 100)) if total_lessons > 0 else 0
-        avg_watch = UserProgress.objects.filter(
-            user=user,
-            lesson__course=course
-        ).aggregate(avg=Avg('video_watch_percentage'))['avg'] or 0
-        
-        # Get exam info
-        exam_info = None
-        try:
-            exam = Exam.objects.get(course=course)
-            exam_attempts = ExamAttempt.objects.filter(user=user, exam=exam).order_by('-started_at')
-            latest_attempt = exam_attempts.first()
-            exam_info = {
-                'exists': True,
-                'attempts_count': exam_attempts.count(),
-                'max_attempts': exam.max_attempts,
-                'latest_attempt': latest_attempt,
-                'passed': exam_attempts.filter(passed=True).exists(),
-                'is_available': enrollment.is_exam_available(),
-            }
-        except Exam.DoesNotExist:
-            exam_info = {'exists': False}
-        
-        # Get certification
-        try:
-            certification = Certification.objects.get(user=user, course=course)
-            cert_status = certification.status
-            cert_display = certification.get_status_display()
-        except Certification.DoesNotExist:
-            cert_status = 'not_eligible' if progress_percentage < 100 else 'eligible'
-            cert_display = 'Not Eligible' if progress_percentage < 100 else 'Eligible'
-            certification = None
-        
-        my_courses_data.append({
-            'course': course,
-            'enrollment': enrollment,
-            'access_record': access_record,
-            'total_lessons': total_lessons,
-            'completed_lessons': completed_lessons,
-            'progress_percentage': progress_percentage,
-            'avg_watch_percentage': round(avg_watch, 1),
-            'exam_info': exam_info,
-            'certification': certification,
-            'cert_status': cert_status,
-            'cert_display': cert_display,
-        })
+    # My Courses: active access plus legacy enrollments, loaded in a fixed number of queries.
+    # Legacy enrollments get their CourseAccess on write (enrollment signal /
+    # migrate_legacy_enrollments command), and staff are enrolled by the
+    # enroll_staff signals/command, not here.
+    my_courses_data = load_student_courses(user)
     
     # Process Available to Unlock courses
     available_courses_data = []
+    available_to_unlock = list(prefetch_active_bundles(available_to_unlock))
+    prerequisite_status = check_prerequisites_bulk(user, available_to_unlock)
     for course in available_to_unlock:
         # Check prerequisites
-        prereqs_met, missing_prereqs = check_course_prerequisites(user, course)
-        
-        # Check if course is in a bundle
-        from .models import Bundle
-        bundles_with_course = Bundle.objects.filter(courses=course, is_active=True)
+        prereqs_met, missing_prereqs = prerequisite_status[course.id]
         
         available_courses_data.append({
             'course': course,
             'prereqs_met': prereqs_met,
             'missing_prereqs': missing_prereqs,
-            'bundles': bundles_with_course,
+            'bundles': course.active_bundles,
         })
     
     # Process Not Available courses
@@ -1450,15 +1117,12 @@ def student_certifications(request):
     enrollments = CourseEnrollment.objects.filter(user=user).select_related('course')
     eligible_courses = []
     
+    progress_by_course = get_user_course_progress_map(user)
+    
     for enrollment in enrollments:
-        total_lessons = enrollment.course.lessons.count()
-        completed_lessons = UserProgress.objects.filter(
-            user=user,
-            lesson__course=enrollment.course,
-            completed=True
-        ).count()
+        rollup = progress_by_course.get(enrollment.course_id)
         
-        if completed_lessons >= total_lessons and total_lessons > 0:
+        if rollup and rollup.is_complete:
             # Check if certification exists
             if not Certification.objects.filter(user=user, course=enrollment.course).exists():
                 eligible_courses.append(enrollment.course)
@@ -1573,7 +1237,7 @@ def lesson_chatbot(request, lesson_id):
         }, status=400)
     
     # Check if user has access to this lesson
-    if not has_course_access(request.user, lesson.course):
+    if not user_has_course_access(request.user, lesson.course_id):
         return JsonResponse({
             'success': False,
             'error': 'You do not have access to this lesson'
@@ -31,6 +31,7 @@ CSRF_TRUSTED_ORIGINS = [
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # ASGI runserver (websockets for the live activity feed)
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -69,6 +70,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'myProject.wsgi.application'
+ASGI_APPLICATION = 'myProject.asgi.application'
 
 
 # Database
@@ -98,6 +100,72 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Uses REDIS_URL when set so cached data (course navigation etc.) is shared
+# between workers; falls back to per-process memory for local development.
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Channel layer for pushing live activity to staff dashboards: Redis when
+# available so every worker sees every event, in-memory for local development.
+
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
+# Dashboard overview cache (see myApp/utils/dashboard_cache.py). With
+# stale-while-revalidate on, an expired copy is served while one request recomputes;
+# on a cold miss, requests arriving during that recompute get a "being computed" page.
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '60'))
+DASHBOARD_CACHE_MAX_STALE = int(os.getenv('DASHBOARD_CACHE_MAX_STALE', '600'))
+DASHBOARD_CACHE_STALE_WHILE_REVALIDATE = os.getenv('DASHBOARD_CACHE_STALE_WHILE_REVALIDATE', 'true').lower() in ('1', 'true', 'yes')
+
+# Video progress heartbeats are buffered and flushed to UserProgress in batches
+# (see myApp/utils/heartbeats.py) by a timer thread in each process and/or
+# `manage.py flush_progress_heartbeats` on a scheduler.
+# The cache buffer needs a shared cache (Redis) and is required with more than
+# one worker process: the local buffer is per process, and heartbeats not yet
+# flushed are lost if a process is killed.
+PROGRESS_HEARTBEAT_FLUSH_INTERVAL = int(os.getenv('PROGRESS_HEARTBEAT_FLUSH_INTERVAL', '30'))
+PROGRESS_HEARTBEAT_BUFFER = os.getenv('PROGRESS_HEARTBEAT_BUFFER', 'cache' if REDIS_URL else 'local')
+PROGRESS_HEARTBEAT_FLUSH_TIMER = os.getenv('PROGRESS_HEARTBEAT_FLUSH_TIMER', 'true').lower() in ('1', 'true', 'yes')
+
+# Per-lesson watch heatmaps on the course dashboard (myApp/utils/watch_heatmap.py)
+WATCH_HEATMAP_TTL = int(os.getenv('WATCH_HEATMAP_TTL', str(60 * 60 * 6)))
+
+# Per-question quiz statistics on the quiz dashboards (myApp/utils/quiz_analysis.py)
+QUIZ_ANALYSIS_TTL = int(os.getenv('QUIZ_ANALYSIS_TTL', str(60 * 60 * 6)))
+
+# PDF quiz uploads are extracted in a background job; scanned pages are OCRed
+# in a pool of worker processes (myApp/utils/pdf_extract.py), 1 = in the job's thread.
+PDF_IMPORT_WORKERS = int(os.getenv('PDF_IMPORT_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -22,6 +22,7 @@ urlpatterns = [
     
     # Dashboard URLs (Admin-facing, for developers)
     path('dashboard/', dashboard_views.dashboard_home, name='dashboard_home'),
+    path('dashboard/refresh/', dashboard_views.dashboard_home_refresh, name='dashboard_home_refresh'),
     path('dashboard/analytics/', dashboard_views.dashboard_analytics, name='dashboard_analytics'),
     path('dashboard/courses/', dashboard_views.dashboard_courses, name='dashboard_courses'),
     path('dashboard/courses/add/', dashboard_views.dashboard_add_course, name='dashboard_add_course'),
@@ -31,6 +32,8 @@ urlpatterns = [
     path('dashboard/lessons/', dashboard_views.dashboard_lessons, name='dashboard_lessons'),
     path('dashboard/lessons/add/', dashboard_views.dashboard_add_lesson, name='dashboard_add_lesson'),
     path('dashboard/lessons/upload-quiz/', dashboard_views.dashboard_upload_quiz, name='dashboard_upload_quiz'),
+    path('dashboard/quiz-imports/<int:job_id>/', dashboard_views.dashboard_quiz_import_job, name='dashboard_quiz_import_job'),
+    path('dashboard/quiz-imports/<int:job_id>/status/', dashboard_views.quiz_import_job_status, name='quiz_import_job_status'),
     path('dashboard/lessons/<int:lesson_id>/edit/', dashboard_views.dashboard_edit_lesson, name='dashboard_edit_lesson'),
     path('dashboard/lessons/<int:lesson_id>/delete/', dashboard_views.dashboard_delete_lesson, name='dashboard_delete_lesson'),
     path('dashboard/lessons/<int:lesson_id>/quiz/', dashboard_views.dashboard_lesson_quiz, name='dashboard_lesson_quiz'),
@@ -39,6 +42,7 @@ urlpatterns = [
     
     # Student Progress Monitoring
     path('dashboard/students/', dashboard_views.dashboard_students, name='dashboard_students'),
+    path('dashboard/activity/', dashboard_views.dashboard_activity_feed, name='dashboard_activity_feed'),
     path('dashboard/students/progress/', dashboard_views.dashboard_student_progress, name='dashboard_student_progress'),
     path('dashboard/students/<int:user_id>/', dashboard_views.dashboard_student_detail, name='dashboard_student_detail'),
     path('dashboard/students/<int:user_id>/<slug:course_slug>/', dashboard_views.dashboard_student_detail, name='dashboard_student_detail_course'),
@@ -57,6 +61,8 @@ urlpatterns = [
     path('dashboard/students/<int:user_id>/revoke-access/', dashboard_views.revoke_course_access_view, name='dashboard_revoke_access'),
     path('dashboard/students/<int:user_id>/grant-bundle/', dashboard_views.grant_bundle_access_view, name='dashboard_grant_bundle'),
     path('dashboard/students/<int:user_id>/add-cohort/', dashboard_views.add_to_cohort_view, name='dashboard_add_cohort'),
+    path('dashboard/cohorts/<int:cohort_id>/courses/', dashboard_views.cohort_courses_view, name='dashboard_cohort_courses'),
+    path('dashboard/cohorts/jobs/<int:job_id>/', dashboard_views.cohort_sync_job_status, name='dashboard_cohort_sync_job'),
     
     # Creator/Lesson Upload Flow (kept for lesson creation)
     path('creator/', views.creator_dashboard, name='creator_dashboard'),
@@ -77,6 +83,7 @@ urlpatterns = [
     # Lesson progress tracking endpoints
     path('api/lessons/<int:lesson_id>/progress/', views.update_video_progress, name='update_video_progress'),
     path('api/lessons/<int:lesson_id>/complete/', views.complete_lesson, name='complete_lesson'),
+    path('api/progress/batch/', views.update_video_progress_batch, name='update_video_progress_batch'),
     
     # Favorite course endpoint
     path('api/courses/<int:course_id>/favorite/', views.toggle_favorite_course, name='toggle_favorite_course'),